@@ -13,22 +13,39 @@ Zasady licencji:
 - Status EXPIRED lub BLOCKED -> program zamyka się po naciśnięciu START lub STOP
 """
 
+import os
 import re
+import sys
+import shutil
 import time
+import queue
 import threading
+import base64
+import bisect
+import socket
 import hashlib
+import hmac
+import secrets
+import weakref
 import getpass
 import json
+import csv
+import copy
 import datetime as dt
+import email.utils
 import platform
 import subprocess
+import http.client
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from pathlib import Path
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlencode, urljoin, urlsplit
 
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 
 VERSION = "v4.2.3"
 BUILD_TIME = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -44,6 +61,24 @@ CHANGELOG = [
 # --- LICENCJA (Apps Script) ---
 LICENSE_URL = "https://script.google.com/macros/s/AKfycbzRSqVDxYLQSst83z2aW_S3ftMV-jfyLTdp4AUWsHRdNxJ3epkbANOK-0KwZY5d5F1K/exec"
 LICENSE_HTTP_TIMEOUT_S = 8
+LICENSE_REFRESH_S = 600   # okresowe sprawdzenie w tle
+LICENSE_GRACE_S = 0       # ile sekund ufać ostatniemu OK z serwera, gdy serwer nie odpowiada (0 = wcale)
+
+# --- CHROME / CDP ---
+CDP_ENDPOINT = "http://127.0.0.1:9222"
+EBRAMA_URL_PART = "ebrama.baltichub.com"
+CDP_HEALTH_INTERVAL_S = 5.0
+CDP_CONNECT_TIMEOUT_MS = 30000      # łączenie z Chrome (jak domyślny limit connect_over_cdp)
+CDP_CONNECT_ATTEMPT_MAX_MS = 1600   # najdłuższa pojedyncza próba, gdy łączenie przerywa STOP
+
+# --- STOP ---
+STOP_SLICE_MS = 50             # najdłuższy pojedynczy kawałek oczekiwania w Workerze
+STOP_LATENCY_BUDGET_MS = 100   # STOP -> Worker zatrzymany (powyżej: [WARN] w logu)
+
+# --- try_slot: górne granice limitów adaptacyjnych ---
+TILE_CLICK_MAX_MS = 2000       # click() kafelka (górna granica limitu adaptacyjnego)
+CONFIRM_CLICK_MAX_MS = 220     # pojedyncza próba TAK/OK
+SUCCESS_QUICK_MAX_MS = 800     # krótkie czekanie na sukces w try_slot
 
 # ------------------ REGEX ------------------
 
@@ -78,25 +113,13 @@ def generate_machine_id():
     return h[:16]
 
 
-def fetch_license_status(hwid: str) -> dict:
+def parse_license_response(body: str, hwid: str) -> dict:
     """
-    Woła Google Apps Script:
-    GET .../exec?hwid=XXXX
-
-    Oczekiwane odpowiedzi:
+    Odpowiedź Apps Script:
       { hwid, status: 'OK'|'EXPIRED'|'BLOCKED', valid_to: ... }
     Możliwe też: NOT_FOUND / error itp.
     """
-    qs = urlencode({"hwid": hwid})
-    url = f"{LICENSE_URL}?{qs}"
-
-    req = Request(url, headers={
-        "User-Agent": f"NTQ-VBS/{VERSION} (Python)"
-    })
-
-    with urlopen(req, timeout=LICENSE_HTTP_TIMEOUT_S) as resp:
-        body = resp.read().decode("utf-8", errors="replace")
-        data = json.loads(body)
+    data = json.loads(body)
 
     status = str(data.get("status", "")).strip().upper()
     valid_to = data.get("valid_to", "")
@@ -108,32 +131,334 @@ def fetch_license_status(hwid: str) -> dict:
     }
 
 
+class HttpLicenseBackend:
+    """
+    GET {url}?hwid=XXXX na utrzymywanych połączeniach (keep-alive).
+
+    Apps Script odpowiada przekierowaniem na script.googleusercontent.com,
+    więc trzymamy osobne połączenie dla każdego hosta.
+    Domyślnie LICENSE_URL; testy mogą podać adres lokalnego serwera zastępczego.
+    """
+
+    MAX_REDIRECTS = 5
+
+    def __init__(self, url: str = LICENSE_URL, timeout: float = LICENSE_HTTP_TIMEOUT_S):
+        self.url = url
+        self.timeout = timeout
+        self._conns = {}
+
+    def fetch(self, hwid: str) -> dict:
+        url = f"{self.url}?{urlencode({'hwid': hwid})}"
+        for _ in range(self.MAX_REDIRECTS + 1):
+            status, location, body = self._get(url)
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            if status != 200:
+                raise RuntimeError(f"HTTP {status}")
+            return parse_license_response(body.decode("utf-8", errors="replace"), hwid)
+        raise RuntimeError("Za dużo przekierowań")
+
+    def close(self):
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+
+    def _get(self, url: str):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        # druga próba na świeżym połączeniu, gdy serwer zamknął keep-alive
+        for attempt in range(2):
+            conn = self._conns.get(key)
+            if conn is None:
+                cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                conn = cls(parts.netloc, timeout=self.timeout)
+                self._conns[key] = conn
+            try:
+                conn.request("GET", path, headers={
+                    "User-Agent": f"NTQ-VBS/{VERSION} (Python)",
+                    "Connection": "keep-alive",
+                })
+                resp = conn.getresponse()
+                body = resp.read()
+                return resp.status, resp.getheader("Location"), body
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._conns.pop(key, None)
+                if attempt:
+                    raise
+
+
+def fetch_license_status(hwid: str, backend=None) -> dict:
+    """Jednorazowe sprawdzenie licencji (domyślnie przez Apps Script)."""
+    return (backend or HttpLicenseBackend()).fetch(hwid)
+
+
 def is_license_valid(status: str) -> bool:
     status = (status or "").strip().upper()
     return status == "OK"
 
 
+class LicenseGate:
+    """
+    Wynik sprawdzenia licencji dla jednego START.
+    Worker może czytać sloty od razu, ale przed kliknięciem rezerwacji czeka na set().
+    """
+
+    def __init__(self):
+        self._evt = threading.Event()
+        self.valid = False
+
+    def set(self, valid: bool):
+        self.valid = bool(valid)
+        self._evt.set()
+
+    @property
+    def refused(self) -> bool:
+        """Wynik już jest i licencja nieważna (kolejka nie ma po co ruszać dalej)."""
+        return self._evt.is_set() and not self.valid
+
+    def wait(self, stop_evt, slice_s: float = 0.05) -> bool:
+        """Czeka na wynik (przerywalne przez stop_evt). True = licencja ważna."""
+        while not self._evt.is_set():
+            if stop_evt.is_set():
+                return False
+            self._evt.wait(slice_s)
+        return self.valid
+
+
+def _license_expired(valid_to) -> bool:
+    """True, jeśli valid_to (YYYY-MM-DD...) jest już w przeszłości. Nieczytelna data -> False."""
+    try:
+        return dt.date.fromisoformat(str(valid_to).strip()[:10]) < dt.date.today()
+    except ValueError:
+        return False
+
+
+class LicenseService:
+    """
+    Sprawdzanie licencji na własnym wątku – okno Tk nigdy nie czeka na HTTP.
+
+    - check(callback) zleca sprawdzenie; callback(state) woła się na wątku serwisu,
+    - co LICENSE_REFRESH_S status odświeża się sam,
+    - każdy nowy stan trafia do publish(state) (App wrzuca go do kolejki UI).
+
+    Stan to dict: status, valid_to, checked_at, verified_at (ostatnie OK
+    potwierdzone przez serwer), cached (True = status z pamięci w okresie
+    LICENSE_GRACE_S, bo serwer nie odpowiedział) oraz error.
+    """
+
+    def __init__(self, hwid, publish, backend=None,
+                 refresh_s=LICENSE_REFRESH_S, grace_s=LICENSE_GRACE_S):
+        self.hwid = hwid
+        self.publish = publish
+        self.backend = backend or HttpLicenseBackend()
+        self.refresh_s = refresh_s
+        self.grace_s = grace_s
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._last_ok = None
+        self.state = None
+
+    def start(self):
+        self._thread.start()
+
+    def check(self, callback=None):
+        self._requests.put(callback)
+
+    def close(self):
+        self._requests.put(self._thread)
+
+    def _verify(self) -> dict:
+        now = dt.datetime.now()
+        try:
+            data = self.backend.fetch(self.hwid)
+        except Exception as e:
+            last = self._last_ok
+            if (
+                last is not None
+                and (now - last["verified_at"]).total_seconds() <= self.grace_s
+                and not _license_expired(last["valid_to"])
+            ):
+                return dict(last, checked_at=now, cached=True, error=str(e))
+            return {
+                "status": "ERROR", "valid_to": "", "checked_at": now,
+                "verified_at": None, "cached": False, "error": str(e),
+            }
+
+        state = {
+            "status": data["status"], "valid_to": data["valid_to"], "checked_at": now,
+            "verified_at": now, "cached": False, "error": "",
+        }
+        self._last_ok = state if is_license_valid(state["status"]) else None
+        return state
+
+    def _loop(self):
+        while True:
+            try:
+                req = self._requests.get(timeout=self.refresh_s)
+            except queue.Empty:
+                req = None
+
+            if req is self._thread:
+                break
+
+            # kilka zleceń naraz -> jedno zapytanie do serwera
+            callbacks = [req] if req else []
+            while True:
+                try:
+                    more = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if more is self._thread:
+                    self._requests.put(more)
+                    break
+                if more:
+                    callbacks.append(more)
+
+            self.state = self._verify()
+            self.publish(self.state)
+            for cb in callbacks:
+                try:
+                    cb(self.state)
+                except Exception:
+                    pass
+
+        close = getattr(self.backend, "close", None)
+        if close:
+            close()
+
+
 # ------------------ PLAYWRIGHT HELPERS ------------------
 
-def wait_for_slots_loaded(page, timeout_ms):
-    """Czekaj aż zniknie 'Ładowanie slotów' (best-effort)."""
+def is_stopped(stop_evt) -> bool:
+    return stop_evt is not None and stop_evt.is_set()
+
+
+def sliced_wait(fn, timeout_ms, stop_evt=None) -> bool:
+    """
+    Woła fn(slice_ms) kawałkami po STOP_SLICE_MS, aż fn przejdzie bez timeoutu,
+    minie timeout_ms albo ustawiony zostanie stop_evt.
+    True = fn się powiodło. Inne błędy niż timeout Playwrighta lecą wyżej.
+    """
+    deadline = time.monotonic() + int(timeout_ms) / 1000
+    while not is_stopped(stop_evt):
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        if remaining_ms <= 0:
+            return False
+        try:
+            fn(int(max(1, min(STOP_SLICE_MS, remaining_ms))))
+            return True
+        except PWTimeoutError:
+            continue
+    return False
+
+
+# wpis logu wywołania Playwrighta: zdarzenia myszy zostały już wysłane
+PW_CLICK_DISPATCHED = "performing click action"
+
+
+def sliced_click(loc, timeout_ms, stop_evt=None) -> bool:
+    """
+    loc.click() przerywalne przez STOP i bez ryzyka podwójnego kliknięcia.
+
+    Gotowość elementu (widoczny, aktywny) sprawdzana kawałkami po STOP_SLICE_MS,
+    potem jedno click(no_wait_after=True). Pierwsza próba ma 2 x STOP_SLICE_MS,
+    każda kolejna dwa razy więcej (wolna strona też się doklika). Ponowienie
+    tylko, gdy log Playwrighta pokazuje, że zdarzenia myszy nie zostały wysłane.
+    """
+    deadline = time.monotonic() + int(timeout_ms) / 1000
+    attempt_ms = 2 * STOP_SLICE_MS
+    while not is_stopped(stop_evt):
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        if remaining_ms <= 0:
+            return False
+        if not sliced_wait(lambda ms: loc.wait_for(state="visible", timeout=ms), remaining_ms, stop_evt):
+            return False
+        try:
+            enabled = loc.is_enabled(timeout=STOP_SLICE_MS)
+        except PWTimeoutError:
+            continue   # element zniknął między sprawdzeniami
+        if not enabled:
+            sliced_sleep(STOP_SLICE_MS / 1000, stop_evt)
+            continue
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        try:
+            loc.click(timeout=int(max(1, min(attempt_ms, remaining_ms))), no_wait_after=True)
+            return True
+        except PWTimeoutError as e:
+            if PW_CLICK_DISPATCHED in str(e):
+                return True   # klik poszedł, timeout dopiero po nim – drugi raz nie klikamy
+        attempt_ms *= 2
+    return False
+
+
+def sliced_sleep(seconds, stop_evt=None):
+    """time.sleep(), który kończy się od razu po STOP."""
+    if stop_evt is None:
+        time.sleep(seconds)
+    else:
+        stop_evt.wait(seconds)
+
+
+# znacznik starego dokumentu: po nawigacji nowy dokument go nie ma
+NAV_MARK_JS = "() => { window.__vbsOldDoc = true; }"
+NAV_READY_JS = "() => !window.__vbsOldDoc && document.readyState !== 'loading'"
+
+
+def sliced_navigate(page, start, timeout_ms, stop_evt=None) -> bool:
+    """
+    Nawigacja przerywalna przez STOP. start(ms) rusza ją (reload/goto/go_back
+    z krótkim timeoutem – przeglądarka nawiguje dalej mimo timeoutu), a na nowy
+    dokument (DOMContentLoaded) czekamy kawałkami po STOP_SLICE_MS.
+    True = nowy dokument gotowy.
+    """
+    deadline = time.monotonic() + int(timeout_ms) / 1000
+    try:
+        page.evaluate(NAV_MARK_JS)
+    except Exception:
+        pass   # strona bez kontekstu JS – każdy gotowy dokument jest nowy
+    try:
+        start(STOP_SLICE_MS)
+    except PWTimeoutError:
+        pass
+    while not is_stopped(stop_evt) and time.monotonic() < deadline:
+        try:
+            if page.evaluate(NAV_READY_JS):
+                return True
+        except Exception:
+            pass   # kontekst w trakcie wymiany
+        sliced_sleep(STOP_SLICE_MS / 1000, stop_evt)
+    return False
+
+
+def wait_for_slots_loaded(page, timeout_ms, stop_evt=None):
+    """Czekaj aż zniknie 'Ładowanie slotów' (best-effort). False = nadal się ładuje."""
     try:
         loc = page.locator("text=Ładowanie slotów").first
         if loc.count() and loc.is_visible():
-            loc.wait_for(state="hidden", timeout=int(timeout_ms))
+            return sliced_wait(lambda ms: loc.wait_for(state="hidden", timeout=ms), timeout_ms, stop_evt)
     except Exception:
         pass
+    return True
 
 
-def ensure_slot_screen(page):
-    """Sprawdza, czy jesteśmy na ekranie wyboru slotów."""
+def is_slot_screen(page):
+    """True, jeśli strona pokazuje ekran wyboru slotów (STANDARDOWE + kafelki)."""
     try:
         has_std = page.locator("text=STANDARDOWE").count() > 0
         has_slot = page.locator(r"text=/\b\d{2}:\d{2}-\d{2}:\d{2}\b/").count() > 0
-        if has_std and has_slot:
-            return
+        return has_std and has_slot
     except Exception:
-        pass
+        return False
+
+
+def ensure_slot_screen(page):
+    """Sprawdza, czy jesteśmy na ekranie wyboru slotów."""
+    if is_slot_screen(page):
+        return
     raise RuntimeError(
         "Nie jestem na ekranie wyboru okienek (slotów). "
         "Otwórz awizację w widoku slotów (kalendarz + siatka slotów) i dopiero kliknij START."
@@ -153,26 +478,33 @@ def fast_read_slots(page):
     return out
 
 
-def click_standardowe(page, load_timeout):
+def click_standardowe(page, load_timeout, stop_evt=None):
     """Jedno kliknięcie STANDARDOWE = refresh."""
     try:
         btn = page.locator("text=STANDARDOWE").first
-        btn.scroll_into_view_if_needed()
-        btn.click(timeout=1500)
-        wait_for_slots_loaded(page, load_timeout)
-        return True
+        if not sliced_wait(lambda ms: btn.scroll_into_view_if_needed(timeout=ms), 1500, stop_evt):
+            return False
+        if not sliced_click(btn, 1500, stop_evt):
+            return False
+        return wait_for_slots_loaded(page, load_timeout, stop_evt)
     except Exception:
         return False
 
 
-def toast_no_slots(page):
-    """Toast: Brak dostępnych slotów."""
+def toast_no_slots(page, stop_evt=None, scope=None):
+    """Toast: Brak dostępnych slotów. scope: kontener toastów (RootRegistry) albo cała strona."""
+    q = scope if scope is not None else page
     try:
-        loc = page.locator("text=Brak dostępnych slotów").first
+        loc = q.locator("text=Brak dostępnych slotów").first
+        if scope is not None and scope is not page and not loc.count():
+            q = page   # kontener toastów mógł zostać utworzony na nowo
+            loc = q.locator("text=Brak dostępnych slotów").first
         if loc.count() and loc.is_visible():
-            # spróbuj zamknąć X
+            # spróbuj zamknąć X (tylko gdy jest – bez czekania na timeout)
             try:
-                page.locator("button:has-text('×')").first.click(timeout=300)
+                close = q.locator("button:has-text('×')").first
+                if close.count():
+                    sliced_click(close, 300, stop_evt)
             except Exception:
                 pass
             return True
@@ -190,286 +522,4375 @@ def success_visible(page):
         return False
 
 
-def success_confirmed(page, timeout_ms):
+def success_confirmed(page, timeout_ms, stop_evt=None):
     """Sukces tylko gdy pojawi się komunikat o wysłaniu do kierowcy."""
     try:
-        page.locator("text=Powiadomienie zostało wysłane do kierowcy").wait_for(timeout=int(timeout_ms))
-        return True
+        loc = page.locator("text=Powiadomienie zostało wysłane do kierowcy")
+        return sliced_wait(lambda ms: loc.wait_for(timeout=ms), timeout_ms, stop_evt)
     except Exception:
         return False
 
 
-def confirm_loop_fast(page, max_clicks=60):
+def confirm_loop_fast(page, max_clicks=60, stop_evt=None, click_to=CONFIRM_CLICK_MAX_MS, budget_ms=None,
+                      selectors=None, scope=None):
     """
     Szybkie klikanie potwierdzeń TAK/OK po kliknięciu slotu.
 
     Ważne: nie przerywaj od razu, gdy przycisku jeszcze nie ma.
     Modal może pojawić się po krótkiej animacji/opóźnieniu renderu.
+    Każde kliknięcie czeka do click_to kawałkami po STOP_SLICE_MS (STOP przerywa).
+    budget_ms: pętla kończy się też po tym czasie, jeśli nic nie kliknięto.
+    selectors: SelectorCalibrator – kolejność selektorów według zwycięzców.
+    scope: warstwa modali (RootRegistry) – przyciski szukane tylko w niej.
+    Selektor bez elementu (count() == 0) jest pomijany bez czekania na timeout.
+    Zwraca czas (ms) do pierwszego kliknięcia TAK/OK albo None.
     """
-    tak_selectors = [
-        "button:has-text('Tak')",
-        "[role='button']:has-text('Tak')",
-        "a:has-text('Tak')",
-        "text=/^\s*Tak\s*$/i",
-    ]
-    ok_selectors = [
-        "button:has-text('OK')",
-        "button:has-text('Ok')",
-        "[role='button']:has-text('OK')",
-        "[role='button']:has-text('Ok')",
-        "a:has-text('OK')",
-        "a:has-text('Ok')",
-        "text=/^\s*OK\s*$/i",
-        "text=/^\s*Ok\s*$/i",
-    ]
+    t0 = time.perf_counter()
+    first_ms = None
+    q = scope if scope is not None else page
+    tak_selectors = selectors.selectors("tak") if selectors is not None else TAK_SELECTORS
+    ok_selectors = selectors.selectors("ok") if selectors is not None else OK_SELECTORS
 
     for _ in range(max_clicks):
-        if success_visible(page):
-            return
+        if is_stopped(stop_evt) or success_visible(page):
+            return first_ms
+        if budget_ms is not None and first_ms is None and (time.perf_counter() - t0) * 1000 > budget_ms:
+            return None
 
         clicked = False
 
-        # Priorytet: TAK
-        for sel in tak_selectors:
-            try:
-                page.locator(sel).first.click(timeout=220)
-                clicked = True
-                break
-            except Exception:
-                pass
-
-        # Następnie OK / Ok
-        if not clicked:
-            for sel in ok_selectors:
+        # Priorytet: TAK, następnie OK / Ok
+        for group, sels in (("tak", tak_selectors), ("ok", ok_selectors)):
+            for sel in sels:
+                if is_stopped(stop_evt):
+                    return first_ms
                 try:
-                    page.locator(sel).first.click(timeout=220)
+                    loc = q.locator(sel).first
+                    if loc.count() == 0:
+                        continue
+                    if not sliced_click(loc, click_to, stop_evt):
+                        continue
                     clicked = True
+                    if selectors is not None:
+                        selectors.win(group, sel)
                     break
                 except Exception:
                     pass
+            if clicked:
+                break
+
+        if clicked and first_ms is None:
+            first_ms = (time.perf_counter() - t0) * 1000
 
         # Jeśli nic nie kliknięto, NIE kończymy od razu.
         # Dajemy czas na pojawienie się modala i próbujemy dalej.
-        time.sleep(0.01 if not clicked else 0.005)
-
-
-def get_selected_day_number(page):
-    """Best-effort: próba ustalenia zaznaczonego dnia w kalendarzu."""
-    selectors = [
-        "[aria-current='date']",
-        "button.active",
-        "a.active",
-        "td.active button",
-        "td.active a",
-        "td.active",
-    ]
-    for sel in selectors:
+        sliced_sleep(0.01 if not clicked else 0.005, stop_evt)
+    return first_ms
+
+
+def get_selected_day_number(page, selectors=None, scope=None):
+    """Best-effort: próba ustalenia zaznaczonego dnia w kalendarzu (scope: kontener kalendarza)."""
+    sels = selectors.selectors("day") if selectors is not None else DAY_SELECTORS
+    q = scope if scope is not None else page
+    for sel in sels:
+        try:
+            loc = q.locator(sel).first
+            if loc.count() and loc.is_visible():
+                txt = (loc.inner_text() or "").strip()
+                m = re.search(r"\b(\d{1,2})\b", txt)
+                if m:
+                    if selectors is not None:
+                        selectors.win("day", sel)
+                    return int(m.group(1))
+        except Exception:
+            pass
+    if scope is not None and scope is not page:
+        return get_selected_day_number(page, selectors)   # kontener kalendarza nieaktualny
+    return None
+
+
+def click_day_by_coordinates(page, day: dt.date, load_to: int, stop_evt=None):
+    """Kliknięcie dnia w kalendarzu po współrzędnych."""
+    label = str(day.day)
+
+    month_box = page.locator(
+        "xpath=//div[contains(., 'styczeń') or contains(., 'luty') or contains(., 'marzec') or contains(., 'kwiecień') or "
+        "contains(., 'maj') or contains(., 'czerwiec') or contains(., 'lipiec') or contains(., 'sierpień') or "
+        "contains(., 'wrzesień') or contains(., 'październik') or contains(., 'listopad') or contains(., 'grudzień')]"
+    ).first
+
+    cand = month_box.locator(f"xpath=.//*[normalize-space(text())='{label}']").first
+    if cand.count() == 0:
+        return False
+
+    try:
+        if not sliced_wait(lambda ms: cand.scroll_into_view_if_needed(timeout=ms), load_to, stop_evt):
+            return False
+        box = cand.bounding_box()
+        if not box:
+            return False
+        cx = box["x"] + box["width"] / 2
+        cy = box["y"] + box["height"] / 2
+        page.mouse.click(cx, cy)
+        wait_for_slots_loaded(page, load_to, stop_evt)
+        return True
+    except Exception:
+        return False
+
+
+def ensure_day_selected(page, day: dt.date, load_to: int, tries: int = 5, stop_evt=None, selectors=None,
+                        scope=None):
+    """Wymusza przejście na konkretny dzień – z retry."""
+    target = day.day
+    for _ in range(tries):
+        if is_stopped(stop_evt):
+            return False
+        cur = get_selected_day_number(page, selectors, scope)
+        if cur == target:
+            return True
+        ok = click_day_by_coordinates(page, day, load_to, stop_evt)
+        sliced_sleep(0.10, stop_evt)
+        cur2 = get_selected_day_number(page, selectors, scope)
+        if ok and cur2 == target:
+            return True
+    return False
+
+
+# ------------------ SELECTOR CALIBRATION ------------------
+
+TAK_SELECTORS = [
+    "button:has-text('Tak')",
+    "[role='button']:has-text('Tak')",
+    "a:has-text('Tak')",
+    "text=/^\s*Tak\s*$/i",
+]
+OK_SELECTORS = [
+    "button:has-text('OK')",
+    "button:has-text('Ok')",
+    "[role='button']:has-text('OK')",
+    "[role='button']:has-text('Ok')",
+    "a:has-text('OK')",
+    "a:has-text('Ok')",
+    "text=/^\s*OK\s*$/i",
+    "text=/^\s*Ok\s*$/i",
+]
+DAY_SELECTORS = [
+    "[aria-current='date']",
+    "button.active",
+    "a.active",
+    "td.active button",
+    "td.active a",
+    "td.active",
+]
+# kafelek slotu: {key} = "HH:00-HH:59", {rx} = to samo jako regex
+TILE_SELECTORS = [
+    "button:has-text('{key}')",
+    "a:has-text('{key}')",
+    "[role='button']:has-text('{key}')",
+    "text=/{rx}\\s+\\d+\\/\\d+/",
+]
+SELECTOR_GROUPS = {"tak": TAK_SELECTORS, "ok": OK_SELECTORS, "day": DAY_SELECTORS, "tile": TILE_SELECTORS}
+
+# odcisk wersji aplikacji i układu strony: inne paczki JS/CSS albo inny szkielet = inna kalibracja
+PAGE_BUILD_JS = r"""
+() => {
+  const scripts = [...document.scripts].map(s => s.src).filter(Boolean).sort().join("|");
+  const styles = [...document.querySelectorAll("link[rel=stylesheet]")].map(l => l.href).sort().join("|");
+  const root = document.body ? [...document.body.children].map(e => e.tagName).join(",") : "";
+  return location.pathname.replace(/\d+/g, "#") + "|" + root + "|" + scripts + "|" + styles;
+}
+"""
+
+
+class SelectorCalibrator:
+    """
+    Kolejność selektorów (TAK/OK, zaznaczony dzień, kafelek slotu) dla danej
+    wersji strony: martwe (0 elementów przy kalibracji) odcięte, zwycięzcy
+    (ostatnio skuteczny selektor) na początku. Wyniki zapamiętane per wersja
+    strony (PAGE_BUILD_JS), więc po powrocie do znanej wersji nie trzeba ich
+    liczyć od nowa. Metody wołane na wątku sesji.
+    """
+
+    def __init__(self):
+        self._builds = {}
+        self.build = None
+        self.order = {}
+        self.dead = {}
+
+    def check_build(self, js):
+        """Ustala wersję strony; True, jeśli zmieniła się od poprzedniego sprawdzenia."""
+        build = hashlib.sha1(js(PAGE_BUILD_JS).encode("utf-8")).hexdigest()[:10]
+        if build == self.build:
+            return False
+        self.build = build
+        cached = self._builds.setdefault(build, {
+            "order": {g: list(v) for g, v in SELECTOR_GROUPS.items()},
+            "dead": {g: set() for g in SELECTOR_GROUPS},
+            "calibrated": set(),
+        })
+        self.order = cached["order"]
+        self.dead = cached["dead"]
+        self._calibrated = cached["calibrated"]
+        return True
+
+    def is_calibrated(self, group):
+        return group in self._calibrated
+
+    def calibrate(self, page, group, **fmt):
+        """Liczy elementy każdego selektora grupy (bez czekania); żywe przodem, martwe odcięte."""
+        live, dead = [], set()
+        for sel in self.order[group]:
+            try:
+                n = page.locator(sel.format(**fmt) if fmt else sel).count()
+            except Exception:
+                n = 0
+            if n:
+                live.append(sel)
+            else:
+                dead.add(sel)
+        if live:
+            self.order[group] = live + [s for s in self.order[group] if s in dead]
+            self.dead[group] = dead
+        self._calibrated.add(group)
+        return live
+
+    def selectors(self, group):
+        """Selektory grupy w kolejności prób (bez martwych, o ile jest jakikolwiek żywy)."""
+        dead = self.dead.get(group, ())
+        order = self.order.get(group) or SELECTOR_GROUPS[group]
+        return [s for s in order if s not in dead] or order
+
+    def win(self, group, sel):
+        order = self.order.get(group)
+        if order and order[0] != sel and sel in order:
+            order.remove(sel)
+            order.insert(0, sel)
+        self.dead.get(group, set()).discard(sel)
+
+
+# ------------------ SCOPED ROOTS ------------------
+
+# kontenery strony oznaczane atrybutem data-ntq-root: zapytania szukają tylko wewnątrz nich.
+# Atrybut to lista nazw (jak class) – jeden element bywa kilkoma kontenerami naraz
+# (toast i modal w .cdk-overlay-container, siatka i kalendarz w jednym komponencie).
+ROOTS_RESOLVE_JS = r"""
+() => {
+  const found = {};
+  const tag = (name, el) => {
+    if (el && el !== document.body && el !== document.documentElement) {
+      const names = (el.getAttribute("data-ntq-root") || "").split(" ").filter(Boolean);
+      if (!names.includes(name)) names.push(name);
+      el.setAttribute("data-ntq-root", names.join(" "));
+      found[name] = el.tagName.toLowerCase();
+    }
+  };
+  document.querySelectorAll("[data-ntq-root]").forEach(el => el.removeAttribute("data-ntq-root"));
+
+  const rx = /\b\d{2}:\d{2}-\d{2}:\d{2}\s+\d+\/\d+/;
+  const tiles = [...document.querySelectorAll("button, a, [role=button], div, span")]
+    .filter(el => el.children.length <= 3 && (el.textContent || "").length < 80 && rx.test(el.textContent || ""));
+  // host komponentu (tag z '-') przeżywa przerysowanie listy kafelków / dni po odświeżeniu
+  const host = el => {
+    while (el && !el.tagName.includes("-")) el = el.parentElement;
+    return el;
+  };
+  let grid = tiles[0] || null;
+  while (grid && !tiles.every(t => grid.contains(t))) grid = grid.parentElement;
+  tag("grid", host(grid));
+
+  let cal = document.querySelector("[aria-current='date'], td.active, button.active");
+  while (cal && cal.querySelectorAll("td, button").length < 28) cal = cal.parentElement;
+  tag("calendar", host(cal));
+
+  // tylko stałe warstwy (pojedynczy dialog znika po kliknięciu)
+  tag("toast", document.querySelector("#toast-container, .toast-container, .cdk-overlay-container"));
+  tag("modal", document.querySelector(".cdk-overlay-container, .modal-container"));
+  return found;
+}
+"""
+# liczba różnych nazw kontenerów wciąż obecnych w DOM (porównywana z len(RootRegistry.roots))
+ROOTS_CONNECTED_JS = r"""
+() => new Set([...document.querySelectorAll("[data-ntq-root]")]
+  .flatMap(el => el.getAttribute("data-ntq-root").split(" ").filter(Boolean))).size
+"""
+
+# zapytanie typowe dla każdego kontenera – do logu kosztu (w kontenerze vs cała strona)
+ROOT_PROBES = {
+    "grid": r"text=/\d{2}:\d{2}-\d{2}:\d{2}/",
+    "calendar": DAY_SELECTORS[0],
+    "toast": "text=Brak dostępnych slotów",
+    "modal": TAK_SELECTORS[0],
+}
+
+
+class RootRegistry:
+    """
+    Kontenery strony (siatka slotów, kalendarz, toasty, warstwa modali)
+    odnajdywane raz jednym skryptem i oznaczane data-ntq-root; scope(name)
+    zwraca zapamiętany lokator kontenera (albo stronę, gdy go nie ma).
+    Nawigacja ramki głównej albo odpięty kontener = ponowne odnalezienie.
+    Metody wołane na wątku sesji.
+    """
+
+    def __init__(self, page, js, log):
+        self.page = page
+        self.js = js
+        self.log = log
+        self.roots = None
+        self.resolves = 0
+        self._scopes = {}
+        self._logged = None
+        page.on("framenavigated", self._on_nav)
+
+    def _on_nav(self, frame):
+        if frame == self.page.main_frame:
+            self.roots = None
+
+    def close(self):
+        try:
+            self.page.remove_listener("framenavigated", self._on_nav)
+        except Exception:
+            pass
+
+    def ensure(self):
+        if self.roots is None:
+            self.resolve()
+
+    def invalidate(self):
+        self.roots = None
+
+    def check(self, connected):
+        """connected = liczba różnych nazw kontenerów w DOM (z sondy nadzorcy, jak ROOTS_CONNECTED_JS)."""
+        if self.roots is not None and connected is not None and connected < len(self.roots):
+            self.roots = None
+
+    def resolve(self):
+        t0 = time.perf_counter()
+        try:
+            self.roots = self.js(ROOTS_RESOLVE_JS) or {}
+        except Exception:
+            self.roots = {}
+        self._scopes = {}
+        self.resolves += 1
+        ms = (time.perf_counter() - t0) * 1000
+        if self.roots != self._logged:   # log tylko przy zmianie zestawu kontenerów
+            self._logged = dict(self.roots)
+            found = ", ".join(f"{k}={v}" for k, v in self.roots.items()) or "brak"
+            self.log(f"[ROOT] Kontenery #{self.resolves} ({ms:.1f} ms): {found} | koszt zapytań: {self.measure()}")
+
+    def miss(self, name):
+        """Zapytanie w kontenerze nic nie znalazło, a na stronie tak – kontener do ponownego odnalezienia."""
+        if self.roots and name in self.roots:
+            self.roots = None
+
+    def scope(self, name):
+        if not self.roots or name not in self.roots:
+            return self.page
+        loc = self._scopes.get(name)
+        if loc is None:
+            loc = self._scopes[name] = self.page.locator(f"[data-ntq-root~='{name}']")
+        return loc
+
+    def measure(self):
+        """Czas typowego zapytania w kontenerze vs na całej stronie (ms)."""
+        parts = []
+        for name in self.roots:
+            sel = ROOT_PROBES.get(name)
+            if sel is None:
+                continue
+            try:
+                t0 = time.perf_counter()
+                self.scope(name).locator(sel).count()
+                t1 = time.perf_counter()
+                self.page.locator(sel).count()
+                t2 = time.perf_counter()
+            except Exception:
+                continue
+            parts.append(f"{name} {(t1 - t0) * 1000:.1f} ms (strona {(t2 - t1) * 1000:.1f} ms)")
+        return ", ".join(parts) or "—"
+
+
+# ------------------ RAW CDP CLIENT (WebSocket) ------------------
+
+RAW_CDP_TIMEOUT_S = 5.0
+
+
+class CdpError(RuntimeError):
+    pass
+
+
+class CdpClient:
+    """
+    Minimalny klient CDP po WebSocket (RFC 6455) – bez sterownika node Playwrighta.
+
+    Łączy się bezpośrednio z celem karty (ws://127.0.0.1:9222/devtools/page/<id>)
+    i obsługuje to, czego potrzebuje gorąca pętla: send() dowolnej metody
+    (Runtime.evaluate, Input.dispatchMouseEvent, ...), evaluate() jak page.evaluate
+    oraz zdarzenia (Network.*, Page.*) przez on(). Rzadsze operacje zostają
+    w Playwright. Bezpieczny wątkowo; odbiór na własnym wątku.
+    """
+
+    def __init__(self, ws_url, timeout=RAW_CDP_TIMEOUT_S):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._listeners = {}
+        self._next_id = 0
+        self._closed = threading.Event()
+        self._connect()
+        threading.Thread(target=self._reader, daemon=True).start()
+
+    @classmethod
+    def for_page(cls, page, endpoint=CDP_ENDPOINT):
+        """Klient dla karty Playwrighta (cel ustalany po targetId, nie po URL)."""
+        pw_cdp = page.context.new_cdp_session(page)
+        try:
+            target_id = pw_cdp.send("Target.getTargetInfo")["targetInfo"]["targetId"]
+        finally:
+            pw_cdp.detach()
+        host = urlsplit(endpoint).netloc
+        return cls(f"ws://{host}/devtools/page/{target_id}")
+
+    # ---------- API ----------
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def send(self, method, params=None, timeout=None):
+        """Wywołanie metody CDP; zwraca 'result' albo rzuca CdpError."""
+        if self.closed:
+            raise CdpError("Połączenie CDP zamknięte")
+        fut = Future()
+        with self._send_lock:
+            self._next_id += 1
+            msg_id = self._next_id
+            self._pending[msg_id] = fut
+            payload = json.dumps({"id": msg_id, "method": method, "params": params or {}})
+            try:
+                self._send_frame(0x1, payload.encode("utf-8"))
+            except OSError as e:
+                self._pending.pop(msg_id, None)
+                self._shutdown()
+                raise CdpError(str(e))
+        try:
+            return fut.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            # wolna karta / natywny dialog blokuje JS – wołający przechodzi na Playwright
+            raise CdpError(f"Brak odpowiedzi CDP na {method} w {timeout or self.timeout} s")
+        finally:
+            self._pending.pop(msg_id, None)
+
+    def post(self, method, params=None):
+        """Wysyła metodę CDP bez czekania na odpowiedź (bezpieczne w callbackach on())."""
+        if self.closed:
+            return
+        with self._send_lock:
+            self._next_id += 1
+            payload = json.dumps({"id": self._next_id, "method": method, "params": params or {}})
+            try:
+                self._send_frame(0x1, payload.encode("utf-8"))
+            except OSError:
+                self._shutdown()
+
+    def evaluate(self, js_function, arg=None):
+        """Jak page.evaluate(js_function, arg): funkcja JS jako tekst, wynik jako wartość."""
+        expr = f"({js_function})({json.dumps(arg)})"
+        res = self.send("Runtime.evaluate", {
+            "expression": expr,
+            "returnByValue": True,
+            "awaitPromise": True,
+        })
+        if "exceptionDetails" in res:
+            raise CdpError(res["exceptionDetails"].get("text", "JS exception"))
+        return res.get("result", {}).get("value")
+
+    def on(self, method, callback):
+        """callback(params) dla zdarzenia CDP (wołany na wątku odbioru – ma być krótki)."""
+        self._listeners.setdefault(method, []).append(callback)
+
+    def off(self, method, callback):
+        try:
+            self._listeners.get(method, []).remove(callback)
+        except ValueError:
+            pass
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            with self._send_lock:
+                self._send_frame(0x8, b"")
+        except OSError:
+            pass
+        self._shutdown()
+
+    # ---------- WebSocket ----------
+
+    def _connect(self):
+        parts = urlsplit(self.ws_url)
+        host, _, port = parts.netloc.partition(":")
+        sock = socket.create_connection((host, int(port or 80)), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        sock.sendall((
+            f"GET {parts.path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii"))
+
+        resp = b""
+        while b"\r\n\r\n" not in resp:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise CdpError("WebSocket: serwer zamknął połączenie")
+            resp += chunk
+        head, _, rest = resp.partition(b"\r\n\r\n")
+        status_line = head.split(b"\r\n", 1)[0]
+        if b" 101 " not in status_line:
+            raise CdpError(f"WebSocket: {status_line.decode('latin-1')}")
+        accept = base64.b64encode(hashlib.sha1(
+            (key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode("ascii")
+        ).digest())
+        if accept not in head:
+            raise CdpError("WebSocket: błędny Sec-WebSocket-Accept")
+
+        sock.settimeout(None)
+        self._sock = sock
+        self._buf = rest
+
+    def _send_frame(self, opcode, payload):
+        n = len(payload)
+        if n < 126:
+            header = bytes([0x80 | opcode, 0x80 | n])
+        elif n < 65536:
+            header = bytes([0x80 | opcode, 0x80 | 126]) + n.to_bytes(2, "big")
+        else:
+            header = bytes([0x80 | opcode, 0x80 | 127]) + n.to_bytes(8, "big")
+        mask = os.urandom(4)
+        # XOR całego bufora naraz (szybciej niż bajt po bajcie)
+        m = int.from_bytes((mask * (n // 4 + 1))[:n], "big")
+        masked = (int.from_bytes(payload, "big") ^ m).to_bytes(n, "big") if n else b""
+        self._sock.sendall(header + mask + masked)
+
+    def _recv_exact(self, n):
+        while len(self._buf) < n:
+            chunk = self._sock.recv(max(65536, n - len(self._buf)))
+            if not chunk:
+                raise OSError("WebSocket: koniec strumienia")
+            self._buf += chunk
+        out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+    def _recv_message(self):
+        parts = []
+        while True:
+            b0, b1 = self._recv_exact(2)
+            opcode = b0 & 0x0F
+            n = b1 & 0x7F
+            if n == 126:
+                n = int.from_bytes(self._recv_exact(2), "big")
+            elif n == 127:
+                n = int.from_bytes(self._recv_exact(8), "big")
+            mask = self._recv_exact(4) if b1 & 0x80 else None
+            data = self._recv_exact(n)
+            if mask:
+                data = bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                with self._send_lock:
+                    self._send_frame(0xA, data)
+                continue
+            if opcode == 0xA:
+                continue
+
+            parts.append(data)
+            if b0 & 0x80:
+                return b"".join(parts)
+
+    def _reader(self):
+        try:
+            while True:
+                raw = self._recv_message()
+                if raw is None:
+                    break
+                msg = json.loads(raw)
+                if "id" in msg:
+                    fut = self._pending.get(msg["id"])
+                    if fut is None:
+                        continue
+                    if "error" in msg:
+                        fut.set_exception(CdpError(msg["error"].get("message", "CDP error")))
+                    else:
+                        fut.set_result(msg.get("result", {}))
+                else:
+                    for cb in list(self._listeners.get(msg.get("method"), ())):
+                        try:
+                            cb(msg.get("params", {}))
+                        except Exception:
+                            pass
+        except (OSError, ValueError):
+            pass
+        self._shutdown()
+
+    def _shutdown(self):
+        self._closed.set()
+        try:
+            self._sock.close()
+        except Exception:
+            pass
+        for fut in list(self._pending.values()):
+            if not fut.done():
+                fut.set_exception(CdpError("Połączenie CDP zamknięte"))
+        self._pending.clear()
+
+
+def read_slots_raw(raw):
+    """Jak fast_read_slots, ale jednym Runtime.evaluate przez CdpClient."""
+    return {t["key"]: (t["used"], t["total"]) for t in raw.evaluate(SLOT_TILES_JS)}
+
+
+# ------------------ FAST CLICK (CDP Input) ------------------
+
+FAST_CLICK_VERIFY_MS = 300   # ile czekamy na reakcję strony po szybkim kliknięciu
+VIEWPORT_MARGIN_PX = 40
+
+# Jedno wywołanie = aktualne położenie wszystkich kafelków slotów (współrzędne viewportu).
+SLOT_TILES_JS = r"""
+() => {
+  const re = /(\d{2}:\d{2})-(\d{2}:\d{2})\s+(\d+)\/(\d+)/;
+  const out = [];
+  const seen = new Set();
+  const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+  let n;
+  while ((n = walker.nextNode())) {
+    if (!/\d{2}:\d{2}-\d{2}:\d{2}/.test(n.nodeValue)) continue;
+    let el = n.parentElement, m = null;
+    for (let i = 0; el && i < 6; i++, el = el.parentElement) {
+      m = re.exec(el.innerText || "");
+      if (m) break;
+    }
+    if (!m || !el) continue;
+    const tile = el.closest("button, a, [role='button']") || el;
+    if (seen.has(tile)) continue;
+    seen.add(tile);
+    const r = tile.getBoundingClientRect();
+    const x = r.left + r.width / 2, y = r.top + r.height / 2;
+    const inView = r.width > 0 && r.top >= 0 && r.left >= 0 &&
+                   r.bottom <= innerHeight && r.right <= innerWidth;
+    const hit = inView ? document.elementFromPoint(x, y) : null;
+    out.push({
+      key: m[1] + "-" + m[2], used: +m[3], total: +m[4],
+      x, y, top: r.top + scrollY, bottom: r.bottom + scrollY,
+      inView, hit: !!hit && (tile === hit || tile.contains(hit)),
+    });
+  }
+  return out;
+}
+"""
+
+# Czy po kliknięciu kafelka strona zareagowała (modal TAK/OK, toast albo sukces)?
+# mark=true: zapamiętuje reakcje widoczne teraz (linia bazowa tuż przed kliknięciem);
+# mark=false: true tylko dla reakcji, której nie było w linii bazowej.
+CLICK_REACTION_JS = r"""
+(mark) => {
+  const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+  const found = [];
+  for (const b of document.querySelectorAll("button, a, [role='button']")) {
+    if (/^\s*(Tak|OK|Ok)\s*$/i.test(b.innerText || "") && visible(b)) found.push(b);
+  }
+  const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+  let n;
+  while ((n = walker.nextNode())) {
+    const v = n.nodeValue;
+    if (!v.includes("Brak dostępnych slotów") && !v.includes("Powiadomienie zostało wysłane do kierowcy")) continue;
+    if (n.parentElement && visible(n.parentElement)) found.push(n.parentElement);
+  }
+  if (mark) {
+    for (const el of found) el.__ntqSeen = true;
+    return false;
+  }
+  return found.some((el) => !el.__ntqSeen);
+}
+"""
+
+
+class FastClicker:
+    """
+    Szybki klik kafelka: współrzędne z jednego snapshotu DOM i
+    Input.dispatchMouseEvent przez CDPSession – bez sprawdzeń actionability
+    i kilku roundtripów zwykłego click().
+
+    Przy podpięciu dopasowuje viewport tak, żeby cała siatka była na ekranie.
+    Po kliknięciu sprawdza reakcję strony – tylko nową względem linii bazowej
+    zebranej tuż przed kliknięciem (stary toast/modal to nie sukces); brak
+    reakcji = False i Worker klika zwykłym click().
+    """
+
+    def __init__(self, page, raw=None):
+        self.page = page
+        # z CdpClient: wszystko jednym skokiem WebSocket, bez sterownika Playwrighta
+        self.raw = raw
+        self.cdp = raw if raw is not None else page.context.new_cdp_session(page)
+        self.js = raw.evaluate if raw is not None else page.evaluate
+        self._metrics_overridden = False
+
+    def fit_grid(self):
+        """Przewija / powiększa viewport tak, by wszystkie kafelki były widoczne."""
+        tiles = self.js(SLOT_TILES_JS)
+        if not tiles:
+            return
+        top = min(t["top"] for t in tiles)
+        bottom = max(t["bottom"] for t in tiles)
+        vp = self.js("() => ({w: innerWidth, h: innerHeight})")
+
+        if bottom - top + 2 * VIEWPORT_MARGIN_PX > vp["h"]:
+            self.cdp.send("Emulation.setDeviceMetricsOverride", {
+                "width": 0,
+                "height": int(bottom - top + 2 * VIEWPORT_MARGIN_PX),
+                "deviceScaleFactor": 0,
+                "mobile": False,
+            })
+            self._metrics_overridden = True
+        self.js("(y) => window.scrollTo(0, y)", max(0, top - VIEWPORT_MARGIN_PX))
+
+    def click_tile(self, slot_key, stop_evt=None) -> bool:
+        """True = kliknięto i strona zareagowała (potwierdzone sondą)."""
+        tile = self._find(slot_key)
+        if tile is None or not tile["inView"]:
+            self.fit_grid()
+            tile = self._find(slot_key)
+        if tile is None or not tile["hit"]:
+            return False
+
+        # linia bazowa tuż przed kliknięciem: stare toasty/modale nie liczą się jako reakcja
+        self.js(CLICK_REACTION_JS, True)
+
+        for typ in ("mouseMoved", "mousePressed", "mouseReleased"):
+            self.cdp.send("Input.dispatchMouseEvent", {
+                "type": typ, "x": tile["x"], "y": tile["y"],
+                "button": "left" if typ != "mouseMoved" else "none",
+                "clickCount": 1 if typ != "mouseMoved" else 0,
+            })
+
+        return self.verify(stop_evt)
+
+    def verify(self, stop_evt=None) -> bool:
+        deadline = time.monotonic() + FAST_CLICK_VERIFY_MS / 1000
+        while not is_stopped(stop_evt):
+            if self.js(CLICK_REACTION_JS, False):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            sliced_sleep(0.01, stop_evt)
+        return False
+
+    def detach(self):
+        try:
+            if self._metrics_overridden:
+                self.cdp.send("Emulation.clearDeviceMetricsOverride")
+            if self.raw is None:
+                self.cdp.detach()
+        except Exception:
+            pass
+
+    def _find(self, slot_key):
+        for t in self.js(SLOT_TILES_JS):
+            if t["key"] == slot_key:
+                return t
+        return None
+
+
+# ------------------ REDUCED MOTION ------------------
+
+NO_MOTION_STYLE_ID = "ntq-no-motion"
+NO_MOTION_CSS = (
+    "*,*::before,*::after{"
+    "transition-duration:0s!important;transition-delay:0s!important;"
+    "animation-duration:0s!important;animation-delay:0s!important;"
+    "animation-iteration-count:1!important;scroll-behavior:auto!important}"
+)
+
+# działa też przed zbudowaniem DOM (addScriptToEvaluateOnNewDocument)
+NO_MOTION_INSTALL_JS = r"""
+(() => {
+  const add = () => {
+    if (document.getElementById("%(id)s")) return;
+    const s = document.createElement("style");
+    s.id = "%(id)s";
+    s.textContent = %(css)s;
+    (document.head || document.documentElement).appendChild(s);
+  };
+  if (document.documentElement) add();
+  else document.addEventListener("DOMContentLoaded", add);
+})()
+""" % {"id": NO_MOTION_STYLE_ID, "css": json.dumps(NO_MOTION_CSS)}
+
+
+class MotionSuppressor:
+    """
+    Karta bez animacji: przejścia i animacje CSS o zerowym czasie, brak płynnego
+    przewijania oraz prefers-reduced-motion. Modale TAK/OK, toast i loader
+    pojawiają się od razu zamiast po animacji.
+
+    Styl jest wstrzykiwany teraz i (Page.addScriptToEvaluateOnNewDocument)
+    po każdej nawigacji; remove() cofa wszystko na STOP.
+    """
+
+    def __init__(self, cdp):
+        self.cdp = cdp
+        self._script_id = None
+
+    def apply(self):
+        self._script_id = self.cdp.send(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": NO_MOTION_INSTALL_JS}
+        ).get("identifier")
+        self.cdp.send("Runtime.evaluate", {"expression": NO_MOTION_INSTALL_JS})
+        self.cdp.send("Emulation.setEmulatedMedia", {
+            "features": [{"name": "prefers-reduced-motion", "value": "reduce"}],
+        })
+
+    def remove(self):
+        try:
+            if self._script_id:
+                self.cdp.send("Page.removeScriptToEvaluateOnNewDocument", {"identifier": self._script_id})
+            self.cdp.send("Runtime.evaluate", {
+                "expression": f"document.getElementById('{NO_MOTION_STYLE_ID}')?.remove()",
+            })
+            self.cdp.send("Emulation.setEmulatedMedia", {"features": []})
+        except Exception:
+            pass
+        self._script_id = None
+
+
+# ------------------ RESOURCE BLOCKING ------------------
+
+BLOCK_ALLOW_HOSTS = (EBRAMA_URL_PART,)              # API + paczki aplikacji
+BLOCK_ALWAYS_TYPES = ("Image", "Font", "Media")     # niepotrzebne do rezerwacji nawet z eBramy
+# XHR/Fetch/Document nie są przechwytywane – gorąca ścieżka API bez dodatkowego skoku
+BLOCK_INTERCEPT_TYPES = BLOCK_ALWAYS_TYPES + ("Script", "Stylesheet", "Ping", "Other")
+
+# rozmiary pobranych zasobów + hosty paczek aplikacji (runtime/polyfills/main/... – także z CDN)
+RESOURCE_SIZES_JS = r"""
+() => {
+  const sizes = {}, bundles = new Set();
+  const bundle = /\/(runtime|polyfills|main|vendor|scripts|styles)[.-][^\/?]*\.(m?js|css)(\?|$)/;
+  for (const e of performance.getEntriesByType("resource")) {
+    sizes[e.name] = e.transferSize || e.encodedBodySize || 0;
+    if (bundle.test(e.name)) {
+      try { bundles.add(new URL(e.name).hostname); } catch (err) {}
+    }
+  }
+  return { sizes, bundles: [...bundles] };
+}
+"""
+
+
+def _host_allowed(url, hosts):
+    host = urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+class ResourceBlocker:
+    """
+    Opcjonalna polityka zasobów dla karty eBramy (Fetch.enable przez CDP).
+
+    Przepuszcza skrypty/style z BLOCK_ALLOW_HOSTS i z hostów, z których karta
+    już pobrała paczki aplikacji (CDN), blokuje obrazki, czcionki, media
+    i skrypty obcych hostów. Liczy zablokowane żądania i szacuje zaoszczędzone
+    bajty (rozmiary z performance API sprzed włączenia – tylko szacunek).
+    remove() wyłącza przechwytywanie – zwykłe przeglądanie działa jak wcześniej.
+    Gdy kanału CDP nie da się użyć (Fetch.disable / odpowiedź na żądanie nie
+    przechodzi), kanał jest zamykany: Chrome zdejmuje wtedy przechwytywanie
+    tej sesji i wstrzymane żądania idą dalej zamiast wisieć.
+    """
+
+    def __init__(self, cdp, js):
+        self.cdp = cdp
+        self.js = js
+        # z CdpClient nie wolno czekać na odpowiedź w callbacku (wątek odbioru)
+        self._post = getattr(cdp, "post", None) or cdp.send
+        self._sizes = {}
+        self.allow = set(BLOCK_ALLOW_HOSTS)
+        self.blocked = 0
+        self.bytes_saved = 0
+
+    def install(self):
+        try:
+            seen = self.js(RESOURCE_SIZES_JS) or {}
+        except Exception:
+            seen = {}
+        self._sizes = seen.get("sizes") or {}
+        self.allow.update(seen.get("bundles") or ())
+        self.cdp.on("Fetch.requestPaused", self._on_paused)
+        try:
+            self.cdp.send("Fetch.enable", {
+                "patterns": [
+                    {"urlPattern": "*", "resourceType": t, "requestStage": "Request"}
+                    for t in BLOCK_INTERCEPT_TYPES
+                ],
+            })
+        except Exception:
+            self.remove()
+            raise
+
+    def remove(self):
+        try:
+            self.cdp.send("Fetch.disable")
+        except Exception:
+            self._drop_channel()
+        off = getattr(self.cdp, "off", None) or getattr(self.cdp, "remove_listener", None)
+        if off:
+            try:
+                off("Fetch.requestPaused", self._on_paused)
+            except Exception:
+                pass
+
+    def _drop_channel(self):
+        """Zamyka kanał CDP (CdpClient.close / CDPSession.detach) – koniec przechwytywania."""
+        close = getattr(self.cdp, "close", None) or getattr(self.cdp, "detach", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def summary(self):
+        return f"zablokowano {self.blocked} żądań, zaoszczędzono ~{self.bytes_saved / 1024:.0f} kB (szacunek)"
+
+    def _on_paused(self, params):
+        url = params.get("request", {}).get("url", "")
+        rtype = params.get("resourceType", "")
+        block = rtype in BLOCK_ALWAYS_TYPES or not _host_allowed(url, self.allow)
+        try:
+            if not block:
+                self._post("Fetch.continueRequest", {"requestId": params["requestId"]})
+                return
+            self._post("Fetch.failRequest", {"requestId": params["requestId"], "errorReason": "BlockedByClient"})
+        except Exception:
+            self._drop_channel()
+            return
+        self.blocked += 1
+        self.bytes_saved += int(self._sizes.get(url, 0))
+
+
+# ------------------ BACKGROUND THROTTLING ------------------
+
+# flagi Chrome (launcher / start_NTQ_VBS.bat): zminimalizowane okno nie zwalnia timerów i renderu
+CHROME_ANTI_THROTTLE_FLAGS = (
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+)
+ITER_STATS_EVERY = 20   # co ile iteracji pętli log z czasem iteracji
+
+
+class FocusKeeper:
+    """
+    Karta zachowuje się jak widoczna i aktywna, nawet gdy okno Chrome jest
+    zminimalizowane lub w tle: emulacja fokusu i stan cyklu życia 'active'.
+    """
+
+    def __init__(self, cdp):
+        self.cdp = cdp
+
+    def apply(self):
+        self.cdp.send("Emulation.setFocusEmulationEnabled", {"enabled": True})
+        self.cdp.send("Page.setWebLifecycleState", {"state": "active"})
+
+    def remove(self):
+        try:
+            self.cdp.send("Emulation.setFocusEmulationEnabled", {"enabled": False})
+        except Exception:
+            pass
+
+
+# ------------------ PAGE SUPERVISOR ------------------
+
+SUPERVISOR_LOADER_HUNG_MS = 10000     # "Ładowanie slotów" dłużej niż to (min. 2x load_to) = zawieszona siatka
+SUPERVISOR_RECOVERY_BUDGET_S = 20.0   # reload + powrót na ekran slotów muszą się zmieścić w tym czasie
+SUPERVISOR_PAUSE_POLL_S = 1.0         # co ile sprawdzamy, czy ekran slotów wrócił (pauza po wylogowaniu)
+
+PAGE_HEALTH_JS = r"""
+() => {
+  const t = document.body ? document.body.innerText : "";
+  return {
+    url: location.href,
+    loader: t.includes("Ładowanie slotów"),
+    slots: t.includes("STANDARDOWE") && /\b\d{2}:\d{2}-\d{2}:\d{2}\b/.test(t),
+    login: /\/login\b/i.test(location.pathname) || !!document.querySelector("input[type='password']"),
+    roots: new Set([...document.querySelectorAll("[data-ntq-root]")]
+      .flatMap(el => el.getAttribute("data-ntq-root").split(" ").filter(Boolean))).size,
+  };
+}
+"""
+
+
+class PageSupervisor:
+    """
+    Zdrowie karty co cykl: adres, wiek loadera "Ładowanie slotów" i znaczniki
+    ekranu slotów. Wylogowanie / zgubiony ekran -> pauza rezerwacji + alarm;
+    zawieszona siatka -> reload i powrót na ekran slotów (makro nawigacji,
+    a bez niego ostatni dobry adres ekranu slotów).
+    check() zwraca True, gdy w tym cyklu można odświeżać i klikać.
+    """
+
+    def __init__(self, ui, stop_evt, js, load_to, renavigate=None):
+        self.ui = ui
+        self.stop_evt = stop_evt
+        self.js = js
+        self.renavigate = renavigate   # renavigate(page, budget_s) -> bool
+        self.hung_ms = max(SUPERVISOR_LOADER_HUNG_MS, 2 * int(load_to))
+        self.good_url = None
+        self.loader_since = None
+        self.paused_at = None
+        self.recoveries = 0
+        self.last = None   # ostatnia sonda (np. liczba kontenerów data-ntq-root)
+
+    def probe(self):
+        try:
+            return self.js(PAGE_HEALTH_JS)
+        except Exception:
+            return None
+
+    def check(self, page):
+        h = self.last = self.probe()
+        if h is None:
+            return True   # błąd odczytu obsłuży pętla (reconnect)
+
+        if h["slots"] and not h["login"]:
+            if self.paused_at is not None:
+                s = time.perf_counter() - self.paused_at
+                self.paused_at = None
+                self.ui.log(f"[SUP] Ekran slotów wrócił – wznawiam rezerwację (przerwa {s:.0f} s).")
+            self.good_url = h["url"]
+
+        if h["loader"]:
+            now = time.perf_counter()
+            if self.loader_since is None:
+                self.loader_since = now
+            elif (now - self.loader_since) * 1000 > self.hung_ms:
+                self.ui.log(f"[SUP] Siatka ładuje się ponad {self.hung_ms} ms – odświeżam kartę.")
+                if self.recover(page):
+                    return True
+                return self.pause("Siatka slotów zawieszona i nie udało się jej odzyskać.")
+            return True
+        self.loader_since = None
+
+        if h["login"] or EBRAMA_URL_PART not in h["url"]:
+            return self.pause("Wylogowano z eBramy – zaloguj się i wróć do ekranu slotów.")
+        if not h["slots"]:
+            if self.paused_at is None and self.recover(page):
+                return True
+            return self.pause("Zgubiony ekran slotów – wróć do widoku slotów awizacji.")
+        return True
+
+    def recover(self, page):
+        """
+        page.reload() (i ewentualnie makro / ponowne wejście na good_url) w budżecie czasu.
+        Nawigacje idą przez sliced_navigate – STOP przerywa je w ciągu STOP_SLICE_MS.
+        """
+        t0 = time.perf_counter()
+        deadline = t0 + SUPERVISOR_RECOVERY_BUDGET_S
+        half_ms = int(SUPERVISOR_RECOVERY_BUDGET_S * 1000 / 2)
+        self.loader_since = None
+        try:
+            # połowa budżetu na sam reload; jeśli SPA wylądowała gdzie indziej – ponowne wejście
+            sliced_navigate(page, lambda ms: page.reload(wait_until="commit", timeout=ms), half_ms, self.stop_evt)
+            ok = self.wait_slot_screen(t0 + SUPERVISOR_RECOVERY_BUDGET_S / 2)
+            if not ok and self.renavigate is not None and not self.stop_evt.is_set():
+                ok = self.renavigate(page, max(1.0, deadline - time.perf_counter()))
+            elif not ok and self.good_url and not self.stop_evt.is_set():
+                left_ms = max(1000, int((deadline - time.perf_counter()) * 1000))
+                url = self.good_url
+                sliced_navigate(
+                    page, lambda ms: page.goto(url, wait_until="commit", timeout=ms), left_ms, self.stop_evt
+                )
+                ok = self.wait_slot_screen(deadline)
+        except Exception as e:
+            self.ui.log(f"[SUP] Odzyskiwanie karty nie powiodło się ({e}).")
+            ok = False
+
+        ms = (time.perf_counter() - t0) * 1000
+        if ok:
+            self.recoveries += 1
+            self.ui.log(f"[METRYKA] Odzyskanie ekranu slotów: {ms:.0f} ms (#{self.recoveries})")
+        else:
+            self.ui.log(f"[SUP] Ekran slotów nie wrócił w {ms:.0f} ms.")
+        return ok
+
+    def wait_slot_screen(self, deadline):
+        while not self.stop_evt.is_set() and time.perf_counter() < deadline:
+            h = self.probe()
+            if h is not None and h["login"]:
+                return False
+            if h is not None and h["slots"] and not h["loader"]:
+                self.good_url = h["url"]
+                return True
+            self.stop_evt.wait(STOP_SLICE_MS / 1000)
+        return False
+
+    def pause(self, reason):
+        if self.paused_at is None:
+            self.paused_at = time.perf_counter()
+            self.ui.log(f"[SUP] {reason} Rezerwacja wstrzymana.")
+            self.ui.emit_notification("page_alert")
+            self.ui.popup("Uwaga", reason)
+        return False
+
+
+# ------------------ NAVIGATION MACROS ------------------
+
+MACROS_FILE = SETTINGS_FILE.parent / "macros.json"
+LEDGER_FILE = SETTINGS_FILE.parent / "ledger.json"
+MACRO_STEP_TIMEOUT_MS = 5000    # pojedynczy krok (element po nawigacji SPA może pojawić się później)
+MACRO_REPLAY_BUDGET_S = 30.0
+MACRO_POLL_MS = 500             # co ile nagrywanie sprawdza, czy doszło do ekranu slotów
+
+# kliknięcia użytkownika -> sessionStorage (przetrwa przeładowanie karty w trakcie nagrywania)
+MACRO_RECORD_JS = r"""
+() => {
+  if (window.__ntqRec) return;
+  window.__ntqRec = true;
+  const clickable = "button,a,[role=button],[role=tab],[role=option],[role=row],tr,li,td,mat-option";
+  document.addEventListener("click", ev => {
+    if (!ev.isTrusted || !sessionStorage.getItem("__ntqRecOn")) return;
+    const el = (ev.target.closest && ev.target.closest(clickable)) || ev.target;
+    const text = (el.innerText || el.value || "").replace(/\s+/g, " ").trim().slice(0, 60);
+    const steps = JSON.parse(sessionStorage.getItem("__ntqMacro") || "[]");
+    steps.push({ tag: el.tagName.toLowerCase(), id: el.id || "", text });
+    sessionStorage.setItem("__ntqMacro", JSON.stringify(steps));
+  }, true);
+}
+"""
+MACRO_BEGIN_JS = "() => { sessionStorage.setItem('__ntqRecOn', '1'); sessionStorage.removeItem('__ntqMacro'); }"
+MACRO_TAKE_JS = r"""
+() => {
+  const s = sessionStorage.getItem("__ntqMacro");
+  sessionStorage.removeItem("__ntqMacro");
+  sessionStorage.removeItem("__ntqRecOn");
+  return JSON.parse(s || "[]");
+}
+"""
+
+
+def macro_selector(step):
+    """Szybki selektor kroku: stałe id, inaczej tag + tekst. None = kroku nie da się odtworzyć."""
+    if step.get("id") and not re.search(r"\d", step["id"]):   # id z licznikiem (mat-option-12) są losowe
+        return f"#{step['id']}"
+    if step.get("text"):
+        return f"{step['tag']}:has-text({json.dumps(step['text'], ensure_ascii=False)})"
+    return None
+
+
+def compact_macro(url, steps):
+    """Nagrane kroki -> skrypt {url, steps: [selektory]} (bez powtórzonych kliknięć)."""
+    out = []
+    for step in steps:
+        sel = macro_selector(step)
+        if sel and (not out or out[-1] != sel):
+            out.append(sel)
+    return {"url": url, "steps": out, "recorded": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def load_macros():
+    try:
+        data = json.loads(MACROS_FILE.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_macros(macros):
+    MACROS_FILE.write_text(json.dumps(macros, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+class MacroRecorder:
+    """
+    Nagrywa kliknięcia na karcie eBramy od bieżącej strony aż do ekranu slotów.
+    Wszystkie metody wołane na wątku sesji CDP.
+    """
+
+    def __init__(self, page, cdp):
+        self.page = page
+        self.cdp = cdp
+        self.url = page.url
+        self._script_id = None
+
+    def start(self):
+        res = self.cdp.send("Page.addScriptToEvaluateOnNewDocument", {"source": f"({MACRO_RECORD_JS})()"})
+        self._script_id = res.get("identifier")
+        self.page.evaluate(MACRO_RECORD_JS)
+        self.page.evaluate(MACRO_BEGIN_JS)
+
+    def poll(self):
+        """None, dopóki nie ma ekranu slotów; potem gotowe makro."""
+        if not is_slot_screen(self.page):
+            return None
+        return self.finish()
+
+    def finish(self):
+        try:
+            steps = self.page.evaluate(MACRO_TAKE_JS)
+        finally:
+            self.cancel()
+        return compact_macro(self.url, steps)
+
+    def cancel(self):
+        if self._script_id is not None:
+            try:
+                self.cdp.send("Page.removeScriptToEvaluateOnNewDocument", {"identifier": self._script_id})
+            except Exception:
+                pass
+            self._script_id = None
+        try:
+            self.page.evaluate("() => sessionStorage.removeItem('__ntqRecOn')")
+        except Exception:
+            pass
+
+
+class MacroRecording:
+    """
+    Nagrywanie makra w sesji CDP procesu, który ją ma (UI w trybie w procesie
+    albo proces silnika); sprawdzanie co MACRO_POLL_MS na wątku tła.
+    Zdarzenia emit: ("macro_started", key), ("macro_failed", key, tekst),
+    ("macro_done", key, makro).
+    """
+
+    def __init__(self, session, key, emit):
+        self.session = session
+        self.key = key
+        self.emit = emit
+        self._cancel = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _begin(self):
+        page = self.session.slot_page()
+        try:
+            cdp = self.session.raw_client(page)
+        except Exception:
+            cdp = page.context.new_cdp_session(page)
+        rec = MacroRecorder(page, cdp)
+        rec.start()
+        return rec
+
+    def _run(self):
+        try:
+            rec = self.session.submit(self._begin).result()
+        except Exception as e:
+            self.emit("macro_failed", self.key, f"Nie udało się zacząć nagrywania: {e}")
+            return
+        self.emit("macro_started", self.key)
+        try:
+            while not self._cancel.wait(MACRO_POLL_MS / 1000):
+                macro = self.session.submit(rec.poll).result()
+                if macro is not None:
+                    self.emit("macro_done", self.key, macro)
+                    return
+        except Exception as e:
+            self.emit("macro_failed", self.key, f"Nagrywanie przerwane: {e}")
+            return
+        self.session.submit(rec.cancel)
+
+
+def replay_macro(page, macro, stop_evt=None, budget_s=MACRO_REPLAY_BUDGET_S):
+    """Odtwarza makro bez pauz (każdy krok czeka tylko na swój element). True = ekran slotów."""
+    deadline = time.monotonic() + budget_s
+
+    def left_ms():
+        return max(1, int((deadline - time.monotonic()) * 1000))
+
+    url = macro.get("url")
+    if url and page.url.split("#")[0] != url.split("#")[0]:
+        if not sliced_navigate(
+            page, lambda ms: page.goto(url, wait_until="commit", timeout=ms), left_ms(), stop_evt
+        ):
+            return False
+
+    for sel in macro.get("steps", []):
+        if is_stopped(stop_evt) or time.monotonic() >= deadline:
+            return False
+        if not sliced_click(page.locator(sel).first, min(MACRO_STEP_TIMEOUT_MS, left_ms()), stop_evt):
+            return False
+
+    while not is_stopped(stop_evt) and time.monotonic() < deadline:
+        if is_slot_screen(page):
+            return True
+        sliced_sleep(STOP_SLICE_MS / 1000, stop_evt)
+    return False
+
+
+# ------------------ CHROME LAUNCHER ------------------
+
+CHROME_START_URL = "https://ebrama.baltichub.com/login"
+CHROME_PROFILE_DIR = Path.home() / "chrome-vbs"   # ten sam profil co start_NTQ_VBS.bat
+CHROME_READY_TIMEOUT_S = 30
+
+
+def find_chrome():
+    """Ścieżka do Chrome/Chromium (Windows, Linux, macOS) albo None."""
+    for name in ("chrome", "google-chrome", "google-chrome-stable", "chromium", "chromium-browser"):
+        path = shutil.which(name)
+        if path:
+            return path
+
+    candidates = []
+    for env in ("PROGRAMFILES", "PROGRAMFILES(X86)", "LOCALAPPDATA"):
+        base = os.environ.get(env)
+        if base:
+            candidates.append(Path(base) / "Google" / "Chrome" / "Application" / "chrome.exe")
+    candidates.append(Path("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"))
+
+    for c in candidates:
+        if c.exists():
+            return str(c)
+    return None
+
+
+def probe_cdp(endpoint, timeout_s=1):
+    """True, gdy pod endpointem odpowiada CDP (/json/version)."""
+    try:
+        conn = http.client.HTTPConnection(urlsplit(endpoint).netloc, timeout=timeout_s)
+        try:
+            conn.request("GET", "/json/version")
+            return conn.getresponse().status == 200
+        finally:
+            conn.close()
+    except (OSError, http.client.HTTPException):
+        return False
+
+
+def read_cdp_port_file(profile_dir):
+    """Endpoint z DevToolsActivePort profilu albo None (brak/uszkodzony plik)."""
+    try:
+        port = int((Path(profile_dir) / "DevToolsActivePort").read_text(encoding="utf-8").splitlines()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return f"http://127.0.0.1:{port}"
+
+
+def wait_cdp_ready(profile_dir, timeout_s=CHROME_READY_TIMEOUT_S, proc=None):
+    """
+    Czeka, aż Chrome wystawi CDP: port z pliku DevToolsActivePort (Chrome
+    uruchomiony z --remote-debugging-port=0 sam wybiera wolny port), potem
+    /json/version. Zwraca endpoint http://127.0.0.1:PORT.
+    """
+    deadline = time.monotonic() + timeout_s
+    endpoint = None
+
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(
+                f"Chrome zakończył się (kod {proc.returncode}) – czy profil {profile_dir} nie jest już otwarty?"
+            )
+        endpoint = endpoint or read_cdp_port_file(profile_dir)
+        if endpoint is not None and probe_cdp(endpoint):
+            return endpoint
+        time.sleep(0.05)
+
+    raise RuntimeError(f"Chrome nie wystawił CDP w ciągu {timeout_s} s")
+
+
+class ChromeInstance:
+    """
+    Chrome z własnym profilem i portem debugowania. proc=None: Chrome
+    działał już wcześniej na tym profilu i został tylko podpięty.
+    """
+
+    def __init__(self, proc, profile_dir, endpoint, ready_ms):
+        self.proc = proc
+        self.profile_dir = profile_dir
+        self.endpoint = endpoint
+        self.ready_ms = ready_ms
+
+    def alive(self):
+        if self.proc is None:
+            return probe_cdp(self.endpoint)
+        return self.proc.poll() is None
+
+    def close(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+
+
+def launch_chrome(profile_dir=CHROME_PROFILE_DIR, url=CHROME_START_URL, exe=None, extra_flags=()):
+    """
+    Startuje Chrome z dedykowanym profilem i wolnym portem CDP, czeka na gotowość
+    (zamiast stałego 'timeout /t 5' w BAT) i zwraca ChromeInstance z czasem do gotowości.
+    Chrome, który już działa na tym profilu (np. po restarcie programu), jest
+    podpinany zamiast uruchamiania drugiego – jego port zna tylko DevToolsActivePort.
+    """
+    exe = exe or find_chrome()
+    if not exe:
+        raise RuntimeError("Nie znalazłem Chrome/Chromium. Zainstaluj Chrome albo podaj ścieżkę.")
+
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    endpoint = read_cdp_port_file(profile_dir)
+    if endpoint is not None and probe_cdp(endpoint):
+        return ChromeInstance(None, profile_dir, endpoint, (time.perf_counter() - t0) * 1000)
+    # nieaktualny plik po zamkniętym Chrome – inaczej odczytalibyśmy stary port
+    try:
+        (profile_dir / "DevToolsActivePort").unlink()
+    except FileNotFoundError:
+        pass
+
+    args = [
+        exe,
+        "--remote-debugging-port=0",
+        f"--user-data-dir={profile_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        *CHROME_ANTI_THROTTLE_FLAGS,
+        *extra_flags,
+        url,
+    ]
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        endpoint = wait_cdp_ready(profile_dir, proc=proc)
+    except Exception:
+        if proc.poll() is None:
+            proc.terminate()
+        raise
+    ready_ms = (time.perf_counter() - t0) * 1000
+    return ChromeInstance(proc, profile_dir, endpoint, ready_ms)
+
+
+def launch_chrome_instances(n, profile_root=CHROME_PROFILE_DIR, **kwargs):
+    """N niezależnych Chrome (osobne profile <root>-1..N i porty) dla równoległych instancji."""
+    root = Path(profile_root)
+    return [
+        launch_chrome(root.with_name(f"{root.name}-{i}"), **kwargs)
+        for i in range(1, int(n) + 1)
+    ]
+
+
+# ------------------ SERVER CLOCK ------------------
+
+CLOCK_WINDOW = 64               # ostatnie odpowiedzi eBramy brane do estymacji
+CLOCK_MAX_DRIFT_PPM = 100.0     # o tyle poszerzamy starsze przedziały (dryf zegarów)
+CLOCK_HISTORY_EVERY_S = 60.0    # co ile estymacja trafia do historii (do liczenia dryfu)
+CLOCK_HISTORY = 120             # 2 h historii
+CLOCK_DRIFT_MIN_SPAN_S = 300.0  # dryf liczony dopiero z historii z co najmniej 5 minut
+CLOCK_PUBLISH_EVERY_S = 1.0
+
+
+def marzullo(intervals):
+    """Przedział zgodny z największą liczbą przedziałów: (liczba, od, do)."""
+    edges = []
+    for lo, hi in intervals:
+        edges.append((lo, -1))
+        edges.append((hi, 1))
+    edges.sort()
+    best, cnt, best_lo, best_hi = 0, 0, None, None
+    for i, (x, kind) in enumerate(edges):
+        cnt -= kind
+        if cnt > best:
+            best, best_lo, best_hi = cnt, x, edges[i + 1][0]
+    return best, best_lo, best_hi
+
+
+class ServerClock:
+    """
+    Czas serwera eBramy z nagłówków Date odpowiedzi (bez zewnętrznego NTP).
+
+    Date ma dokładność 1 s i został nadany między wysłaniem zapytania (t0)
+    a nadejściem nagłówków odpowiedzi (t1), więc każda odpowiedź daje przedział
+    offsetu (serwer - lokalnie): [D - t1, D + 1 - t0]. Przecięcie przedziałów
+    (algorytm Marzullo, starsze poszerzone o dopuszczalny dryf) daje offset
+    i niepewność; zmiana offsetu w historii estymacji – dryf zegara.
+    """
+
+    def __init__(self, publish=None):
+        self.publish = publish
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=CLOCK_WINDOW)   # (t_lokalny, od, do)
+        self._history = deque(maxlen=CLOCK_HISTORY)  # (t_lokalny, offset, niepewność)
+        self._watched = weakref.WeakSet()
+        self._published = 0.0
+        self.offset = None
+        self.uncertainty = None
+        self.drift_ppm = None
+        self.drift_err_ppm = None
+        self.agree = 0
+
+    @property
+    def synced(self):
+        return self.offset is not None
+
+    def server_now(self):
+        """Bieżący czas serwera (epoch s); bez próbek – czas lokalny."""
+        return time.time() + (self.offset or 0.0)
+
+    def watch(self, page):
+        """Nasłuch odpowiedzi karty (wołane na wątku sesji, raz na kartę)."""
+        if page in self._watched:
+            return
+        self._watched.add(page)
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        try:
+            if EBRAMA_URL_PART not in response.url:
+                return
+            date = response.headers.get("date")
+            timing = response.request.timing
+            if not date or timing["responseStart"] < 0:
+                return   # odpowiedź z pamięci podręcznej – bez pomiaru
+            t0 = (timing["startTime"] + max(0.0, timing["requestStart"])) / 1000
+            t1 = (timing["startTime"] + timing["responseStart"]) / 1000
+            server = email.utils.parsedate_to_datetime(date).timestamp()
+        except Exception:
+            return
+        self.add_sample(t0, t1, server)
+
+    def add_sample(self, t0, t1, server_s):
+        with self._lock:
+            self._samples.append(((t0 + t1) / 2, server_s - t1, server_s + 1 - t0))
+            self._estimate()
+            state = self.state()
+        now = time.monotonic()
+        if self.publish is not None and now - self._published >= CLOCK_PUBLISH_EVERY_S:
+            self._published = now
+            self.publish(state)
+
+    def _estimate(self):
+        latest = self._samples[-1][0]
+        widened = []
+        for t, lo, hi in self._samples:
+            w = (latest - t) * CLOCK_MAX_DRIFT_PPM * 1e-6
+            widened.append((lo - w, hi + w))
+        agree, lo, hi = marzullo(widened)
+        self.agree = agree
+        self.offset = (lo + hi) / 2
+        self.uncertainty = (hi - lo) / 2
+
+        if not self._history or latest - self._history[-1][0] >= CLOCK_HISTORY_EVERY_S:
+            self._history.append((latest, self.offset, self.uncertainty))
+        t_old, off_old, u_old = self._history[0]
+        span = latest - t_old
+        if span >= CLOCK_DRIFT_MIN_SPAN_S:
+            self.drift_ppm = (self.offset - off_old) / span * 1e6
+            self.drift_err_ppm = (self.uncertainty + u_old) / span * 1e6
+
+    def state(self):
+        return {
+            "offset_ms": None if self.offset is None else self.offset * 1000,
+            "uncertainty_ms": None if self.uncertainty is None else self.uncertainty * 1000,
+            "drift_ppm": self.drift_ppm,
+            "drift_err_ppm": self.drift_err_ppm,
+            "samples": len(self._samples),
+            "agree": self.agree,
+        }
+
+
+# ------------------ CDP SESSION ------------------
+
+class CdpSession:
+    """
+    Długo żyjące połączenie z Chrome (CDP), współdzielone przez kolejne START/STOP.
+
+    Playwright (sync) jest przywiązany do wątku, który go uruchomił, dlatego
+    sterownik, przeglądarka i strony żyją na własnym wątku sesji, a zadania
+    (np. logika Workera) są na nim wykonywane przez submit().
+    Między zadaniami wątek co CDP_HEALTH_INTERVAL_S sprawdza połączenie
+    i sam łączy się ponownie, jeśli Chrome zniknął.
+    """
+
+    def __init__(self, log, endpoint=CDP_ENDPOINT, clock=None):
+        self.log = log
+        self.endpoint = endpoint
+        self.clock = clock   # ServerClock: czas eBramy z odpowiedzi karty slotów
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._pw = None
+        self._browser = None
+        self._page = None
+        self._raws = {}   # karta -> CdpClient
+        self._was_connected = None
+        self._connected_once = False
+
+    # ---------- API (dowolny wątek) ----------
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Wykonuje fn(*args) na wątku sesji. Zwraca Future."""
+        fut = Future()
+        self._jobs.put((fut, fn, args))
+        return fut
+
+    def close(self):
+        self._jobs.put(None)
+
+    # ---------- API (wątek sesji) ----------
+
+    def is_connected(self):
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except Exception:
+            return False
+
+    def ensure_connected(self, stop_evt=None, timeout_ms=CDP_CONNECT_TIMEOUT_MS):
+        """
+        Łączy się z Chrome, jeśli trzeba. Rzuca wyjątek, gdy CDP niedostępne.
+        Ze stop_evt łączy krótszymi próbami (od 4 x STOP_SLICE_MS, każda dwa razy
+        dłuższa, do CDP_CONNECT_ATTEMPT_MAX_MS) i zwraca False po STOP.
+        """
+        if self.is_connected():
+            return True
+        t0 = time.perf_counter()
+        if self._pw is None:
+            self._pw = sync_playwright().start()
+        deadline = time.monotonic() + timeout_ms / 1000
+        attempt_ms = timeout_ms if stop_evt is None else 4 * STOP_SLICE_MS
+        while True:
+            if is_stopped(stop_evt):
+                return False
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            try:
+                self._browser = self._pw.chromium.connect_over_cdp(
+                    self.endpoint, timeout=max(1, min(attempt_ms, remaining_ms)),
+                )
+                break
+            except PWTimeoutError:
+                if remaining_ms <= attempt_ms:
+                    raise
+                attempt_ms = min(2 * attempt_ms, CDP_CONNECT_ATTEMPT_MAX_MS)
+        self._page = None
+        if self._connected_once:
+            METRICS.inc("cdp_reconnects")
+        self._connected_once = True
+        ms = (time.perf_counter() - t0) * 1000
+        self.log(f"[PW] Połączono z Chrome CDP ({self.endpoint}) w {ms:.0f} ms")
+        return True
+
+    def reconnect(self, stop_evt=None):
+        self._close_raw()
+        self._browser = None
+        self._page = None
+        return self.ensure_connected(stop_evt)
+
+    def use_endpoint(self, endpoint):
+        """Przełącza sesję na inny Chrome (np. uruchomiony przez launcher)."""
+        if endpoint and endpoint != self.endpoint:
+            self._close_raw()
+            self.endpoint = endpoint
+            self._browser = None
+            self._page = None
+
+    def raw_client(self, page):
+        """Bezpośredni klient CDP (WebSocket) dla karty – jeden na kartę, odnawiany po zerwaniu."""
+        raw = self._raws.get(page)
+        if raw is not None and not raw.closed:
+            return raw
+        for pg in [pg for pg in self._raws if pg is page or pg.is_closed()]:
+            self._raws.pop(pg).close()
+        raw = self._raws[page] = CdpClient.for_page(page, self.endpoint)
+        return raw
+
+    def new_tab(self, stop_evt=None):
+        """Nowa karta w kontekście Chrome (pula: osobna karta na zadanie). None = STOP."""
+        if not self.ensure_connected(stop_evt):
+            return None
+        contexts = self._browser.contexts
+        ctx = contexts[0] if contexts else self._browser.new_context()
+        return ctx.new_page()
+
+    def close_tab(self, page):
+        raw = self._raws.pop(page, None)
+        if raw is not None:
+            raw.close()
+        try:
+            page.close()
+        except Exception:
+            pass
+
+    def _close_raw(self):
+        for raw in self._raws.values():
+            raw.close()
+        self._raws.clear()
+
+    def slot_page(self, stop_evt=None):
+        """
+        Karta eBramy z ekranem slotów – szukana po URL wśród wszystkich kart.
+        Preferowana jest karta, która faktycznie pokazuje siatkę slotów.
+        None = STOP w trakcie łączenia.
+        """
+        if not self.ensure_connected(stop_evt):
+            return None
+
+        cached = self._page
+        if cached is not None and not cached.is_closed() and is_slot_screen(cached):
+            return cached
+
+        pages = [pg for c in self._browser.contexts for pg in c.pages]
+        ebrama = [pg for pg in pages if EBRAMA_URL_PART in (pg.url or "")]
+
+        page = next((pg for pg in ebrama if is_slot_screen(pg)), None)
+        if page is None and ebrama:
+            page = ebrama[0]
+        if page is None:
+            if not pages:
+                raise RuntimeError("Chrome nie ma otwartych kart. Otwórz eBramę i kliknij START.")
+            page = pages[0]
+            self.log(f"[WARN] Nie znalazłem karty eBramy ({EBRAMA_URL_PART}) – używam pierwszej karty.")
+
+        self._page = page
+        if self.clock is not None:
+            self.clock.watch(page)
+        return page
+
+    # ---------- wewnętrzne ----------
+
+    def _health_check(self):
+        try:
+            if self.is_connected():
+                # każde wywołanie przepuszcza zdarzenia sterownika (np. 'disconnected')
+                _ = self._browser.contexts
+                if self._page is not None and not self._page.is_closed():
+                    self._page.evaluate("1")
+            if not self.is_connected():
+                self.reconnect()
+            ok = True
+        except Exception:
+            self._browser = None
+            self._page = None
+            ok = False
+
+        if ok != self._was_connected:
+            if not ok:
+                self.log(f"[PW] Brak połączenia z Chrome CDP ({self.endpoint}) – ponowię automatycznie.")
+            self._was_connected = ok
+
+    def _loop(self):
+        next_check = 0.0
+        while True:
+            if time.monotonic() >= next_check:
+                self._health_check()
+                next_check = time.monotonic() + CDP_HEALTH_INTERVAL_S
+
+            try:
+                job = self._jobs.get(timeout=max(0.0, next_check - time.monotonic()))
+            except queue.Empty:
+                continue
+
+            if job is None:
+                break
+
+            fut, fn, args = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+            # po zadaniu od razu sprawdź połączenie przy następnym obrocie
+            next_check = 0.0
+
+        self._close_raw()
+        try:
+            if self._pw is not None:
+                self._pw.stop()
+        except Exception:
+            pass
+
+
+# ------------------ REFRESH STRATEGIES ------------------
+
+REFRESH_EXPLORE_ROUNDS = 3      # pomiary każdej strategii przed wyborem zwycięzcy
+REFRESH_REEXPLORE_EVERY = 200   # co ile odświeżeń ponowny pomiar najdawniej mierzonej strategii
+REFRESH_MAX_FAILS = 2           # tyle nieudanych odświeżeń z rzędu = strategia wyłączona
+REFRESH_REQUEST_COST_MS = 20    # koszt jednego zapytania sieciowego w ocenie strategii
+REFRESH_ARM_QUIET_S = 60.0      # tyle po strzale w trybie uzbrojonym: bez pomiarów innych strategii
+REFRESH_AUTO = "auto"
+
+# ponowienie przechwyconego zapytania siatki; zwraca skrót treści (zmiana = trzeba przerysować)
+API_REFETCH_JS = r"""
+async ([url, headers]) => {
+  const r = await fetch(url, { headers, credentials: "include", cache: "no-store" });
+  if (!r.ok) return null;
+  const t = await r.text();
+  let h = 0;
+  for (let i = 0; i < t.length; i++) h = (h * 31 + t.charCodeAt(i)) | 0;
+  return t.length + ":" + h;
+}
+"""
+API_SKIP_HEADERS = ("cookie", "host", "content-length", "connection", "accept-encoding", "referer", "origin")
+
+
+def wait_slot_screen(page, timeout_ms, stop_evt=None):
+    """Czeka (przerywalnie), aż karta pokaże ekran slotów."""
+    deadline = time.monotonic() + timeout_ms / 1000
+    while not is_stopped(stop_evt) and time.monotonic() < deadline:
+        if is_slot_screen(page):
+            return True
+        sliced_sleep(STOP_SLICE_MS / 1000, stop_evt)
+    return False
+
+
+class RefreshStrategy:
+    """Jeden sposób odświeżenia siatki slotów. refresh() -> True, gdy siatka jest gotowa do odczytu."""
+
+    name = ""
+
+    def available(self, page):
+        return True
+
+    def refresh(self, page, day, load_to, stop_evt):
+        raise NotImplementedError
+
+
+class StandardoweRefresh(RefreshStrategy):
+    name = "STANDARDOWE"
+
+    def refresh(self, page, day, load_to, stop_evt):
+        return click_standardowe(page, load_to, stop_evt)
+
+
+class DayReclickRefresh(RefreshStrategy):
+    name = "dzień"
+
+    def refresh(self, page, day, load_to, stop_evt):
+        return click_day_by_coordinates(page, day, load_to, stop_evt)
+
+
+class ReloadRefresh(RefreshStrategy):
+    name = "reload"
+
+    def refresh(self, page, day, load_to, stop_evt):
+        if not sliced_navigate(page, lambda ms: page.reload(wait_until="commit", timeout=ms), load_to, stop_evt):
+            return False
+        if not wait_slot_screen(page, load_to, stop_evt):
+            return False
+        return ensure_day_selected(page, day, load_to, stop_evt=stop_evt)
+
+
+class RouteReentryRefresh(RefreshStrategy):
+    """Wyjście z trasy SPA i powrót (historia przeglądarki) – aplikacja pobiera siatkę od nowa."""
+
+    name = "trasa SPA"
+
+    def available(self, page):
+        try:
+            return page.evaluate("() => history.length") > 1
+        except Exception:
+            return False
+
+    def refresh(self, page, day, load_to, stop_evt):
+        if not sliced_navigate(page, lambda ms: page.go_back(wait_until="commit", timeout=ms), load_to, stop_evt):
+            return False
+        if not sliced_navigate(page, lambda ms: page.go_forward(wait_until="commit", timeout=ms), load_to, stop_evt):
+            return False
+        if not wait_slot_screen(page, load_to, stop_evt):
+            return False
+        return ensure_day_selected(page, day, load_to, stop_evt=stop_evt)
+
+
+class ApiRefetchRefresh(RefreshStrategy):
+    """
+    Ponowienie zapytania API, którym aplikacja pobiera siatkę (przechwycone
+    z ruchu karty). Bez zmiany w odpowiedzi siatka na ekranie jest aktualna;
+    zmiana -> STANDARDOWE, żeby aplikacja ją przerysowała.
+    Zapytanie i skrót są osobne dla każdej karty (w puli każda ma swoją awizację).
+    """
+
+    name = "API"
+
+    def __init__(self):
+        self.captured = weakref.WeakKeyDictionary()   # karta -> {"url", "headers", "digest"}
+
+    def on_request(self, page, request):
+        try:
+            if (request.resource_type in ("xhr", "fetch") and request.method == "GET"
+                    and EBRAMA_URL_PART in request.url and "slot" in request.url.lower()):
+                c = self.captured.setdefault(page, {"digest": None})
+                if c.get("url") != request.url:
+                    c["digest"] = None   # inne zapytanie (dzień / awizacja) – stary skrót nic nie mówi
+                c["url"] = request.url
+                c["headers"] = {k: v for k, v in request.headers.items() if k.lower() not in API_SKIP_HEADERS}
+        except Exception:
+            pass
+
+    def available(self, page):
+        return page in self.captured
+
+    def refresh(self, page, day, load_to, stop_evt):
+        c = self.captured.get(page)
+        if c is None:
+            return False
+        digest = page.evaluate(API_REFETCH_JS, [c["url"], c["headers"]])
+        if digest is None:
+            return False
+        changed = c["digest"] is not None and digest != c["digest"]
+        c["digest"] = digest
+        if changed:
+            return click_standardowe(page, load_to, stop_evt)
+        return True
+
+
+class RefreshRunner:
+    """
+    Przełącza strategie odświeżania: najpierw każda jest mierzona kilka razy,
+    potem używana jest najlepsza, a co jakiś czas pozostałe są mierzone ponownie.
+    Żyje dłużej niż Worker (cały proces), więc pomiary nie giną przy STOP/START.
+
+    Ocena to przybliżenie świeżości: mediana czasu od startu odświeżenia do
+    gotowej siatki + REFRESH_REQUEST_COST_MS za każde zapytanie karty (obciążenie
+    eBramy). Sama świeżość danych nie jest mierzalna z karty – siatka po
+    odświeżeniu jest tak świeża, jak odpowiedź, na którą czekaliśmy.
+
+    Czasy są wspólne (ta sama strona), ale liczniki zapytań i serie porażek
+    są osobne dla każdej karty – w puli karty się nie mieszają.
+    """
+
+    def __init__(self, ui, strategies, fixed=REFRESH_AUTO):
+        self.ui = ui
+        self.strategies = list(strategies)
+        self.fixed = fixed
+        self.stats = {s.name: {"ms": deque(maxlen=20), "req": deque(maxlen=20), "last": 0}
+                      for s in self.strategies}
+        self.count = 0
+        self.best = None
+        self.exploring = False
+        self._watched = weakref.WeakKeyDictionary()    # karta -> listener "request"
+        self._requests = weakref.WeakKeyDictionary()   # karta -> liczba zapytań
+        self._fails = weakref.WeakKeyDictionary()      # karta -> {strategia: porażki z rzędu}
+
+    def watch(self, page):
+        """Licznik zapytań karty (koszt) + podgląd zapytań dla strategii API."""
+        if page in self._watched:
+            return
+        ref = weakref.ref(page)   # słaba: wpis słownika nie może trzymać swojej karty
+        handler = self._watched[page] = lambda request: self._on_request(ref(), request)
+        self._requests.setdefault(page, 0)
+        page.on("request", handler)
+
+    def unwatch(self, page):
+        handler = self._watched.pop(page, None)
+        if handler is None:
+            return
+        try:
+            page.remove_listener("request", handler)
+        except Exception:
+            pass
+
+    def _on_request(self, page, request):
+        if page is None:
+            return
+        self._requests[page] = self._requests.get(page, 0) + 1
+        for s in self.strategies:
+            if isinstance(s, ApiRefetchRefresh):
+                s.on_request(page, request)
+
+    def fails(self, page, name):
+        return self._fails.get(page, {}).get(name, 0)
+
+    def score(self, name):
+        st = self.stats[name]
+        if not st["ms"]:
+            return None
+        ms = sorted(st["ms"])[len(st["ms"]) // 2]
+        req = sorted(st["req"])[len(st["req"]) // 2]
+        return ms + req * REFRESH_REQUEST_COST_MS
+
+    def pick(self, page, explore=True):
+        if self.fixed != REFRESH_AUTO:
+            return next(s for s in self.strategies if s.name == self.fixed)
+        usable = [s for s in self.strategies
+                  if self.fails(page, s.name) < REFRESH_MAX_FAILS and s.available(page)]
+        if not usable:
+            return self.strategies[0]
+        if not explore:
+            # bez eksperymentów: sprawdzony zwycięzca albo domyślna (pierwsza) strategia
+            self.exploring = False
+            return next((s for s in usable if s.name == self.best), usable[0])
+        fresh = [s for s in usable if len(self.stats[s.name]["ms"]) < REFRESH_EXPLORE_ROUNDS]
+        self.exploring = bool(fresh)
+        if fresh:
+            return min(fresh, key=lambda s: len(self.stats[s.name]["ms"]))
+        if self.count % REFRESH_REEXPLORE_EVERY == 0:
+            return min(usable, key=lambda s: self.stats[s.name]["last"])
+        best = next((s for s in usable if s.name == self.best), None)
+        return best or min(usable, key=lambda s: self.score(s.name))
+
+    def refresh(self, page, day, load_to, stop_evt, explore=True):
+        """explore=False: bez pomiarów innych strategii (np. zaraz po strzale w trybie uzbrojonym)."""
+        return self.run(self.pick(page, explore), page, day, load_to, stop_evt)
+
+    def run(self, s, page, day, load_to, stop_evt):
+        """Odświeżenie wybraną strategią (pick) z jej własnym limitem load_to + pomiar."""
+        st = self.stats[s.name]
+        fails = self._fails.setdefault(page, {})
+        self.count += 1
+        req0 = self._requests.get(page, 0)
+        t0 = time.perf_counter()
+        try:
+            ok = s.refresh(page, day, load_to, stop_evt)
+        except Exception:
+            ok = False
+        if is_stopped(stop_evt):
+            return ok
+        st["last"] = self.count
+        if not ok:
+            fails[s.name] = fails.get(s.name, 0) + 1
+            if fails[s.name] == REFRESH_MAX_FAILS and self.fixed == REFRESH_AUTO:
+                self.ui.log(
+                    f"[REFRESH] '{s.name}' wyłączona dla tej karty po {REFRESH_MAX_FAILS} nieudanych próbach."
+                )
+            return False
+        fails[s.name] = 0
+        st["ms"].append((time.perf_counter() - t0) * 1000)
+        st["req"].append(self._requests.get(page, 0) - req0)
+        if not self.exploring:
+            self.choose()
+        return True
+
+    def choose(self):
+        scored = [(self.score(s.name), s.name) for s in self.strategies
+                  if len(self.stats[s.name]["ms"]) >= REFRESH_EXPLORE_ROUNDS]
+        if not scored:
+            return
+        score, name = min(scored)
+        if name != self.best:
+            self.best = name
+            self.ui.log(f"[REFRESH] Najszybsza strategia: {name} ({score:.0f} ms z kosztem zapytań) | {self.summary()}")
+
+    def summary(self):
+        parts = []
+        for s in self.strategies:
+            st = self.stats[s.name]
+            if st["ms"]:
+                med = sorted(st["ms"])[len(st["ms"]) // 2]
+                req = sorted(st["req"])[len(st["req"]) // 2]
+                parts.append(f"{s.name}: {med:.0f} ms/{req} zap.")
+        return ", ".join(parts) or "brak pomiarów"
+
+
+def default_refresh_strategies():
+    return [StandardoweRefresh(), DayReclickRefresh(), ApiRefetchRefresh(), RouteReentryRefresh(), ReloadRefresh()]
+
+
+REFRESH_CHOICES = (REFRESH_AUTO,) + tuple(s.name for s in default_refresh_strategies())
+
+
+# ------------------ ADAPTIVE TIMEOUTS ------------------
+
+ADAPTIVE_WINDOW = 50        # ostatnie próbki na fazę
+ADAPTIVE_MIN_SAMPLES = 5    # mniej próbek = stały limit
+ADAPTIVE_PCTL = 0.95
+ADAPTIVE_MARGIN = 1.3       # limit = p95 * margines + zapas
+ADAPTIVE_PAD_MS = 100
+ADAPTIVE_FLOOR_MS = {"grid": 500, "click": 50, "dialog": 300}
+
+ADAPTIVE_PHASES = (
+    ("grid", "siatka"),
+    ("click", "klik"),
+    ("dialog", "dialog"),
+    ("outcome", "wynik"),
+)
+
+
+def refresh_phase(name):
+    """Faza odświeżenia konkretną strategią: własne próbki i limit, podłoga i metryki jak 'grid'."""
+    return f"grid:{name}"
+
+
+class LatencyTracker:
+    """
+    Kroczące rozkłady czasów faz rezerwacji: siatka (odświeżenie -> załadowane),
+    klik (click() kafelka), dialog (klik kafelka -> pierwsze TAK/OK) i wynik
+    (klik kafelka -> sukces albo toast). Żyje dłużej niż Worker (cały proces).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, phase, ms, timed_out=False):
+        METRICS.observe(phase.partition(":")[0], ms)
+        # przekroczony limit to próbka ucięta – liczymy podwójnie, żeby limit szybko urósł
+        with self._lock:
+            self._samples.setdefault(phase, deque(maxlen=ADAPTIVE_WINDOW)).append(ms * 2 if timed_out else ms)
+
+    def percentile(self, phase, q=ADAPTIVE_PCTL):
+        with self._lock:
+            data = sorted(self._samples.get(phase, ()))
+        if len(data) < ADAPTIVE_MIN_SAMPLES:
+            return None
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    def timeout(self, phase, limit_ms, default_ms=None):
+        """Limit fazy przycięty do [podłoga, limit_ms]; bez danych default_ms (albo limit_ms)."""
+        p = self.percentile(phase)
+        if p is None:
+            return int(limit_ms if default_ms is None else default_ms)
+        floor = min(ADAPTIVE_FLOOR_MS.get(phase.partition(":")[0], 0), limit_ms)
+        return int(max(floor, min(limit_ms, p * ADAPTIVE_MARGIN + ADAPTIVE_PAD_MS)))
+
+    def snapshot(self, limits):
+        """{faza: (limit ms, liczba próbek)} dla UI."""
+        with self._lock:
+            counts = {k: len(v) for k, v in self._samples.items()}
+        return {phase: (self.timeout(phase, limits[phase]), counts.get(phase, 0)) for phase in limits}
+
+
+def format_timeouts(snap):
+    parts = []
+    for phase, label in ADAPTIVE_PHASES:
+        if phase in snap:
+            parts.append(f"{label} {snap[phase][0]} ms (n={snap[phase][1]})")
+        # strategie odświeżania z pomiarami: siatka/reload ...
+        parts += [
+            f"{label}/{key.partition(':')[2]} {v[0]} ms (n={v[1]})"
+            for key, v in snap.items() if key.startswith(phase + ":") and v[1]
+        ]
+    return ", ".join(parts)
+
+
+# ------------------ METRICS EXPORT ------------------
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+METRICS_PUSH_S = 2.0   # co ile proces silnika przesyła migawkę liczników do UI
+METRICS_BUCKETS_S = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_COUNTERS = (
+    ("iterations", "Pełne cykle pętli odświeżania."),
+    ("slot_reads", "Odczyty siatki slotów."),
+    ("attempts", "Próby rezerwacji (klik slotu)."),
+    ("lost_races", "Przegrane wyścigi (toast 'brak slotów')."),
+    ("successes", "Potwierdzone rezerwacje."),
+    ("cdp_reconnects", "Ponowne połączenia z Chrome (CDP)."),
+)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Liczniki i histogramy faz dla eksportu Prometheus. Bez blokad: każdy licznik
+    ma jednego pisarza (wątek sesji), a wszystkie klucze istnieją od początku,
+    więc scrape tylko czyta i nigdy nie czeka na pętlę rezerwacji ani jej nie blokuje.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys((name for name, _ in METRICS_COUNTERS), 0)
+        # kubełki niekumulatywne; ostatni = powyżej największej granicy (+Inf)
+        self.hist = {phase: [0] * (len(METRICS_BUCKETS_S) + 1) for phase, _ in ADAPTIVE_PHASES}
+        self.hist_sum = dict.fromkeys(self.hist, 0.0)
+        self.license = ""
+        self.remote = None   # ostatnia migawka z procesu silnika
+
+    def inc(self, name, n=1):
+        self.counters[name] += n
+
+    def observe(self, phase, ms):
+        buckets = self.hist.get(phase)
+        if buckets is None:
+            return
+        s = ms / 1000
+        buckets[bisect.bisect_left(METRICS_BUCKETS_S, s)] += 1
+        self.hist_sum[phase] += s
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "hist": {phase: list(b) for phase, b in self.hist.items()},
+            "hist_sum": dict(self.hist_sum),
+        }
+
+    def render(self, machine):
+        """Tekst w formacie ekspozycji Prometheus (0.0.4): ten proces + migawka silnika."""
+        snap, remote = self.snapshot(), self.remote
+        if remote is not None:
+            for name, v in remote["counters"].items():
+                snap["counters"][name] = snap["counters"].get(name, 0) + v
+            for phase, b in remote["hist"].items():
+                snap["hist"][phase] = [x + y for x, y in zip(snap["hist"].get(phase, [0] * len(b)), b)]
+                snap["hist_sum"][phase] = snap["hist_sum"].get(phase, 0.0) + remote["hist_sum"][phase]
+
+        base = f'machine="{_label(machine)}",version="{_label(VERSION)}"'
+        out = []
+        for name, help_text in METRICS_COUNTERS:
+            out += [
+                f"# HELP vbs_{name}_total {help_text}",
+                f"# TYPE vbs_{name}_total counter",
+                f"vbs_{name}_total{{{base}}} {snap['counters'][name]}",
+            ]
+
+        out += [
+            "# HELP vbs_phase_seconds Czas faz rezerwacji (siatka, klik, dialog, wynik).",
+            "# TYPE vbs_phase_seconds histogram",
+        ]
+        for phase, buckets in snap["hist"].items():
+            labels = f'{base},phase="{phase}"'
+            total = 0
+            for le, n in zip(METRICS_BUCKETS_S, buckets):
+                total += n
+                out.append(f'vbs_phase_seconds_bucket{{{labels},le="{le}"}} {total}')
+            total += buckets[-1]
+            out += [
+                f'vbs_phase_seconds_bucket{{{labels},le="+Inf"}} {total}',
+                f"vbs_phase_seconds_sum{{{labels}}} {snap['hist_sum'][phase]:.6f}",
+                f"vbs_phase_seconds_count{{{labels}}} {total}",
+            ]
+
+        status = self.license
+        out += [
+            "# HELP vbs_license_valid Licencja ważna (1) albo nie (0).",
+            "# TYPE vbs_license_valid gauge",
+            f"vbs_license_valid{{{base}}} {int(is_license_valid(status))}",
+            "# HELP vbs_license_info Ostatni status licencji z serwera.",
+            "# TYPE vbs_license_info gauge",
+            f'vbs_license_info{{{base},status="{_label(status or "UNKNOWN")}"}} 1',
+        ]
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()   # jeden zestaw liczników na proces (UI albo silnik)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics -> Metrics.render (bez żadnych blokad pętli)."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.render(self.server.machine).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve_metrics(machine, host=METRICS_HOST, port=METRICS_PORT):
+    """Endpoint metryk w wątku tła. Zwraca serwer (server.shutdown() kończy)."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.machine = machine
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ------------------ POLL SCHEDULER ------------------
+
+SCHED_MIN_INTERVAL_S = 0.05   # najkrótszy odstęp cykli (jak dawne max(0.05, poll_s))
+SCHED_MAX_RPS = 4.0           # globalny sufit odświeżeń siatki na sekundę (token bucket)
+SCHED_BURST = 2               # ile odświeżeń może pójść od razu po przerwie
+SCHED_CHURN_FACTOR = 0.25     # po zmianie zajętości slotów interwał x0.25 ...
+SCHED_CHURN_HOLD_S = 30.0     # ... przez tyle sekund od ostatniej zmiany
+
+RATE_PROFILE_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\d+(?:[.,]\d+)?)\s*$")
+
+
+def parse_rate_profile(text):
+    """
+    "06:55-07:10=0.2; 13:55-14:10=0.3" -> [(od_min, do_min, interwał_s), ...].
+    Przedział może przechodzić przez północ. Błędny wpis -> ValueError.
+    """
+    out = []
+    for part in re.split(r"[;\n]", text or ""):
+        if not part.strip():
+            continue
+        m = RATE_PROFILE_RE.match(part)
+        if not m:
+            raise ValueError(f"Niepoprawny wpis profilu: '{part.strip()}' (format HH:MM-HH:MM=sekundy)")
+        h1, m1, h2, m2 = (int(x) for x in m.groups()[:4])
+        if h1 > 23 or h2 > 23 or m1 > 59 or m2 > 59:
+            raise ValueError(f"Niepoprawna godzina w profilu: '{part.strip()}'")
+        out.append((h1 * 60 + m1, h2 * 60 + m2, float(m.group(5).replace(",", "."))))
+    return out
+
+
+class TokenBucket:
+    """Sufit liczby odświeżeń (wspólny dla wszystkich pętli w procesie). rate <= 0 = bez limitu."""
+
+    def __init__(self, rate=SCHED_MAX_RPS, burst=SCHED_BURST):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_s = 0.0
+
+    def _take(self):
+        """0 = token pobrany, inaczej ile sekund do następnego tokenu."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+            self._t = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        """0 = token pobrany, inaczej ile sekund do następnego. Nie czeka – wołający oddaje czas przez yield."""
+        if self.rate <= 0:
+            return 0.0
+        wait_s = self._take()
+        if wait_s > 0:
+            self.waited_s += wait_s
+        return wait_s
+
+
+class PollScheduler:
+    """
+    Kadencja pętli ze stałą częstotliwością: kolejny cykl startuje w ustalonym
+    momencie (t0 + n * interwał), niezależnie od czasu trwania iteracji, więc
+    opóźnienia się nie sumują. Interwał: profil pory dnia, a bez dopasowania
+    poll_s; po zaobserwowanej zmianie zajętości slotów chwilowo krótszy.
+    Pora dnia liczona zegarem clock (epoch s) – w workerze czas eBramy.
+    """
+
+    def __init__(
+        self, base_s, profile=(), churn_factor=SCHED_CHURN_FACTOR, churn_hold_s=SCHED_CHURN_HOLD_S, clock=time.time,
+    ):
+        self.base_s = float(base_s)
+        self.clock = clock
+        self.profile = list(profile)
+        self.churn_factor = churn_factor
+        self.churn_hold_s = churn_hold_s
+        self.churn_until = 0.0
+        self._next = None
+        self._last = {}
+        self.ticks = 0
+        self.late = 0
+
+    def interval(self, now=None):
+        now = now or dt.datetime.fromtimestamp(self.clock())
+        minute = now.hour * 60 + now.minute
+        iv = self.base_s
+        for start, end, s in self.profile:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                iv = s
+                break
+        if time.monotonic() < self.churn_until:
+            iv *= self.churn_factor
+        return max(SCHED_MIN_INTERVAL_S, iv)
+
+    def observe(self, day, slots):
+        """Odczyt siatki dnia; zmiana względem poprzedniego odczytu = ruch na slotach."""
+        prev = self._last.get(day)
+        self._last[day] = dict(slots)
+        if prev is None or prev == slots:
+            return False
+        now = time.monotonic()
+        started = now >= self.churn_until
+        self.churn_until = now + self.churn_hold_s
+        return started   # True tylko na początku okresu szybszego odświeżania
+
+    def delay(self):
+        """Ile sekund do następnego terminu cyklu. Spóźniony cykl -> 0 (bez nadrabiania serii)."""
+        now = time.monotonic()
+        iv = self.interval()
+        self._next = (self._next if self._next is not None else now) + iv
+        self.ticks += 1
+        if self._next <= now:
+            self.late += 1
+            self._next = now
+            return 0.0
+        return self._next - now
+
+
+# ------------------ ARMED MODE ------------------
+
+ARM_SPIN_S = 0.03            # ostatnie 30 ms przed celem: aktywne czekanie (timer systemu ma ~15 ms)
+ARM_WARM_INTERVAL_S = 15.0   # co ile w czasie uzbrojenia: sonda strony + ciepłe połączenie HTTP
+ARM_TIME_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,3}))?)?\s*$")
+
+# lekkie zapytanie z karty: trzyma połączenie HTTP/TLS do eBramy otwarte do chwili strzału
+ARM_WARM_JS = r"""
+() => fetch(location.origin + "/", { method: "HEAD", cache: "no-store", credentials: "include" })
+  .then(r => r.status).catch(() => 0)
+"""
+
+
+def parse_arm_time(text, now=None):
+    """
+    "HH:MM[:SS[.mmm]]" (dziś) -> znacznik czasu (epoch s). Pusty tekst -> None.
+    Godzina, która już minęła -> ValueError.
+    """
+    if not (text or "").strip():
+        return None
+    m = ARM_TIME_RE.match(text)
+    if not m:
+        raise ValueError(f"Niepoprawna godzina uzbrojenia: '{text.strip()}' (format HH:MM:SS.mmm)")
+    hh, mm, ss, ms = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0), (m.group(4) or "0").ljust(3, "0")
+    if hh > 23 or mm > 59 or ss > 59:
+        raise ValueError(f"Niepoprawna godzina uzbrojenia: '{text.strip()}'")
+    now = now or dt.datetime.now()
+    target = now.replace(hour=hh, minute=mm, second=ss, microsecond=int(ms) * 1000)
+    if target <= now:
+        raise ValueError(f"Godzina uzbrojenia {text.strip()} już minęła")
+    return target.timestamp()
+
+
+def wait_until(target_ts, stop_evt=None, spin_s=ARM_SPIN_S):
+    """
+    Czeka do target_ts (epoch s): zgrubnie na Event.wait, ostatnie spin_s aktywnie
+    na perf_counter. Zwraca moment wyjścia (perf_counter) albo None po STOP.
+    """
+    target_pc = time.perf_counter() + (target_ts - time.time())
+    while True:
+        left = target_pc - time.perf_counter()
+        if left <= spin_s:
+            break
+        sliced_sleep(left - spin_s, stop_evt)
+        if is_stopped(stop_evt):
+            return None
+    while time.perf_counter() < target_pc:
+        if is_stopped(stop_evt):
+            return None
+    return time.perf_counter()
+
+
+# ------------------ WORKER ------------------
+
+class RunConfig:
+    """
+    Parametry jednego START, pobrane z UI w momencie kliknięcia.
+    Worker nie czyta zmiennych Tk – dzięki temu może działać też w osobnym procesie.
+    """
+
+    def __init__(self, start_d, start_h, end_d, end_h, poll_s, load_to, success_to,
+                 fast_click=True, raw_cdp=True, reduce_motion=True,
+                 block_resources=False, keep_focus=True, cdp_endpoint=CDP_ENDPOINT,
+                 awizacja="", macro=None, adaptive=True,
+                 rate_profile=(), max_rps=SCHED_MAX_RPS, arm_at=None, refresh=REFRESH_AUTO,
+                 coordinator="", coordinator_token=""):
+        self.start_d = start_d
+        self.start_h = start_h
+        self.end_d = end_d
+        self.end_h = end_h
+        self.poll_s = poll_s
+        self.load_to = load_to
+        self.success_to = success_to
+        self.fast_click = fast_click
+        self.raw_cdp = raw_cdp
+        self.reduce_motion = reduce_motion
+        self.block_resources = block_resources
+        self.keep_focus = keep_focus
+        self.cdp_endpoint = cdp_endpoint
+        self.awizacja = awizacja
+        self.macro = macro   # nagrane przejście do ekranu slotów tej awizacji (albo None)
+        self.adaptive = adaptive
+        self.rate_profile = list(rate_profile)   # [(od_min, do_min, interwał_s)] z parse_rate_profile
+        self.max_rps = max_rps
+        self.arm_at = arm_at   # epoch s pierwszego odświeżenia (tryb uzbrojony) albo None
+        self.refresh = refresh  # strategia odświeżania (jeden dzień): REFRESH_AUTO albo nazwa
+        self.coordinator = coordinator   # URL koordynatora puli (pusty = bez koordynacji)
+        self.coordinator_token = coordinator_token
+
+    def days(self):
+        """Lista dni w zakresie."""
+        out = []
+        d = self.start_d
+        while d <= self.end_d:
+            out.append(d)
+            d += dt.timedelta(days=1)
+        return out
+
+    def iter_hours_for_day(self, d):
+        sd, sh, ed, eh = self.start_d, self.start_h, self.end_d, self.end_h
+        if sd == ed:
+            if eh < sh:
+                return range(sh, 24)
+            return range(sh, eh + 1)
+        if d == sd:
+            return range(sh, 24)
+        if d == ed:
+            return range(0, eh + 1)
+        return range(0, 24)
+
+
+class Worker(threading.Thread):
+    """
+    Pętla rezerwacji. ui to odbiorca zdarzeń: log, popup, emit_notification,
+    show_start_metric, show_timeouts (App w tym samym procesie albo EngineSink
+    w procesie silnika).
+    """
+
+    def __init__(self, ui, session, cfg, license_gate, t_start=None, latency=None, bucket=None, selectors=None,
+                 refresher=None):
+        super().__init__(daemon=True)
+        self.ui = ui
+        self.session = session
+        self.cfg = cfg
+        self.license_gate = license_gate
+        self.t_start = t_start if t_start is not None else time.perf_counter()
+        self.stop_evt = threading.Event()
+        self.t_stop = None
+        self.on_done = None
+        self.fast = None
+        self.raw = None
+        self.motion = None
+        self.blocker = None
+        self.focus = None
+        self._pw_cdp = None
+        self.supervisor = None
+        self.latency = latency if latency is not None else LatencyTracker()
+        self.bucket = bucket if bucket is not None else TokenBucket(cfg.max_rps)
+        self.selectors = selectors if selectors is not None else SelectorCalibrator()
+        self.roots = None
+        self.page = None
+        self.calendar = None   # SlotCalendar puli: odczyty dni z innych kart
+        self.ledger = None     # BookingLedger puli: jedna rezerwacja na awizację
+        self.deadline = None   # monotonic: koniec przydziału czasu (BatchWorker); None = do sukcesu/STOP
+        self.sched = PollScheduler(cfg.poll_s, cfg.rate_profile, clock=self.server_now)
+        self.refresher = refresher if refresher is not None else RefreshRunner(ui, default_refresh_strategies())
+        self.refresher.fixed = cfg.refresh
+        self.lost_races = 0
+        self.failover_ms = deque(maxlen=50)
+        self.arm_fired = None   # perf_counter końca czekania na cel (do pomiaru błędu strzału)
+        self.arm_wait_err = 0.0
+        self.t_click = None
+
+    def run(self):
+        try:
+            # Playwright działa na wątku sesji – tu tylko czekamy na wynik.
+            self.session.submit(self.logic).result()
+        except Exception as e:
+            self.ui.log(f"[FATAL] {e}")
+            self.ui.popup("Błąd", str(e))
+
+        if self.t_stop is not None:
+            ms = (time.perf_counter() - self.t_stop) * 1000
+            tag = "[STOP]" if ms <= STOP_LATENCY_BUDGET_MS else "[WARN]"
+            self.ui.log(f"{tag} Worker zatrzymany {ms:.0f} ms po STOP (limit {STOP_LATENCY_BUDGET_MS} ms).")
+
+        if self.on_done is not None:
+            self.on_done()
+
+    def stop(self):
+        if self.t_stop is None:
+            self.t_stop = time.perf_counter()
+        self.stop_evt.set()
+
+    def logic(self):
+        ui = self.ui
+        cfg = self.cfg
+        poll_s, load_to, success_to = cfg.poll_s, cfg.load_to, cfg.success_to
+        days = cfg.days()
+
+        ui.log("[PW] Szukam karty eBramy...")
+        self.session.use_endpoint(cfg.cdp_endpoint)
+        page = self.session.slot_page(self.stop_evt)
+        if page is None:
+            return   # STOP w trakcie łączenia z Chrome
+
+        ui.log(f"[OK] Strona: {page.url}")
+        self.ensure_screen(page)
+        self.attach_page(page)
+
+        try:
+            self.loop(page, days, poll_s, load_to, success_to)
+        finally:
+            self.detach_page()
+
+    def server_now(self):
+        """Czas eBramy (epoch s); bez zegara serwera – lokalny."""
+        clock = self.session.clock if self.session is not None else None
+        return clock.server_now() if clock is not None else time.time()
+
+    def timeout(self, phase, limit_ms, default_ms=None):
+        """Limit fazy: wyuczony (LatencyTracker) albo stały, gdy adaptacja wyłączona."""
+        if not self.cfg.adaptive:
+            return int(limit_ms if default_ms is None else default_ms)
+        return self.latency.timeout(phase, limit_ms, default_ms)
+
+    def timeout_limits(self):
+        limits = {
+            "grid": self.cfg.load_to,
+            "click": TILE_CLICK_MAX_MS,
+            "dialog": self.cfg.success_to,
+        }
+        for s in self.refresher.strategies:
+            limits[refresh_phase(s.name)] = self.cfg.load_to
+        return limits
+
+    def publish_timeouts(self):
+        self.ui.show_timeouts(self.latency.snapshot(self.timeout_limits()))
+
+    def ensure_screen(self, page):
+        """ensure_slot_screen, a poza ekranem slotów najpierw próba dojścia nagranym makrem."""
+        if not is_slot_screen(page) and self.cfg.macro:
+            self.renavigate(page)
+        ensure_slot_screen(page)
+
+    def renavigate(self, page, budget_s=MACRO_REPLAY_BUDGET_S):
+        """Powrót na ekran slotów makrem nawigacji awizacji z RunConfig."""
+        macro = self.cfg.macro
+        t0 = time.perf_counter()
+        try:
+            ok = replay_macro(page, macro, self.stop_evt, budget_s)
+        except Exception as e:
+            self.ui.log(f"[MAKRO] Błąd odtwarzania: {e}")
+            ok = False
+        ms = (time.perf_counter() - t0) * 1000
+        where = "ekran slotów" if ok else "NIE dotarłem do ekranu slotów"
+        self.ui.log(f"[MAKRO] {self.cfg.awizacja}: {len(macro['steps'])} kroków, {ms:.0f} ms – {where}.")
+        return ok
+
+    def attach_page(self, page):
+        """Przygotowanie karty na czas pracy Workera (cofane w detach_page)."""
+        self.page = page
+        self.refresher.watch(page)
+        if self.cfg.raw_cdp:
+            try:
+                self.raw = self.session.raw_client(page)
+                self.ui.log("[CDP] Bezpośredni klient CDP podpięty (odczyt slotów i kliknięcia).")
+            except Exception as e:
+                self.raw = None
+                self.ui.log(f"[CDP] Bezpośredni klient niedostępny ({e}) – wszystko przez Playwright.")
+
+        if self.cfg.reduce_motion:
+            try:
+                self.motion = MotionSuppressor(self.page_cdp(page))
+                self.motion.apply()
+            except Exception as e:
+                self.motion = None
+                self.ui.log(f"[CDP] Nie udało się wyłączyć animacji ({e}).")
+
+        if self.cfg.keep_focus:
+            try:
+                self.focus = FocusKeeper(self.page_cdp(page))
+                self.focus.apply()
+            except Exception as e:
+                self.focus = None
+                self.ui.log(f"[CDP] Nie udało się wyłączyć throttlingu karty w tle ({e}).")
+
+        if self.cfg.block_resources:
+            try:
+                self.blocker = ResourceBlocker(self.page_cdp(page), self.page_js(page))
+                self.blocker.install()
+                hosts = ", ".join(sorted(self.blocker.allow))
+                self.ui.log(f"[BLOK] Blokowanie obrazków, czcionek i obcych skryptów włączone (skrypty z: {hosts}).")
+            except Exception as e:
+                self.blocker = None
+                self.ui.log(f"[BLOK] Nie udało się włączyć blokowania zasobów ({e}).")
+
+        if self.cfg.fast_click:
+            try:
+                self.fast = FastClicker(page, self.raw)
+                self.fast.fit_grid()
+            except Exception as e:
+                self.fast = None
+                self.ui.log(f"[FAST] Szybki klik niedostępny ({e}) – używam click().")
+
+        self.calibrate_selectors(page)
+        self.roots = RootRegistry(page, self.page_js(page), self.ui.log)
+
+    def page_cdp(self, page):
+        """Kanał CDP karty: CdpClient, a bez niego sesja CDP Playwrighta (jedna na START)."""
+        if self.raw is not None:
+            return self.raw
+        if self._pw_cdp is None:
+            self._pw_cdp = page.context.new_cdp_session(page)
+        return self._pw_cdp
+
+    def calibrate_selectors(self, page, force=False):
+        """Kalibracja selektorów przy podpięciu karty i po zmianie wersji/układu strony."""
+        sc = self.selectors
+        try:
+            if not sc.check_build(self.page_js(page)) and not force:
+                return
+            t0 = time.perf_counter()
+            if not sc.is_calibrated("day") or force:
+                sc.calibrate(page, "day")
+            if not sc.is_calibrated("tile") or force:
+                sample = next(iter(self.read_slots(page)), None)
+                if sample:
+                    sc.calibrate(page, "tile", key=sample, rx=re.escape(sample))
+            ms = (time.perf_counter() - t0) * 1000
+            self.ui.log(
+                f"[SEL] Wersja strony {sc.build}: dzień {len(sc.selectors('day'))}/{len(DAY_SELECTORS)}, "
+                f"kafelek {len(sc.selectors('tile'))}/{len(TILE_SELECTORS)} żywych selektorów ({ms:.0f} ms)."
+            )
+        except Exception as e:
+            self.ui.log(f"[SEL] Kalibracja selektorów nieudana ({e}) – kolejność domyślna.")
+
+    def page_js(self, page):
+        """evaluate() karty: przez CdpClient, gdy jest, inaczej Playwright."""
+        return self.raw.evaluate if self.raw is not None else page.evaluate
+
+    def detach_page(self):
+        if self.page is not None:
+            self.refresher.unwatch(self.page)
+        if self.roots is not None:
+            self.roots.close()
+            self.roots = None
+        if self.fast is not None:
+            self.fast.detach()
+            self.fast = None
+        if self.motion is not None:
+            self.motion.remove()
+            self.motion = None
+        if self.focus is not None:
+            self.focus.remove()
+            self.focus = None
+        if self.blocker is not None:
+            self.blocker.remove()
+            self.ui.log(f"[BLOK] Wyłączone: {self.blocker.summary()}.")
+            self.blocker = None
+        if self._pw_cdp is not None:
+            try:
+                self._pw_cdp.detach()
+            except Exception:
+                pass
+            self._pw_cdp = None
+        # sam klient CDP zostaje w sesji (ciepły na następny START)
+        self.raw = None
+
+    def read_slots(self, page):
+        """Odczyt siatki: przez CdpClient, a gdy ten padnie – przez Playwright."""
+        METRICS.inc("slot_reads")
+        if self.raw is not None:
+            try:
+                return read_slots_raw(self.raw)
+            except CdpError as e:
+                self.ui.log(f"[CDP] Odczyt przez klienta CDP nie powiódł się ({e}) – przechodzę na Playwright.")
+                self.raw = None
+                if self.fast is not None and self.fast.raw is not None:
+                    self.fast = None
+        return fast_read_slots(page)
+
+    def loop(self, page, days, poll_s, load_to, success_to):
+        """Pętla rezerwacji; True = awizacja zarezerwowana."""
+        steps = self.steps(page, days, poll_s, load_to, success_to)
+        try:
+            while True:
+                delay = next(steps)
+                if delay > 0:
+                    self.stop_evt.wait(delay)
+        except StopIteration as e:
+            return e.value
+
+    def steps(self, page, days, poll_s, load_to, success_to):
+        """
+        Pętla rezerwacji jako generator (korutyna puli). yield = miejsce na
+        przełączenie, wartość = ile sekund można czekać przed kolejnym krokiem.
+        """
+        ui = self.ui
+        cfg = self.cfg
+        session = self.session
+        self.page = page
+        first_read = self.t_start is not None
+        iter_ms = []
+        self.supervisor = PageSupervisor(
+            ui, self.stop_evt, self.page_js(page), load_to,
+            renavigate=self.renavigate if cfg.macro else None,
+        )
+        if cfg.arm_at is not None and not self.armed_wait(page, days):
+            return
+
+        while not self.stop_evt.is_set():
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return False
+            t_iter = time.perf_counter()
+            try:
+                for i, day in enumerate(days):
+                    if i:
+                        yield 0.0
+                    if self.stop_evt.is_set():
+                        return
+
+                    # 0) Zdrowie karty: wylogowanie / zawieszony loader / zgubiony ekran
+                    if not self.supervisor.check(page):
+                        yield SUPERVISOR_PAUSE_POLL_S
+                        break
+                    if self.supervisor.last is not None:
+                        self.roots.check(self.supervisor.last["roots"])
+                    self.roots.ensure()
+
+                    # pula: świeży odczyt dnia z innej karty bez wolnych slotów w naszych godzinach
+                    if self.calendar is not None:
+                        seen = self.calendar.get(day)
+                        if seen is not None and not self.rank_candidates(day, seen):
+                            continue
+
+                    # 1) ZAWSZE ustaw właściwy dzień
+                    if not ensure_day_selected(page, day, load_to, stop_evt=self.stop_evt,
+                                               selectors=self.selectors, scope=self.roots.scope("calendar")):
+                        if self.stop_evt.is_set():
+                            return
+                        ui.log(f"[WARN] Nie udało się ustawić dnia {day.isoformat()} – pomijam i wracam do pętli.")
+                        continue
+
+                    # 2) Odświeżanie (limit ładowania uczony z ostatnich odświeżeń)
+                    wait_s = self.bucket.try_acquire()
+                    while wait_s > 0:
+                        yield wait_s
+                        if self.stop_evt.is_set():
+                            return
+                        wait_s = self.bucket.try_acquire()
+                    # każda strategia ma własny rozkład i limit (reload nie dziedziczy limitu API)
+                    if len(days) == 1:
+                        quiet = cfg.arm_at is not None and self.server_now() < cfg.arm_at + REFRESH_ARM_QUIET_S
+                        strategy = self.refresher.pick(page, explore=not quiet)
+                        phase = refresh_phase(strategy.name)
+                    else:
+                        strategy, phase = None, "grid"
+                    grid_to = self.timeout(phase, load_to)
+                    t_refresh = time.perf_counter()
+                    if self.arm_fired is not None:
+                        self.log_arm_error(t_refresh)
+                    if strategy is not None:
+                        self.refresher.run(strategy, page, day, grid_to, self.stop_evt)
+                    else:
+                        click_day_by_coordinates(page, day, grid_to, self.stop_evt)
+                    if self.stop_evt.is_set():
+                        return
+                    refresh_ms = (time.perf_counter() - t_refresh) * 1000
+                    self.latency.record(phase, refresh_ms, timed_out=refresh_ms >= grid_to)
+
+                    # 3) Safety: jeśli UI przeskoczyło dzień, nie klikamy slotów
+                    cur = get_selected_day_number(page, self.selectors, self.roots.scope("calendar"))
+                    if cur is not None and cur != day.day:
+                        ui.log(f"[SAFE] Aktualnie zaznaczony dzień={cur}, oczekiwany={day.day}. Nie klikam slotów.")
+                        continue
+
+                    slots = self.read_slots(page)
+                    if self.calendar is not None:
+                        self.calendar.put(day, slots)
+                    if self.sched.observe(day, slots):
+                        ui.log(f"[SCHED] Ruch na slotach {day.isoformat()} – szybsze odświeżanie przez {SCHED_CHURN_HOLD_S:.0f} s.")
+                    if first_read:
+                        first_read = False
+                        ms = (time.perf_counter() - self.t_start) * 1000
+                        self.t_start = None   # metryka tylko dla pierwszej pętli po START
+                        ui.log(f"[METRYKA] START → pierwszy odczyt slotów: {ms:.0f} ms")
+                        ui.show_start_metric(ms)
+
+                    # 4) Wolne sloty tego dnia z zakresu godzin – od najlepszego kandydata
+                    candidates = self.rank_candidates(day, slots)
+                    tried = set()
+                    lost_at = None
+                    while candidates:
+                        if self.stop_evt.is_set():
+                            return
+                        slot_key, used, total = candidates.pop(0)
+                        tried.add(slot_key)
+
+                        # rezerwujemy dopiero po potwierdzonej licencji
+                        if not self.license_gate.wait(self.stop_evt):
+                            if not self.stop_evt.is_set():
+                                ui.log("[LIC] Licencja nieważna – nie klikam slotów.")
+                            return
+
+                        if self.ledger is not None and not self.ledger.claim(cfg.awizacja, id(self)):
+                            ui.log("[PULA] Awizacja zarezerwowana albo obsługiwana przez inne zadanie – kończę.")
+                            return False
+
+                        if lost_at is not None:
+                            self.log_failover(lost_at)
+                            lost_at = None
+                        ui.log(f"[TRY] {day.isoformat()} {slot_key} {used}/{total}")
+                        METRICS.inc("attempts")
+
+                        # klik slot + potwierdzenia
+                        self.try_slot(page, slot_key, load_to, success_to)
+                        if self.stop_evt.is_set():
+                            return
+
+                        # toast "brak slotów" = przegrany wyścig: jeden odczyt bez odświeżania
+                        # i od razu następny wciąż wolny kandydat
+                        if toast_no_slots(page, self.stop_evt, self.roots.scope("toast")):
+                            lost_at = time.perf_counter()
+                            self.record_outcome()
+                            self.lost_races += 1
+                            METRICS.inc("lost_races")
+                            if self.ledger is not None:
+                                self.ledger.release(cfg.awizacja, id(self))
+                            fresh = self.read_slots(page)
+                            if self.calendar is not None:
+                                self.calendar.put(day, fresh)
+                            candidates = [c for c in self.rank_candidates(day, fresh) if c[0] not in tried]
+                            ui.log(
+                                f"[INFO] Toast 'Brak dostępnych slotów' – "
+                                f"{len(candidates)} kolejnych wolnych kandydatów."
+                            )
+                            continue
+
+                        # sukces tylko po komunikacie o wysłaniu do kierowcy
+                        # limit z ustawień, nie wyuczony: zbyt krótkie czekanie = ponowna rezerwacja
+                        if success_confirmed(page, success_to, self.stop_evt):
+                            self.record_outcome()
+                            METRICS.inc("successes")
+                            if self.ledger is not None:
+                                self.ledger.commit(cfg.awizacja, id(self), f"{day.isoformat()} {slot_key}")
+                            ui.emit_notification("slot_success")
+                            ui.log("[SUCCESS] Awizacja utworzona (wysłane do kierowcy).")
+                            return True
+                        self.t_click = None   # brak wyniku – nie uczymy się z niepotwierdzonej próby
+            except Exception:
+                # Chrome zniknął / karta zamknięta -> ponowne połączenie i dalej
+                if session.is_connected() and not page.is_closed():
+                    raise
+                ui.log("[PW] Utracono połączenie z Chrome – łączę ponownie...")
+                if not session.is_connected() and not session.reconnect(self.stop_evt):
+                    return
+                self.detach_page()   # jeszcze na starej karcie: odpina jej listenery
+                page = self.reopen_page()
+                if page is None:
+                    return
+                self.page = page
+                self.attach_page(page)
+                self.supervisor.js = self.page_js(page)
+                ui.log(f"[OK] Ponownie połączono: {page.url}")
+                continue
+
+            iter_ms.append((time.perf_counter() - t_iter) * 1000)
+            METRICS.inc("iterations")
+            if len(iter_ms) >= ITER_STATS_EVERY:
+                self.log_iteration_stats(page, iter_ms)
+                self.calibrate_selectors(page)   # nowa wersja / układ strony -> nowa kalibracja
+                iter_ms = []
+
+            yield self.sched.delay()
+
+    def reopen_page(self):
+        """Karta do dalszej pracy po utracie połączenia. None = STOP."""
+        page = self.session.slot_page(self.stop_evt)
+        if page is not None:
+            self.ensure_screen(page)
+        return page
+
+    def rank_candidates(self, day, slots):
+        """
+        Wolne sloty dnia w zakresie godzin, najlepsze najpierw: więcej wolnych
+        miejsc = większa szansa, że ktoś nas nie uprzedzi; remis -> wcześniejsza godzina.
+        """
+        out = []
+        for h in self.cfg.iter_hours_for_day(day):
+            slot_key = f"{h:02d}:00-{h:02d}:59"
+            if slot_key in slots:
+                used, total = slots[slot_key]
+                if used < total:
+                    out.append((slot_key, used, total))
+        out.sort(key=lambda c: -(c[2] - c[1]))   # sort stabilny: przy remisie kolejność godzin
+        return out
+
+    def log_failover(self, lost_at):
+        ms = (time.perf_counter() - lost_at) * 1000
+        self.failover_ms.append(ms)
+        avg = sum(self.failover_ms) / len(self.failover_ms)
+        self.ui.log(f"[METRYKA] Przegrany wyścig → następna próba: {ms:.0f} ms (śr {avg:.0f} ms, n={len(self.failover_ms)})")
+
+    def armed_wait(self, page, days):
+        """
+        Tryb uzbrojony: wszystko przygotowane przed celem (karta, ekran, dzień,
+        kafelki, ciepłe HTTP), a pierwsze odświeżenie rusza dokładnie o arm_at.
+        False = STOP przed strzałem.
+        """
+        target = self.cfg.arm_at
+        label = dt.datetime.fromtimestamp(target).strftime("%H:%M:%S.%f")[:-3]
+        self.ui.log(f"[ARM] Uzbrojony na {label} (za {target - self.server_now():.1f} s) – przygotowuję kartę.")
+
+        ensure_day_selected(page, days[0], self.cfg.load_to, stop_evt=self.stop_evt, selectors=self.selectors)
+        self.read_slots(page)   # rozgrzewa ścieżkę odczytu (JS w karcie, klient CDP)
+        if self.fast is not None:
+            try:
+                self.fast.fit_grid()
+            except Exception:
+                pass
+
+        js = self.page_js(page)
+        while target - self.server_now() > ARM_WARM_INTERVAL_S + 1:
+            self.supervisor.check(page)
+            try:
+                js(ARM_WARM_JS)
+            except Exception:
+                pass
+            if self.stop_evt.wait(ARM_WARM_INTERVAL_S):
+                return False
+        try:
+            js(ARM_WARM_JS)
+        except Exception:
+            pass
+
+        # godzina uzbrojenia to czas eBramy: przeliczenie na zegar lokalny
+        clock = self.session.clock
+        if clock is not None and clock.synced:
+            target -= clock.offset
+            self.ui.log(
+                f"[ARM] Cel według zegara eBramy: offset {clock.offset * 1000:+.0f} ms "
+                f"± {clock.uncertainty * 1000:.0f} ms."
+            )
+        else:
+            self.ui.log("[ARM] Brak pomiaru zegara eBramy – cel według zegara lokalnego.")
+
+        self.arm_fired = wait_until(target, self.stop_evt)
+        self.arm_wait_err = (time.time() - target) * 1000
+        return self.arm_fired is not None
+
+    def log_arm_error(self, t_refresh):
+        """Błąd strzału: start pierwszego odświeżenia względem celu."""
+        prep_ms = (t_refresh - self.arm_fired) * 1000
+        self.arm_fired = None
+        self.ui.log(
+            f"[ARM] Strzał: {self.arm_wait_err + prep_ms:+.1f} ms od celu "
+            f"(koniec czekania {self.arm_wait_err:+.1f} ms, dzień/limit przed kliknięciem {prep_ms:.1f} ms)."
+        )
+
+    def record_outcome(self):
+        """Czas od kliknięcia kafelka do potwierdzonego wyniku (sukces / toast) -> rozkład fazy 'outcome'."""
+        if self.t_click is not None:
+            self.latency.record("outcome", (time.perf_counter() - self.t_click) * 1000)
+            self.t_click = None
+        self.publish_timeouts()
+
+    def log_iteration_stats(self, page, iter_ms):
+        """Czas iteracji (bez pauzy poll) + widoczność karty – widać wpływ minimalizacji okna."""
+        try:
+            vis = self.page_js(page)("() => document.visibilityState + (document.hasFocus() ? '/focus' : '')")
+        except Exception:
+            vis = "?"
+        avg = sum(iter_ms) / len(iter_ms)
+        focus = "ON" if self.focus is not None else "OFF"
+        self.ui.log(
+            f"[METRYKA] Iteracja: śr {avg:.0f} ms, max {max(iter_ms):.0f} ms "
+            f"(ostatnie {len(iter_ms)}) | karta: {vis} | anty-throttling: {focus}"
+        )
+        sched = self.sched
+        self.ui.log(
+            f"[METRYKA] Kadencja: interwał {sched.interval():.2f} s | spóźnione cykle {sched.late}/{sched.ticks} "
+            f"| sufit {self.cfg.max_rps:g}/s, czekanie na limit {self.bucket.waited_s:.1f} s"
+        )
+        if self.lost_races:
+            avg = sum(self.failover_ms) / len(self.failover_ms) if self.failover_ms else 0
+            self.ui.log(f"[METRYKA] Przegrane wyścigi: {self.lost_races}, śr. przejście do kolejnej próby {avg:.0f} ms")
+        if self.refresher.count:
+            self.ui.log(f"[METRYKA] Odświeżanie ({self.refresher.best or 'pomiar'}): {self.refresher.summary()}")
+        if self.cfg.adaptive:
+            snap = self.latency.snapshot(self.timeout_limits())
+            self.ui.log(f"[METRYKA] Limity adaptacyjne: {format_timeouts(snap)}")
+            self.ui.show_timeouts(snap)
+
+    def click_tile_locator(self, page, slot_key):
+        """Zwykły click() kafelka. None = kafelka nie ma, False = nie udało się kliknąć."""
+        stop_evt = self.stop_evt
+
+        # button/a/role=button z slot_key, a w ostateczności tekst "HH:00-HH:59 xx/yy"
+        # (kolejność z kalibracji; pierwszy selektor, który cokolwiek znajduje)
+        fmt = {"key": slot_key, "rx": re.escape(slot_key)}
+        n, tile_sel = 0, None
+        for grid in (self.roots.scope("grid"), page):
+            for tile_sel in self.selectors.selectors("tile"):
+                candidates = grid.locator(tile_sel.format(**fmt))
+                n = candidates.count()
+                if n:
+                    break
+            if n or grid is page:
+                break
+        if n and grid is page:
+            self.roots.miss("grid")
+
+        if n == 0:
+            self.ui.log(f"[WARN] Nie znalazłem kafelka dla slotu: {slot_key}")
+            return None
+
+        click_to = self.timeout("click", TILE_CLICK_MAX_MS)
+        for i in range(min(n, 12)):
+            if stop_evt.is_set():
+                return False
+            el = candidates.nth(i)
+            try:
+                if el.is_visible():
+                    sliced_wait(lambda ms: el.scroll_into_view_if_needed(timeout=ms), click_to, stop_evt)
+                    t0 = time.perf_counter()
+                    if sliced_click(el, click_to, stop_evt):
+                        self.latency.record("click", (time.perf_counter() - t0) * 1000)
+                        self.selectors.win("tile", tile_sel)
+                        return True
+                    if not stop_evt.is_set():
+                        self.latency.record("click", click_to, timed_out=True)
+            except Exception:
+                continue
+        return False
+
+    def try_slot(self, page, slot_key, load_to, success_to):
+        """
+        Kliknięcie slotu + agresywna pętla potwierdzeń TAK/OK (v4.2.3).
+        Każde oczekiwanie jest dzielone na kawałki i przerywane przez STOP.
+        """
+        stop_evt = self.stop_evt
+        try:
+            clicked = False
+
+            # Szybka ścieżka: CDP Input + sonda reakcji; bez potwierdzenia -> zwykły click()
+            if self.fast is not None:
+                try:
+                    clicked = self.fast.click_tile(slot_key, stop_evt)
+                except Exception:
+                    clicked = False
+                if not clicked and not stop_evt.is_set():
+                    self.ui.log(f"[FAST] Brak potwierdzenia szybkiego kliknięcia {slot_key} – klikam click().")
+
+            if not clicked:
+                clicked = self.click_tile_locator(page, slot_key)
+                if clicked is None:
+                    return
+
+            if stop_evt.is_set():
+                return
+
+            if not clicked:
+                self.ui.log(f"[WARN] Kafelek slotu jest, ale nie udało się kliknąć: {slot_key}")
+                return
+
+            # Faza 1 (ultra-fast): od razu próbujemy klikać dialogi,
+            # bez czekania na pełne dociągnięcie UI.
+            t_confirm = self.t_click = time.perf_counter()
+            dialog_to = self.timeout("dialog", success_to) if self.cfg.adaptive else None
+            first_ms = confirm_loop_fast(
+                page, max_clicks=60, stop_evt=stop_evt, budget_ms=dialog_to,
+                selectors=self.selectors, scope=self.roots.scope("modal"),
+            )
+            if first_ms is not None:
+                self.latency.record("dialog", first_ms)
+            elif dialog_to is not None and not stop_evt.is_set():
+                self.latency.record("dialog", dialog_to, timed_out=True)
+
+            # Faza 2: jeśli UI jeszcze ładuje, dokończ po załadowaniu.
+            wait_for_slots_loaded(page, self.timeout("grid", load_to), stop_evt)
+            confirm_loop_fast(
+                page, max_clicks=40, stop_evt=stop_evt, budget_ms=dialog_to,
+                selectors=self.selectors, scope=self.roots.scope("modal"),
+            )
+
+            ms = (time.perf_counter() - t_confirm) * 1000
+            motion = "bez animacji" if self.motion is not None else "z animacjami"
+            self.ui.log(f"[METRYKA] Faza potwierdzeń TAK/OK: {ms:.0f} ms ({motion})")
+
+            # jeśli sukces pojawi się szybko, kończymy od razu
+            if stop_evt.is_set() or success_visible(page):
+                return
+
+            # dodatkowo: jeszcze krótko poczekaj na sukces (minimalnie)
+            success_confirmed(page, min(SUCCESS_QUICK_MAX_MS, int(success_to)), stop_evt)
+
+        except Exception as e:
+            self.ui.log(f"[WARN] Kliknięcie slotu nie powiodło się: {e}")
+
+
+# ------------------ BATCH QUEUE ------------------
+
+BATCH_SLICE_S = 30.0        # tyle pracujemy nad jedną awizacją, zanim przejdziemy do następnej
+BATCH_MAX_NAV_FAILS = 3     # tyle nieudanych dojść makrem = zadanie pominięte
+BATCH_DT_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H")
+BATCH_COLUMNS = ("awizacja", "od", "do", "priorytet")
+
+
+class BatchJob:
+    """
+    Jedno zadanie kolejki: awizacja + okno (od/do z dokładnością do godziny)
+    + priorytet (1 = najważniejsze). Status i czasy uzupełnia BatchWorker
+    (slices: przejścia w kolejce, w puli – cykle odświeżania).
+    """
+
+    def __init__(self, job_id, ref, start, end, priority=5):
+        self.id = job_id
+        self.ref = ref
+        self.start = start
+        self.end = end
+        self.priority = priority
+        self.status = "czeka"
+        self.screen_confirmed = False   # operator potwierdził, że otwarty ekran slotów to ta awizacja
+        self.slices = 0
+        self.nav_fails = 0
+        self.active_s = 0.0
+        self.booked_after_s = None
+        self.last_run = 0.0
+
+    def window(self):
+        return f"{self.start:%Y-%m-%d %H}:00 – {self.end:%Y-%m-%d %H}:59"
+
+    def state(self):
+        return {
+            "id": self.id, "ref": self.ref, "window": self.window(), "priority": self.priority,
+            "status": self.status, "slices": self.slices, "active_s": self.active_s,
+            "booked_after_s": self.booked_after_s,
+        }
+
+
+def _parse_batch_dt(text):
+    for fmt in BATCH_DT_FORMATS:
+        try:
+            return dt.datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Niepoprawna data/godzina: '{text.strip()}' (format RRRR-MM-DD GG[:MM])")
+
+
+def load_batch_csv(path):
+    """
+    CSV z kolumnami awizacja;od;do;priorytet (nagłówek opcjonalny, separator ; lub ,).
+    Błędny wiersz -> ValueError z numerem linii.
+    """
+    text = Path(path).read_text(encoding="utf-8-sig")
+    delim = ";" if text.count(";") >= text.count(",") else ","
+    jobs = []
+    for n, row in enumerate(csv.reader(text.splitlines(), delimiter=delim), start=1):
+        row = [c.strip() for c in row]
+        if not any(row) or (n == 1 and row[0].lower() == BATCH_COLUMNS[0]):
+            continue
+        if len(row) < 3:
+            raise ValueError(f"Linia {n}: za mało kolumn (awizacja;od;do;priorytet)")
+        try:
+            start, end = _parse_batch_dt(row[1]), _parse_batch_dt(row[2])
+            priority = int(row[3]) if len(row) > 3 and row[3] else 5
+        except ValueError as e:
+            raise ValueError(f"Linia {n}: {e}")
+        if end < start:
+            raise ValueError(f"Linia {n}: koniec okna przed początkiem")
+        jobs.append(BatchJob(len(jobs) + 1, row[0], start, end, priority))
+    return jobs
+
+
+class BatchWorker(Worker):
+    """
+    Kolejka awizacji w jednej sesji: najważniejsze zadanie (a przy równym
+    priorytecie – najdawniej obsługiwane) dostaje BATCH_SLICE_S pętli
+    rezerwacji; na ekran slotów awizacji prowadzi jej makro nawigacji.
+    Zadanie bez makra pracuje tylko na ekranie potwierdzonym przez operatora
+    (pierwsze zadanie, zanim inne zmieni ekran). Powtórzenia i awizacje
+    z BookingLedger są odrzucane.
+    ui dodatkowo: batch_update(stan zadania), batch_summary(tekst).
+    """
+
+    label = "Kolejka"
+
+    def __init__(self, ui, session, cfg, license_gate, jobs, macros, t_start=None, ledger=None, **kwargs):
+        super().__init__(ui, session, cfg, license_gate, t_start, **kwargs)
+        self.base_cfg = cfg
+        self.jobs = jobs
+        self.macros = macros
+        self.ledger = ledger if ledger is not None else BookingLedger()
+        self.first_job = None
+        self.screen_ref = None   # awizacja, której ekran slotów jest na pewno otwarty
+
+    def job_config(self, job):
+        cfg = copy.copy(self.base_cfg)
+        cfg.start_d, cfg.start_h = job.start.date(), job.start.hour
+        cfg.end_d, cfg.end_h = job.end.date(), job.end.hour
+        cfg.awizacja = job.ref
+        cfg.macro = self.macros.get(job.ref)
+        if job is not self.first_job:
+            cfg.arm_at = None   # tryb uzbrojony tylko dla pierwszego zadania
+        return cfg
+
+    def pending(self):
+        return [j for j in self.jobs if j.status in ("czeka", "w toku")]
+
+    def publish(self, job):
+        self.ui.batch_update(job.state())
+
+    def select_jobs(self):
+        """Zadania do uruchomienia: bez powtórzeń awizacji i bez już zarezerwowanych."""
+        jobs, refs = [], set()
+        for job in self.pending():
+            if job.ref in refs or self.ledger.is_booked(job.ref):
+                job.status = "duplikat" if job.ref in refs else "już zarezerwowana"
+                self.publish(job)
+                continue
+            refs.add(job.ref)
+            jobs.append(job)
+        return jobs
+
+    def logic(self):
+        ui = self.ui
+        t_batch = time.perf_counter()
+        jobs = self.select_jobs()
+        if not jobs:
+            ui.log("[KOLEJKA] Brak zadań do wykonania.")
+            return
+        self.first_job = min(jobs, key=lambda j: (j.priority, j.id))
+        if self.first_job.screen_confirmed:
+            self.screen_ref = self.first_job.ref
+
+        ui.log(f"[KOLEJKA] Start: {len(jobs)} zadań.")
+        self.session.use_endpoint(self.base_cfg.cdp_endpoint)
+        self.page = self.session.slot_page(self.stop_evt)
+        if self.page is None:
+            return
+        self.attach_page(self.page)
+        try:
+            while not self.stop_evt.is_set():
+                pending = self.pending()
+                if not pending:
+                    break
+                job = min(pending, key=lambda j: (j.priority, j.last_run, j.id))
+                self.run_job(job, t_batch)
+                if self.license_gate.refused:
+                    ui.log("[KOLEJKA] Licencja nieważna – przerywam kolejkę.")
+                    break
+        finally:
+            self.detach_page()
+            self.log_summary(t_batch)
+
+    def run_job(self, job, t_batch):
+        ui = self.ui
+        self.cfg = cfg = self.job_config(job)
+        job.last_run = time.monotonic()
+        if self.ledger.is_booked(job.ref):
+            job.status = "już zarezerwowana"
+            self.publish(job)
+            return
+        if cfg.macro is None and self.screen_ref != job.ref:
+            # otwarty ekran może należeć do innej awizacji – bez makra nie wiemy, gdzie jesteśmy
+            job.status = "brak makra"
+            ui.log(f"[KOLEJKA] {job.ref}: brak nagranego makra – pomijam (NAGRAJ na zakładce Rezerwacja).")
+            self.publish(job)
+            return
+
+        job.status = "w toku"
+        job.slices += 1
+        self.publish(job)
+        ui.log(f"[KOLEJKA] {job.ref} ({job.window()}, priorytet {job.priority}) – przejście #{job.slices}.")
+
+        t0 = time.perf_counter()
+        booked = False
+        try:
+            if cfg.macro is not None:
+                self.screen_ref = None
+                if not self.renavigate(self.page):
+                    job.nav_fails += 1
+                    if job.nav_fails >= BATCH_MAX_NAV_FAILS:
+                        job.status = "błąd nawigacji"
+                    return
+                self.screen_ref = job.ref
+            if self.roots is not None:
+                self.roots.invalidate()   # inna awizacja = inny ekran
+            self.deadline = time.monotonic() + BATCH_SLICE_S if len(self.pending()) > 1 else None
+            booked = self.loop(self.page, cfg.days(), cfg.poll_s, cfg.load_to, cfg.success_to)
+        finally:
+            self.deadline = None
+            job.active_s += time.perf_counter() - t0
+            if job.status == "w toku":
+                job.status = "czeka"
+            self.publish(job)
+
+        if booked:
+            job.status = "zarezerwowano"
+            job.booked_after_s = time.perf_counter() - t_batch
+            ui.log(
+                f"[METRYKA] {job.ref}: zarezerwowano po {job.booked_after_s:.1f} s od startu kolejki "
+                f"({job.active_s:.1f} s pracy nad zadaniem, {job.slices} przejść)."
+            )
+            self.publish(job)
+        elif job.end < dt.datetime.now():
+            job.status = "okno minęło"
+            self.publish(job)
+
+    def log_summary(self, t_batch):
+        elapsed = time.perf_counter() - t_batch
+        done = [j for j in self.jobs if j.status == "zarezerwowano"]
+        per_h = len(done) / elapsed * 3600 if elapsed > 0 else 0.0
+        text = f"Zarezerwowano {len(done)}/{len(self.jobs)} w {elapsed / 60:.1f} min ({per_h:.1f} / h)"
+        self.ui.log(f"[METRYKA] {self.label}: {text}.")
+        self.ui.batch_summary(text)
+
+
+# ------------------ WORKER POOL ------------------
+
+POOL_CALENDAR_TTL_S = 1.0   # tyle ważny jest odczyt dnia z innej karty puli
+POOL_PUBLISH_S = 1.0        # co ile odświeżamy wiersze tabeli zadań
+
+
+class SlotCalendar:
+    """Wspólne odczyty siatek dni dla kart puli: dzień -> (czas odczytu, sloty)."""
+
+    def __init__(self, ttl_s=POOL_CALENDAR_TTL_S):
+        self.ttl_s = ttl_s
+        self._days = {}
+        self.hits = 0
+
+    def put(self, day, slots):
+        self._days[day] = (time.monotonic(), dict(slots))
+
+    def get(self, day):
+        entry = self._days.get(day)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_s:
+            return None
+        self.hits += 1
+        return entry[1]
+
+
+class BookingLedger:
+    """
+    Rejestr rezerwacji: awizacja zarezerwowana raz (zapis w LEDGER_FILE)
+    już nigdy nie jest klikana ponownie, a w trakcie próby należy do jednego
+    właściciela (claim/release).
+    """
+
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._claims = {}
+        try:
+            self._booked = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._booked = {}
+
+    def is_booked(self, ref):
+        with self._lock:
+            return ref in self._booked
+
+    def claim(self, ref, owner):
+        with self._lock:
+            if ref in self._booked or self._claims.get(ref, owner) != owner:
+                return False
+            self._claims[ref] = owner
+            return True
+
+    def release(self, ref, owner):
+        with self._lock:
+            if self._claims.get(ref) == owner:
+                del self._claims[ref]
+
+    def commit(self, ref, owner, slot):
+        with self._lock:
+            self._claims.pop(ref, None)
+            self._booked[ref] = {"slot": slot, "at": dt.datetime.now().isoformat(timespec="seconds")}
+            try:
+                Path(self.path).write_text(json.dumps(self._booked, ensure_ascii=False, indent=2), encoding="utf-8")
+            except OSError:
+                pass   # w pamięci i tak zostaje – ta sesja nie zarezerwuje ponownie
+
+
+class JobUi:
+    """ui Workera zadania puli: log z prefiksem awizacji, reszta bez zmian."""
+
+    def __init__(self, ui, ref):
+        self._ui = ui
+        self._prefix = f"[{ref}] "
+
+    def log(self, msg):
+        self._ui.log(self._prefix + msg)
+
+    def __getattr__(self, name):
+        return getattr(self._ui, name)
+
+
+class PoolMember(Worker):
+    """Worker jednego zadania puli (bez własnego wątku): własna karta, zasoby wspólne z pulą."""
+
+    def __init__(self, pool, job, cfg):
+        super().__init__(
+            JobUi(pool.ui, job.ref), pool.session, cfg, pool.license_gate, None,
+            pool.latency, pool.bucket, pool.selectors, pool.refresher,
+        )
+        self.t_start, pool.t_start = pool.t_start, None   # metryka START tylko dla pierwszego zadania
+        self.stop_evt = pool.stop_evt
+        self.calendar = pool.calendar
+        self.ledger = pool.ledger
+        self.job = job
+
+    def reopen_page(self):
+        page = self.session.new_tab(self.stop_evt)
+        if page is None:
+            return None
+        self.renavigate(page)
+        ensure_slot_screen(page)
+        return page
+
+
+class PoolWorker(BatchWorker):
+    """
+    Wszystkie zadania kolejki naraz: każde na własnej karcie, z własną
+    korutyną Worker.steps przełączaną na wątku sesji (najwcześniejszy termin
+    pierwszy). Wspólne: połączenie CDP, limiter zapytań, odczyty dni
+    (SlotCalendar) i rejestr rezerwacji (BookingLedger).
+    """
+
+    label = "Pula"
+
+    def __init__(self, ui, session, cfg, license_gate, jobs, macros, t_start=None, ledger=None, **kwargs):
+        super().__init__(ui, session, cfg, license_gate, jobs, macros, t_start, ledger, **kwargs)
+        self.calendar = SlotCalendar()
+
+    def spawn(self, job):
+        """Karta + korutyna zadania: [termin, zadanie, member, korutyna] albo None."""
+        cfg = self.job_config(job)
+        if cfg.macro is None:
+            job.status = "brak makra"
+            self.ui.log(f"[PULA] {job.ref}: brak nagranego makra – pomijam (NAGRAJ na zakładce Rezerwacja).")
+            self.publish(job)
+            return None
+
+        member = PoolMember(self, job, cfg)
+        page = None
+        try:
+            page = self.session.new_tab()
+            if not member.renavigate(page):
+                raise RuntimeError("makro nie doprowadziło do ekranu slotów")
+            member.attach_page(page)
+            member.page = page
+        except Exception as e:
+            job.status = "błąd nawigacji"
+            self.ui.log(f"[PULA] {job.ref}: nie udało się przygotować karty ({e}).")
+            self.publish(job)
+            if page is not None:
+                self.session.close_tab(page)
+            return None
+
+        job.status = "w toku"
+        self.publish(job)
+        steps = member.steps(page, cfg.days(), cfg.poll_s, cfg.load_to, cfg.success_to)
+        return [time.monotonic(), job, member, steps]
+
+    def add(self, job):
+        entry = self.spawn(job)
+        if entry is not None:
+            self.running.append(entry)
+            self.members.append(entry[2])
+        return entry
+
+    def begin(self):
+        jobs = self.select_jobs()
+        if not jobs:
+            self.ui.log("[PULA] Brak zadań do wykonania.")
+            return
+        self.first_job = min(jobs, key=lambda j: (j.priority, j.id))
+        for job in sorted(jobs, key=lambda j: (j.priority, j.id)):
+            if self.stop_evt.is_set():
+                break
+            self.add(job)
+        self.ui.log(f"[PULA] Start: {len(self.running)} zadań, każde na własnej karcie.")
+
+    def idle(self):
+        """Brak aktywnych zadań. False = koniec pracy puli."""
+        return False
+
+    def tick(self):
+        """Co POOL_PUBLISH_S: odświeżenie wierszy tabeli zadań."""
+        for entry in self.running:
+            self.publish(entry[1])
+
+    def logic(self):
+        t_pool = time.perf_counter()
+        self.running, self.members = [], []
+        self.session.use_endpoint(self.base_cfg.cdp_endpoint)
+        if not self.session.ensure_connected(self.stop_evt):
+            return
+        try:
+            self.begin()
+            self.run_pool(t_pool)
+        finally:
+            self.end()
+            self.log_summary(t_pool)
+
+    def run_pool(self, t_pool):
+        """Przełączanie korutyn: krok zadania z najwcześniejszym terminem."""
+        published = time.monotonic()
+        while not self.stop_evt.is_set():
+            if not self.running:
+                if not self.idle():
+                    break
+                continue
+
+            entry = min(self.running, key=lambda e: e[0])
+            wait_s = entry[0] - time.monotonic()
+            if wait_s > 0 and self.stop_evt.wait(wait_s):
+                break
+            _, job, member, steps = entry
+            t0 = time.perf_counter()
+            done = error = None
+            try:
+                entry[0] = time.monotonic() + next(steps)
+            except StopIteration as e:
+                done = bool(e.value)
+            except Exception as e:
+                error = e
+            job.active_s += time.perf_counter() - t0
+            job.slices = member.sched.ticks
+
+            if error is not None:
+                self.running.remove(entry)
+                job.status = "błąd"
+                self.ui.log(f"[PULA] {job.ref}: {error}")
+                self.publish(job)
+            elif done is not None:
+                self.running.remove(entry)
+                self.finish(job, done, t_pool)
+                if self.license_gate.refused:
+                    self.ui.log("[PULA] Licencja nieważna – przerywam pulę.")
+                    break
+
+            if time.monotonic() - published >= POOL_PUBLISH_S:
+                published = time.monotonic()
+                self.tick()
+
+    def end(self):
+        for _, job, _, steps in self.running:
+            steps.close()
+            if job.status == "w toku":
+                job.status = "czeka"
+            self.publish(job)
+        for member in self.members:
+            self.ledger.release(member.cfg.awizacja, id(member))
+            page = member.page
+            member.detach_page()
+            if page is not None and member.job.status != "zarezerwowano":
+                self.session.close_tab(page)
+        self.ui.log(f"[PULA] Wspólne odczyty dni: {self.calendar.hits} odświeżeń mniej.")
+
+    def finish(self, job, booked, t_pool):
+        if booked:
+            job.status = "zarezerwowano"
+            job.booked_after_s = time.perf_counter() - t_pool
+            self.ui.log(
+                f"[METRYKA] {job.ref}: zarezerwowano po {job.booked_after_s:.1f} s od startu puli "
+                f"({job.active_s:.1f} s pracy karty)."
+            )
+        elif self.ledger.is_booked(job.ref):
+            job.status = "już zarezerwowana"
+        elif not self.stop_evt.is_set():
+            job.status = "zakończone"
+        self.publish(job)
+
+
+# ------------------ COORDINATOR ------------------
+
+COORD_HOST = "127.0.0.1"    # domyślny interfejs; w LAN podaj adres karty sieciowej (--coordinator=10.0.0.5:8765)
+COORD_PORT = 8765
+COORD_TOKEN_ENV = "NTQ_COORD_TOKEN"     # wspólny token koordynatora i instancji
+COORD_TOKEN_HEADER = "X-Coord-Token"
+COORD_LEASE_S = 20.0        # instancja bez heartbeatu tak długo = martwa, jej dzierżawy wracają do puli
+COORD_HEARTBEAT_S = 5.0     # co ile instancja odnawia dzierżawy (i dostaje nowe)
+COORD_MAX_LEASES = 4        # tyle jednostek naraz na jedną instancję (= kart w puli)
+COORD_HOURS_PER_UNIT = 4    # okno awizacji dzielone na bloki tylu godzin w ramach dnia
+COORD_HTTP_TIMEOUT_S = 3
+COORD_PATHS = ("/register", "/submit", "/lease", "/claim", "/release", "/report", "/leave")
+
+
+def split_units(ref, start, end, priority, hours=COORD_HOURS_PER_UNIT):
+    """Okno awizacji -> jednostki pracy (awizacja × dzień × blok godzin)."""
+    out = []
+    d = start.date()
+    while d <= end.date():
+        h0 = start.hour if d == start.date() else 0
+        h1 = end.hour if d == end.date() else 23
+        for h in range(h0, h1 + 1, hours):
+            out.append({
+                "id": f"{ref}|{d.isoformat()}|{h:02d}", "ref": ref, "day": d.isoformat(),
+                "h_from": h, "h_to": min(h + hours - 1, h1), "priority": priority,
+            })
+        d += dt.timedelta(days=1)
+    return out
+
+
+class Coordinator:
+    """
+    Stan koordynatora (bez HTTP). Instancje zgłaszają zadania, koordynator
+    tnie je na jednostki i dzierżawi tak, by dni/godziny pokrywały różne
+    komputery (najpierw priorytet, potem dzień z najmniejszą obsadą).
+    Jedna awizacja: najwyżej jedna jednostka na komputer i jeden claim naraz.
+    Instancja bez heartbeatu przez lease_s traci dzierżawy i claimy.
+    """
+
+    def __init__(self, log=print, lease_s=COORD_LEASE_S, clock=time.monotonic):
+        self.log = log
+        self.lease_s = lease_s
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.instances = {}   # machine -> {"seen", "version"}
+        self.units = {}       # id -> jednostka (+ "owner")
+        self.claims = {}      # awizacja -> machine
+        self.booked = {}      # awizacja -> {"machine", "slot", "at"}
+
+    def handle(self, path, payload):
+        """Wywołanie API: ścieżka -> metoda. Nieznana ścieżka -> LookupError."""
+        if path not in COORD_PATHS:
+            raise LookupError(path)
+        if not payload.get("machine"):
+            raise ValueError("brak ID komputera (machine)")
+        api = getattr(self, path[1:])
+        with self._lock:
+            self._touch(payload["machine"])   # wołający żyje – przed wygaszaniem martwych
+            self._expire()
+            return api(**payload)
+
+    def register(self, machine, version=""):
+        self._touch(machine, version)
+        self.log(f"[KOORD] Instancja {machine} ({version}) zarejestrowana.")
+        return {"lease_s": self.lease_s, "heartbeat_s": COORD_HEARTBEAT_S}
+
+    def submit(self, machine, jobs):
+        added = 0
+        for job in jobs:
+            if job["ref"] in self.booked:
+                continue
+            start = dt.datetime.fromisoformat(job["start"])
+            end = dt.datetime.fromisoformat(job["end"])
+            for unit in split_units(job["ref"], start, end, int(job.get("priority", 5))):
+                if unit["id"] not in self.units:
+                    self.units[unit["id"]] = dict(unit, owner=None)
+                    added += 1
+        self.log(f"[KOORD] {machine}: {len(jobs)} zadań -> {added} nowych jednostek (razem {len(self.units)}).")
+        return {"units": added}
+
+    def lease(self, machine, refs=(), capacity=COORD_MAX_LEASES, skip=(), booked=None):
+        """Heartbeat: odnawia dzierżawy instancji i dokłada nowe do capacity."""
+        for ref, slot in (booked or {}).items():
+            self._book(machine, ref, slot)
+        self._drop_past()
+
+        refs, skip = set(refs), set(skip)
+        for u in self.units.values():
+            if u["owner"] == machine and u["id"] in skip:
+                u["owner"] = None   # instancja zakończyła jednostkę bez rezerwacji – dla innych
+        mine = [u for u in self.units.values() if u["owner"] == machine]
+        mine_refs = {u["ref"] for u in mine}
+        while len(mine) < capacity:
+            free = [
+                u for u in self.units.values()
+                if u["owner"] is None and u["ref"] in refs and u["ref"] not in mine_refs and u["id"] not in skip
+            ]
+            if not free:
+                break
+            u = min(free, key=lambda u: (u["priority"], self._crowd(u), u["day"], u["h_from"]))
+            u["owner"] = machine
+            mine.append(u)
+            mine_refs.add(u["ref"])
+            self.log(f"[KOORD] {u['id']} -> {machine}")
+
+        return {
+            "units": [{k: v for k, v in u.items() if k != "owner"} for u in mine],
+            "booked": sorted(self.booked),
+            "open": len(self.units),
+        }
+
+    def claim(self, machine, ref):
+        if ref in self.booked or self.claims.get(ref, machine) != machine:
+            return {"ok": False}
+        self.claims[ref] = machine
+        return {"ok": True}
+
+    def release(self, machine, ref):
+        if self.claims.get(ref) == machine:
+            del self.claims[ref]
+        return {"ok": True}
+
+    def report(self, machine, ref, slot):
+        self._book(machine, ref, slot)
+        return {"ok": True}
+
+    def leave(self, machine):
+        self._drop_instance(machine, "wyrejestrowana")
+        return {"ok": True}
+
+    def status(self):
+        with self._lock:
+            self._expire()
+            return {
+                "instances": {m: round(self.clock() - i["seen"], 1) for m, i in self.instances.items()},
+                "units": {uid: u["owner"] for uid, u in self.units.items()},
+                "claims": dict(self.claims),
+                "booked": dict(self.booked),
+            }
+
+    # ---------- wewnętrzne (pod blokadą) ----------
+
+    def _touch(self, machine, version=None):
+        inst = self.instances.setdefault(machine, {"seen": 0.0, "version": ""})
+        inst["seen"] = self.clock()
+        if version is not None:
+            inst["version"] = version
+
+    def _crowd(self, unit):
+        """Ile dzierżawionych jednostek nachodzi na ten dzień i godziny (mniej = lepsze pokrycie)."""
+        return sum(
+            1 for u in self.units.values()
+            if u["owner"] is not None and u["day"] == unit["day"]
+            and u["h_from"] <= unit["h_to"] and unit["h_from"] <= u["h_to"]
+        )
+
+    def _book(self, machine, ref, slot):
+        if ref in self.booked:
+            return
+        self.booked[ref] = {"machine": machine, "slot": slot, "at": dt.datetime.now().isoformat(timespec="seconds")}
+        self.claims.pop(ref, None)
+        for uid in [uid for uid, u in self.units.items() if u["ref"] == ref]:
+            del self.units[uid]
+        self.log(f"[KOORD] {ref} zarezerwowana przez {machine} ({slot}).")
+
+    def _drop_past(self):
+        now = dt.datetime.now()
+        for uid, u in list(self.units.items()):
+            end = dt.datetime.combine(dt.date.fromisoformat(u["day"]), dt.time(u["h_to"], 59))
+            if end < now:
+                del self.units[uid]
+
+    def _expire(self):
+        now = self.clock()
+        for machine in [m for m, i in self.instances.items() if now - i["seen"] > self.lease_s]:
+            self._drop_instance(machine, f"bez heartbeatu od {self.lease_s:.0f} s")
+
+    def _drop_instance(self, machine, why):
+        self.instances.pop(machine, None)
+        n = 0
+        for u in self.units.values():
+            if u["owner"] == machine:
+                u["owner"] = None
+                n += 1
+        for ref in [r for r, m in self.claims.items() if m == machine]:
+            del self.claims[ref]
+        self.log(f"[KOORD] Instancja {machine} {why} – {n} jednostek wraca do puli.")
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """POST /<metoda> z JSON (Coordinator.handle), GET /status. Każde żądanie z tokenem."""
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(n) or b"{}")
+            self._reply(200, self.server.coordinator.handle(self.path, payload))
+        except LookupError:
+            self._reply(404, {"error": "nieznana ścieżka"})
+        except (TypeError, ValueError) as e:
+            self._reply(400, {"error": str(e)})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path != "/status":
+            self._reply(404, {"error": "nieznana ścieżka"})
+            return
+        self._reply(200, self.server.coordinator.status())
+
+    def _authorized(self):
+        got = (self.headers.get(COORD_TOKEN_HEADER) or "").encode("utf-8")
+        if hmac.compare_digest(got, self.server.token.encode("utf-8")):
+            return True
+        self._reply(401, {"error": "brak lub zły token koordynatora"})
+        return False
+
+    def _reply(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass   # zdarzenia loguje Coordinator
+
+
+def serve_coordinator(token, host=COORD_HOST, port=COORD_PORT, log=print):
+    """
+    Koordynator w wątku tła na wskazanym interfejsie. Żądania bez tokenu
+    (nagłówek X-Coord-Token) dostają 401. Zwraca serwer (server.coordinator,
+    server.shutdown()).
+    """
+    if not token:
+        raise ValueError("Koordynator wymaga tokenu.")
+    server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+    server.daemon_threads = True
+    server.token = token
+    server.coordinator = Coordinator(log)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class CoordinatorClient:
+    """Klient koordynatora: JSON po HTTP, połączenie keep-alive na wątek."""
+
+    def __init__(self, url, machine, token, timeout=COORD_HTTP_TIMEOUT_S):
+        self.url = url.rstrip("/")
+        self.machine = machine
+        self.token = token
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def register(self):
+        return self._post("/register", version=VERSION)
+
+    def submit(self, jobs):
+        return self._post("/submit", jobs=[
+            {"ref": j.ref, "start": j.start.isoformat(), "end": j.end.isoformat(), "priority": j.priority}
+            for j in jobs
+        ])
+
+    def lease(self, refs, capacity=COORD_MAX_LEASES, skip=(), booked=None):
+        return self._post("/lease", refs=list(refs), capacity=capacity, skip=list(skip), booked=booked or {})
+
+    def claim(self, ref):
+        return self._post("/claim", ref=ref)["ok"]
+
+    def release(self, ref):
+        self._post("/release", ref=ref)
+
+    def report(self, ref, slot):
+        self._post("/report", ref=ref, slot=slot)
+
+    def leave(self):
+        self._post("/leave")
+
+    def _post(self, path, **payload):
+        parts = urlsplit(self.url if "://" in self.url else f"http://{self.url}")
+        body = json.dumps(dict(payload, machine=self.machine)).encode("utf-8")
+        # druga próba na świeżym połączeniu, gdy serwer zamknął keep-alive
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+            try:
+                conn.request("POST", parts.path.rstrip("/") + path, body=body, headers={
+                    "Content-Type": "application/json",
+                    "User-Agent": f"NTQ-VBS/{VERSION} (Python)",
+                    COORD_TOKEN_HEADER: self.token,
+                })
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+                continue
+            if resp.status != 200:
+                raise RuntimeError(f"Koordynator: HTTP {resp.status} {data[:200].decode('utf-8', 'replace')}")
+            return json.loads(data)
+
+
+class CoordinatorLedger:
+    """
+    BookingLedger uzgadniany z koordynatorem: claim musi potwierdzić
+    koordynator (brak odpowiedzi = brak kliknięcia), rezerwacje są zgłaszane
+    od razu i powtarzane w każdym heartbeacie.
+    """
+
+    def __init__(self, client, local):
+        self.client = client
+        self.local = local
+        self.booked = set()   # awizacje zarezerwowane gdziekolwiek (z heartbeatu)
+        self.mine = {}        # nasze rezerwacje: awizacja -> slot
+        self.error = None
+
+    def is_booked(self, ref):
+        return ref in self.booked or self.local.is_booked(ref)
+
+    def claim(self, ref, owner):
+        if ref in self.booked or not self.local.claim(ref, owner):
+            return False
+        try:
+            ok = self.client.claim(ref)
+            self.error = None
+        except Exception as e:
+            self.error = e
+            ok = False
+        if not ok:
+            self.local.release(ref, owner)
+        return ok
+
+    def release(self, ref, owner):
+        self.local.release(ref, owner)
+        try:
+            self.client.release(ref)
+        except Exception:
+            pass   # claim i tak wygaśnie razem z dzierżawą instancji
+
+    def commit(self, ref, owner, slot):
+        self.local.commit(ref, owner, slot)
+        self.booked.add(ref)
+        self.mine[ref] = slot
         try:
-            loc = page.locator(sel).first
-            if loc.count() and loc.is_visible():
-                txt = (loc.inner_text() or "").strip()
-                m = re.search(r"\b(\d{1,2})\b", txt)
-                if m:
-                    return int(m.group(1))
+            self.client.report(ref, slot)
         except Exception:
-            pass
-    return None
+            pass   # zgłoszone ponownie w heartbeacie (CoordinatedPool)
 
 
-def click_day_by_coordinates(page, day: dt.date, load_to: int):
-    """Kliknięcie dnia w kalendarzu po współrzędnych."""
-    label = str(day.day)
+class CoordinatedPool(PoolWorker):
+    """
+    Pula sterowana koordynatorem: zadania z CSV trafiają do wspólnej puli
+    firmy, a ta instancja pracuje tylko nad wydzierżawionymi jednostkami
+    (awizacja × dzień × blok godzin). Heartbeat w osobnym wątku odnawia
+    dzierżawy; wynik odbiera pętla puli bez czekania na sieć.
+    """
 
-    month_box = page.locator(
-        "xpath=//div[contains(., 'styczeń') or contains(., 'luty') or contains(., 'marzec') or contains(., 'kwiecień') or "
-        "contains(., 'maj') or contains(., 'czerwiec') or contains(., 'lipiec') or contains(., 'sierpień') or "
-        "contains(., 'wrzesień') or contains(., 'październik') or contains(., 'listopad') or contains(., 'grudzień')]"
-    ).first
+    label = "Koordynator"
 
-    cand = month_box.locator(f"xpath=.//*[normalize-space(text())='{label}']").first
-    if cand.count() == 0:
-        return False
+    def __init__(self, ui, session, cfg, license_gate, jobs, macros, t_start=None, ledger=None, **kwargs):
+        self.client = CoordinatorClient(cfg.coordinator, generate_machine_id(), cfg.coordinator_token)
+        ledger = CoordinatorLedger(self.client, ledger if ledger is not None else BookingLedger())
+        super().__init__(ui, session, cfg, license_gate, jobs, macros, t_start, ledger, **kwargs)
+        self.leases = queue.Queue()
+        self.units = {}       # id jednostki -> wpis puli
+        self.skip = set()     # jednostki, których ta instancja nie obsłuży (brak dojścia / koniec)
+        self.open = None
 
-    try:
-        cand.scroll_into_view_if_needed()
-        box = cand.bounding_box()
-        if not box:
+    def begin(self):
+        ui = self.ui
+        self.client.register()
+        jobs = self.select_jobs()
+        if jobs:
+            self.client.submit(jobs)
+        for job in jobs:
+            job.status = "w puli"
+            self.publish(job)
+        ui.log(f"[KOORD] Połączono z {self.client.url} jako {self.client.machine}; zgłoszono {len(jobs)} zadań.")
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+
+    def heartbeat(self):
+        failing = False
+        while not self.stop_evt.is_set():
+            try:
+                self.leases.put(self.client.lease(
+                    [ref for ref in self.macros], COORD_MAX_LEASES, set(self.skip), dict(self.ledger.mine),
+                ))
+                if failing:
+                    self.ui.log("[KOORD] Połączenie z koordynatorem wróciło.")
+                failing = False
+            except Exception as e:
+                if not failing:
+                    self.ui.log(f"[KOORD] Koordynator nie odpowiada ({e}) – bez potwierdzenia nie klikam slotów.")
+                failing = True
+            self.stop_evt.wait(COORD_HEARTBEAT_S)
+
+    def idle(self):
+        if self.open == 0:
+            self.ui.log("[KOORD] Wszystkie jednostki w puli firmy obsłużone.")
             return False
-        cx = box["x"] + box["width"] / 2
-        cy = box["y"] + box["height"] / 2
-        page.mouse.click(cx, cy)
-        wait_for_slots_loaded(page, load_to)
+        self.apply_leases(POOL_PUBLISH_S)
         return True
-    except Exception:
-        return False
 
+    def tick(self):
+        super().tick()
+        self.apply_leases(0)
 
-def ensure_day_selected(page, day: dt.date, load_to: int, tries: int = 5):
-    """Wymusza przejście na konkretny dzień – z retry."""
-    target = day.day
-    for _ in range(tries):
-        cur = get_selected_day_number(page)
-        if cur == target:
-            return True
-        ok = click_day_by_coordinates(page, day, load_to)
-        time.sleep(0.10)
-        cur2 = get_selected_day_number(page)
-        if ok and cur2 == target:
-            return True
-    return False
+    def apply_leases(self, timeout):
+        """Najnowsza odpowiedź heartbeatu: nowe jednostki -> karty, odebrane -> koniec ich korutyn."""
+        resp = None
+        try:
+            resp = self.leases.get(timeout=timeout) if timeout else self.leases.get_nowait()
+            while True:
+                resp = self.leases.get_nowait()
+        except queue.Empty:
+            pass
+        if resp is None:
+            return
+        self.ledger.booked.update(resp["booked"])
+        self.open = resp["open"]
+        owned = {u["id"]: u for u in resp["units"]}
+
+        for uid, entry in list(self.units.items()):
+            if uid in owned:
+                continue
+            del self.units[uid]
+            if entry in self.running:
+                self.running.remove(entry)
+                entry[3].close()
+                job = entry[1]
+                job.status = "już zarezerwowana" if self.ledger.is_booked(job.ref) else "przekazane"
+                self.publish(job)
+
+        for uid, u in owned.items():
+            if uid in self.units or uid in self.skip or self.stop_evt.is_set():
+                continue
+            day = dt.date.fromisoformat(u["day"])
+            job = BatchJob(
+                uid, u["ref"], dt.datetime.combine(day, dt.time(u["h_from"])),
+                dt.datetime.combine(day, dt.time(u["h_to"])), u["priority"],
+            )
+            entry = self.add(job)
+            if entry is None:
+                self.skip.add(uid)
+            else:
+                self.units[uid] = entry
+                self.ui.log(f"[KOORD] Dzierżawa {uid} ({job.window()}).")
+
+    def finish(self, job, booked, t_pool):
+        super().finish(job, booked, t_pool)
+        self.units.pop(job.id, None)
+        if not booked:
+            self.skip.add(job.id)
+        for j in self.jobs:
+            if j.ref == job.ref and booked:
+                j.status = "zarezerwowano"
+                self.publish(j)
+
+    def end(self):
+        super().end()
+        try:
+            self.client.leave()
+        except Exception:
+            pass
 
 
-# ------------------ WORKER ------------------
+def make_batch_worker(ui, session, cfg, gate, jobs, macros, t_start, pool, ledger, **kwargs):
+    """Worker kolejki: po kolei (BatchWorker), naraz (PoolWorker) albo z koordynatorem."""
+    if not pool:
+        return BatchWorker(ui, session, cfg, gate, jobs, macros, t_start, ledger, **kwargs)
+    cls = CoordinatedPool if cfg.coordinator else PoolWorker
+    return cls(ui, session, cfg, gate, jobs, macros, t_start, ledger, **kwargs)
 
-class Worker(threading.Thread):
-    def __init__(self, ui):
-        super().__init__(daemon=True)
-        self.ui = ui
-        self.stop_evt = threading.Event()
 
-    def run(self):
-        try:
-            self.logic()
-        except Exception as e:
-            self.ui.log(f"[FATAL] {e}")
-            self.ui.popup("Błąd", str(e))
+# ------------------ ENGINE PROCESS ------------------
 
-    def stop(self):
-        self.stop_evt.set()
+ENGINE_RESTART_DELAY_S = 1.0
 
-    def logic(self):
-        ui = self.ui
-        start_d, start_h, end_d, end_h = ui.get_range()
-        poll_s, load_to, success_to = ui.get_params()
-
-        # lista dni w zakresie
-        days = []
-        d = start_d
-        while d <= end_d:
-            days.append(d)
-            d += dt.timedelta(days=1)
 
-        with sync_playwright() as p:
-            ui.log("[PW] Łączenie z Chrome CDP...")
-            browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
-            ctx = browser.contexts[0]
-            page = ctx.pages[0]
+class EngineSink:
+    """Odbiorca zdarzeń Workera w procesie silnika – wszystko idzie kolejką do UI."""
 
-            ui.log(f"[OK] Strona: {page.url}")
-            ensure_slot_screen(page)
+    def __init__(self, evt_q):
+        self.evt_q = evt_q
 
-            while not self.stop_evt.is_set():
-                for day in days:
-                    if self.stop_evt.is_set():
-                        return
+    def log(self, msg):
+        self.evt_q.put(("log", msg))
 
-                    # 1) ZAWSZE ustaw właściwy dzień
-                    if not ensure_day_selected(page, day, load_to):
-                        ui.log(f"[WARN] Nie udało się ustawić dnia {day.isoformat()} – pomijam i wracam do pętli.")
-                        continue
+    def popup(self, title, msg):
+        self.evt_q.put(("popup", title, msg))
 
-                    # 2) Odświeżanie
-                    if len(days) == 1:
-                        click_standardowe(page, load_to)
-                    else:
-                        click_day_by_coordinates(page, day, load_to)
+    def emit_notification(self, key):
+        self.evt_q.put(("notify", key))
 
-                    # 3) Safety: jeśli UI przeskoczyło dzień, nie klikamy slotów
-                    cur = get_selected_day_number(page)
-                    if cur is not None and cur != day.day:
-                        ui.log(f"[SAFE] Aktualnie zaznaczony dzień={cur}, oczekiwany={day.day}. Nie klikam slotów.")
-                        continue
+    def show_start_metric(self, ms):
+        self.evt_q.put(("start_metric", ms))
 
-                    slots = fast_read_slots(page)
+    def show_timeouts(self, snap):
+        self.evt_q.put(("timeouts", snap))
 
-                    # 4) Sprawdź sloty tylko dla tego dnia i dla zakresu godzin
-                    for h in ui.iter_hours_for_day(day):
-                        if self.stop_evt.is_set():
-                            return
+    def batch_update(self, state):
+        self.evt_q.put(("batch", state))
 
-                        slot_key = f"{h:02d}:00-{h:02d}:59"
-                        if slot_key not in slots:
-                            continue
+    def batch_summary(self, text):
+        self.evt_q.put(("batch_summary", text))
 
-                        used, total = slots[slot_key]
-                        if used < total:
-                            ui.log(f"[TRY] {day.isoformat()} {slot_key} {used}/{total}")
 
-                            # klik slot + potwierdzenia
-                            self.try_slot(page, slot_key, load_to, success_to)
+class RemoteLicenseGate:
+    """LicenseGate po stronie UI: wynik licencji idzie komendą do procesu silnika."""
 
-                            # jeśli toast "brak slotów" -> wracamy do odświeżania
-                            if toast_no_slots(page):
-                                ui.log("[INFO] Toast 'Brak dostępnych slotów' – kontynuuję odświeżanie.")
-                                continue
+    def __init__(self, engine):
+        self.engine = engine
 
-                            # sukces tylko po komunikacie o wysłaniu do kierowcy
-                            if success_confirmed(page, success_to):
-                                ui.emit_notification("slot_success")
-                                ui.log("[SUCCESS] Awizacja utworzona (wysłane do kierowcy).")
-                                return
+    def set(self, valid: bool):
+        self.engine.send("license", bool(valid))
 
-                time.sleep(max(0.05, float(poll_s)))
 
-    def try_slot(self, page, slot_key, load_to, success_to):
-        """
-        Kliknięcie slotu + agresywna pętla potwierdzeń TAK/OK (v4.2.3).
-        """
-        try:
-            # Preferujemy button/a/role=button zawierające slot_key
-            candidates = page.locator(
-                f"button:has-text('{slot_key}'), a:has-text('{slot_key}'), [role='button']:has-text('{slot_key}')"
-            )
-            n = candidates.count()
+class RemoteWorker:
+    """Uchwyt Workera z procesu silnika – dla App to samo API co Worker (is_alive/stop)."""
 
-            # Fallback: czasem kafel jest div/span - łapiemy tekst regexem z "xx/yy"
-            if n == 0:
-                candidates = page.locator(f"text=/{re.escape(slot_key)}\\s+\\d+\\/\\d+/")
-                n = candidates.count()
+    def __init__(self, engine):
+        self.engine = engine
+        self.done = threading.Event()
 
-            if n == 0:
-                self.ui.log(f"[WARN] Nie znalazłem kafelka dla slotu: {slot_key}")
-                return
+    def is_alive(self):
+        return not self.done.is_set() and self.engine.is_running()
 
-            clicked = False
-            for i in range(min(n, 12)):
-                el = candidates.nth(i)
-                try:
-                    if el.is_visible():
-                        el.scroll_into_view_if_needed()
-                        el.click(timeout=2000)
-                        clicked = True
-                        break
-                except Exception:
-                    continue
+    def stop(self):
+        self.engine.send("stop")
 
-            if not clicked:
-                self.ui.log(f"[WARN] Kafelek slotu jest, ale nie udało się kliknąć: {slot_key}")
-                return
 
-            # Faza 1 (ultra-fast): od razu próbujemy klikać dialogi,
-            # bez czekania na pełne dociągnięcie UI.
-            confirm_loop_fast(page, max_clicks=60)
+def engine_main(cmd_q, evt_q):
+    """
+    Proces silnika: własna sesja CDP + Worker (Playwright poza procesem Tk).
+    Komendy: ("start", cfg, t_start), ("start_batch", cfg, jobs, macros, t_start, pool),
+    ("license", valid), ("stop",), ("endpoint", url), ("macro", key, url), ("macro_cancel",), ("quit",).
+    Zdarzenia: jak EngineSink + ("worker_done",) + zdarzenia MacroRecording.
+    """
+    sink = EngineSink(evt_q)
+    clock = ServerClock(publish=lambda st: evt_q.put(("clock", st)))
+    session = CdpSession(sink.log, clock=clock)
+    session.start()
+    latency = LatencyTracker()   # wyuczone limity i kalibracja selektorów przeżywają kolejne START
+    selectors = SelectorCalibrator()
+    ledger = BookingLedger()
+    refresher = RefreshRunner(sink, default_refresh_strategies())
+    worker = None
+    gate = None
+    recording = None
+
+    def push_metrics():
+        while True:
+            time.sleep(METRICS_PUSH_S)
+            evt_q.put(("metrics", METRICS.snapshot()))
+
+    threading.Thread(target=push_metrics, daemon=True).start()
+
+    while True:
+        cmd, *args = cmd_q.get()
+
+        if cmd == "start":
+            if worker is not None and worker.is_alive():
+                continue
+            cfg, t_start = args
+            gate = LicenseGate()
+            worker = Worker(sink, session, cfg, gate, t_start, latency, selectors=selectors, refresher=refresher)
+            worker.on_done = lambda: evt_q.put(("worker_done",))
+            worker.start()
+        elif cmd == "start_batch":
+            if worker is not None and worker.is_alive():
+                continue
+            cfg, jobs, macros, t_start, pool = args
+            gate = LicenseGate()
+            worker = make_batch_worker(
+                sink, session, cfg, gate, jobs, macros, t_start, pool, ledger,
+                latency=latency, selectors=selectors, refresher=refresher,
+            )
+            worker.on_done = lambda: evt_q.put(("worker_done",))
+            worker.start()
+        elif cmd == "license" and gate is not None:
+            gate.set(args[0])
+        elif cmd == "stop" and worker is not None:
+            worker.stop()
+        elif cmd == "endpoint":
+            session.submit(session.use_endpoint, args[0])
+        elif cmd == "macro":
+            key, endpoint = args
+            if recording is not None:
+                recording.cancel()
+            session.submit(session.use_endpoint, endpoint)
+            recording = MacroRecording(session, key, lambda *evt: evt_q.put(evt))
+        elif cmd == "macro_cancel" and recording is not None:
+            recording.cancel()
+            recording = None
+        elif cmd == "quit":
+            break
+
+    if worker is not None:
+        worker.stop()
+    if recording is not None:
+        recording.cancel()
+    session.close()
+
+
+class RemoteMacroRecording:
+    """Uchwyt nagrywania makra w procesie silnika (API jak MacroRecording.cancel)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def cancel(self):
+        self.engine.send("macro_cancel")
+
+
+class EngineProcess:
+    """
+    Worker w osobnym procesie (opcja z Parametrów).
 
-            # Faza 2: jeśli UI jeszcze ładuje, dokończ po załadowaniu.
-            wait_for_slots_loaded(page, load_to)
-            confirm_loop_fast(page, max_clicks=40)
+    UI jest wtedy tylko klientem: wysyła komendy przez cmd_q i odbiera zdarzenia
+    z evt_q na wątku pompy, który przekazuje je do kolejki UI (post).
+    Zawieszone Tk nie opóźnia kliknięć, a padnięty proces silnika jest
+    uruchamiany ponownie bez zamykania programu.
+    """
 
-            # jeśli sukces pojawi się szybko, kończymy od razu
-            if success_visible(page):
+    def __init__(self, post):
+        self.post = post
+        self._mp = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._proc = None
+        self._cmd_q = None
+        self._evt_q = None
+        self._handle = None
+        self._closing = False
+
+    def ensure_running(self):
+        with self._lock:
+            if self._proc is not None and self._proc.is_alive():
                 return
+            self._cmd_q = self._mp.Queue()
+            self._evt_q = self._mp.Queue()
+            self._proc = self._mp.Process(
+                target=engine_main, args=(self._cmd_q, self._evt_q), daemon=True
+            )
+            self._proc.start()
+            proc, evt_q = self._proc, self._evt_q
+
+        threading.Thread(target=self._pump, args=(proc, evt_q), daemon=True).start()
+        self.post("log", f"[ENGINE] Proces silnika uruchomiony (PID {proc.pid}).")
+
+    def is_running(self):
+        return self._proc is not None and self._proc.is_alive()
+
+    def send(self, *cmd):
+        if self._cmd_q is not None:
+            self._cmd_q.put(cmd)
+
+    def start_worker(self, cfg, t_start):
+        """Startuje Workera w procesie silnika. Zwraca (RemoteWorker, RemoteLicenseGate)."""
+        self.ensure_running()
+        self._handle = RemoteWorker(self)
+        self.send("start", cfg, t_start)
+        return self._handle, RemoteLicenseGate(self)
+
+    def start_batch(self, cfg, jobs, macros, t_start, pool=False):
+        """Jak start_worker, ale z kolejką zadań (BatchWorker albo PoolWorker)."""
+        self.ensure_running()
+        self._handle = RemoteWorker(self)
+        self.send("start_batch", cfg, jobs, macros, t_start, pool)
+        return self._handle, RemoteLicenseGate(self)
+
+    def record_macro(self, key, endpoint):
+        """Nagrywanie makra w sesji silnika; zdarzenia wracają przez post."""
+        self.ensure_running()
+        self.send("macro", key, endpoint)
+        return RemoteMacroRecording(self)
+
+    def close(self):
+        self._closing = True
+        self.send("quit")
+        if self._proc is not None:
+            self._proc.join(timeout=2)
+            if self._proc.is_alive():
+                self._proc.terminate()
+
+    def _pump(self, proc, evt_q):
+        while True:
+            try:
+                kind, *args = evt_q.get(timeout=0.5)
+            except queue.Empty:
+                if proc.is_alive():
+                    continue
+                break
 
-            # dodatkowo: jeszcze krótko poczekaj na sukces (minimalnie)
-            success_confirmed(page, min(800, int(success_to)))
+            if kind == "worker_done":
+                if self._handle is not None:
+                    self._handle.done.set()
+            else:
+                self.post(kind, *args)
 
-        except Exception as e:
-            self.ui.log(f"[WARN] Kliknięcie slotu nie powiodło się: {e}")
+        if self._handle is not None:
+            self._handle.done.set()
+        if self._closing:
+            return
+
+        self.post("log", f"[ENGINE] Proces silnika zakończył się (kod {proc.exitcode}) – uruchamiam ponownie.")
+        time.sleep(ENGINE_RESTART_DELAY_S)
+        self.ensure_running()
 
 
 # ------------------ UI ------------------
 
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, launch_chrome=False):
         super().__init__()
         self.title(f"VBS klikacz NTQ – {VERSION}")
         self.geometry("820x520")
@@ -480,30 +4901,63 @@ class App(tk.Tk):
         self.tab_main = ttk.Frame(nb)
         self.tab_params = ttk.Frame(nb)
         self.tab_notifications = ttk.Frame(nb)
+        self.tab_batch = ttk.Frame(nb)
         self.tab_info = ttk.Frame(nb)
 
         nb.add(self.tab_main, text="Rezerwacja")
+        nb.add(self.tab_batch, text="Kolejka")
         nb.add(self.tab_params, text="Parametry")
         nb.add(self.tab_notifications, text="Powiadomienia")
         nb.add(self.tab_info, text="Info")
 
         self.machine_id = generate_machine_id()
 
+        # zdarzenia z wątków tła (log, licencja, ...) -> wątek Tk
+        self.ui_queue = queue.Queue()
+
         # stan licencji w UI
         self.lic_status = tk.StringVar(value="(nie sprawdzono)")
         self.lic_valid_to = tk.StringVar(value="")
         self.lic_checked = tk.StringVar(value="")
 
+        self.macros = load_macros()
+        self.recorder = None
+        self.latency = LatencyTracker()
+        self.selectors = SelectorCalibrator()
+        self.ledger = BookingLedger()
+        self.refresher = RefreshRunner(self, default_refresh_strategies())
+
+        self.batch_jobs = []
+
         self.build_main()
+        self.build_batch()
         self.build_params()
         self.build_notifications()
         self.load_settings()
         self.build_info()
 
         self.worker = None
-
-        # pierwsze sprawdzenie przy uruchomieniu (bez zamykania)
-        self.refresh_license_status(close_on_invalid=False)
+        self._closed = False
+        self.metrics_server = None
+
+        # jedno połączenie CDP na cały czas życia okna (rozgrzane przed START) – w procesie,
+        # który steruje kartą: UI w trybie w procesie albo proces silnika
+        self.cdp_endpoint = CDP_ENDPOINT
+        self.chrome = None
+        self.clock_state = None
+        self.session = None
+        self.engine = EngineProcess(self.post)
+        self.after(0, self.warm_engine)
+        if launch_chrome:
+            self.after(0, self.start_chrome)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # licencja sprawdzana w tle; pierwsze sprawdzenie przy uruchomieniu (bez zamykania)
+        self.license = LicenseService(self.machine_id, publish=lambda st: self.post("license", st))
+        self.license.start()
+        self.check_license(close_on_invalid=False)
+
+        self.after(50, self.drain_ui_queue)
 
     # ---------- UI builders ----------
 
@@ -536,11 +4990,31 @@ class App(tk.Tk):
         ttk.Entry(r, width=12, textvariable=self.do_date).pack(side="left", padx=2)
         ttk.Spinbox(r, from_=0, to=23, width=3, textvariable=self.do_hour).pack(side="left")
 
+        # tryb uzbrojony: pierwsze odświeżenie dokładnie o tej godzinie (puste = od razu)
+        self.arm_time = tk.StringVar(value="")
+        ttk.Label(r, text="Uzbrój na").pack(side="left", padx=(20, 2))
+        ttk.Entry(r, width=13, textvariable=self.arm_time).pack(side="left", padx=2)
+        ttk.Label(r, text="HH:MM:SS.mmm", foreground="#444").pack(side="left", padx=2)
+
+        m = ttk.Frame(f)
+        m.pack(anchor="w", padx=10, pady=(8, 0))
+
+        self.awizacja = tk.StringVar(value="")
+        self.awizacja.trace_add("write", lambda *_: self.update_macro_info())
+        self.macro_btn_text = tk.StringVar(value="NAGRAJ")
+        self.macro_info = tk.StringVar(value="")
+        ttk.Label(m, text="Awizacja").pack(side="left")
+        ttk.Entry(m, width=16, textvariable=self.awizacja).pack(side="left", padx=2)
+        ttk.Button(m, textvariable=self.macro_btn_text, command=self.record_macro).pack(side="left", padx=5)
+        ttk.Label(m, textvariable=self.macro_info, foreground="#444").pack(side="left", padx=5)
+        self.update_macro_info()
+
         b = ttk.Frame(f)
         b.pack(anchor="w", padx=10, pady=10)
 
         ttk.Button(b, text="START", command=self.start).pack(side="left", padx=5)
         ttk.Button(b, text="STOP", command=self.stop).pack(side="left", padx=5)
+        ttk.Button(b, text="CHROME", command=self.start_chrome).pack(side="left", padx=5)
         self.sound_btn = tk.Button(
             b,
             text="DZWIEK",
@@ -552,9 +5026,38 @@ class App(tk.Tk):
         self.sound_btn.pack(side="left", padx=5)
         self.update_sound_button_style()
 
+        self.start_metric = tk.StringVar(value="")
+        ttk.Label(b, textvariable=self.start_metric, foreground="#444").pack(side="left", padx=10)
+
         self.log_box = tk.Text(f, height=16)
         self.log_box.pack(fill="both", expand=True, padx=10, pady=5)
 
+    def build_batch(self):
+        f = self.tab_batch
+
+        b = ttk.Frame(f)
+        b.pack(anchor="w", padx=10, pady=10)
+
+        ttk.Button(b, text="Wczytaj CSV", command=self.load_batch).pack(side="left", padx=5)
+        ttk.Button(b, text="START kolejki", command=self.start_batch).pack(side="left", padx=5)
+        ttk.Button(b, text="START puli", command=lambda: self.start_batch(pool=True)).pack(side="left", padx=5)
+        ttk.Button(b, text="STOP", command=self.stop).pack(side="left", padx=5)
+        ttk.Label(b, text="CSV: awizacja;od;do;priorytet", foreground="#444").pack(side="left", padx=10)
+
+        cols = (
+            ("ref", "Awizacja", 110), ("window", "Okno", 200), ("priority", "Priorytet", 65),
+            ("status", "Status", 110), ("slices", "Przejścia", 65), ("active", "Czas pracy", 80),
+            ("booked", "Zarezerwowano po", 115),
+        )
+        self.batch_tree = ttk.Treeview(f, columns=[c[0] for c in cols], show="headings", height=12)
+        for key, title, width in cols:
+            self.batch_tree.heading(key, text=title)
+            self.batch_tree.column(key, width=width, anchor="w")
+        self.batch_tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        self.batch_info = tk.StringVar(value="")
+        ttk.Label(f, textvariable=self.batch_info, foreground="#444").pack(anchor="w", padx=10, pady=(0, 10))
+
     def build_params(self):
         f = self.tab_params
 
@@ -574,6 +5077,103 @@ class App(tk.Tk):
             ttk.Label(r, text=txt, width=28).pack(side="left")
             ttk.Entry(r, width=10, textvariable=var).pack(side="left", padx=5)
 
+        self.max_rps = tk.DoubleVar(value=SCHED_MAX_RPS)
+        r = ttk.Frame(f)
+        r.pack(anchor="w", padx=10, pady=6)
+        ttk.Label(r, text="Maks. odświeżeń na sekundę", width=28).pack(side="left")
+        ttk.Entry(r, width=10, textvariable=self.max_rps).pack(side="left", padx=5)
+
+        self.refresh_mode = tk.StringVar(value=REFRESH_AUTO)
+        r = ttk.Frame(f)
+        r.pack(anchor="w", padx=10, pady=6)
+        ttk.Label(r, text="Odświeżanie siatki (1 dzień)", width=28).pack(side="left")
+        ttk.Combobox(
+            r, width=14, textvariable=self.refresh_mode, values=REFRESH_CHOICES, state="readonly"
+        ).pack(side="left", padx=5)
+        ttk.Label(r, text="auto = pomiar i wybór najszybszej", foreground="#444").pack(side="left")
+
+        self.rate_profile = tk.StringVar(value="")
+        r = ttk.Frame(f)
+        r.pack(anchor="w", padx=10, pady=6)
+        ttk.Label(r, text="Profil interwału (pora dnia)", width=28).pack(side="left")
+        ttk.Entry(r, width=40, textvariable=self.rate_profile).pack(side="left", padx=5)
+        ttk.Label(r, text="np. 06:55-07:10=0.2; 13:55-14:10=0.3", foreground="#444").pack(side="left")
+
+        self.coordinator_url = tk.StringVar(value="")
+        r = ttk.Frame(f)
+        r.pack(anchor="w", padx=10, pady=6)
+        ttk.Label(r, text="Koordynator puli (URL)", width=28).pack(side="left")
+        ttk.Entry(r, width=40, textvariable=self.coordinator_url).pack(side="left", padx=5)
+        ttk.Label(r, text=f"np. http://10.0.0.5:{COORD_PORT}; puste = bez", foreground="#444").pack(side="left")
+
+        self.coordinator_token = tk.StringVar(value=os.environ.get(COORD_TOKEN_ENV, ""))
+        r = ttk.Frame(f)
+        r.pack(anchor="w", padx=10, pady=6)
+        ttk.Label(r, text="Token koordynatora", width=28).pack(side="left")
+        ttk.Entry(r, width=40, textvariable=self.coordinator_token, show="*").pack(side="left", padx=5)
+        ttk.Label(r, text=f"wypisuje go koordynator (albo zmienna {COORD_TOKEN_ENV})",
+                  foreground="#444").pack(side="left")
+
+        self.fast_click = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            f,
+            text="Szybki klik kafelka (CDP Input, z weryfikacją i awaryjnym click())",
+            variable=self.fast_click,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.raw_cdp = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            f,
+            text="Bezpośredni klient CDP (WebSocket) dla odczytu slotów i kliknięć",
+            variable=self.raw_cdp,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.reduce_motion = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            f,
+            text="Wyłącz animacje w karcie eBramy (modale, toast, loader)",
+            variable=self.reduce_motion,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.keep_focus = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            f,
+            text="Karta eBramy zawsze aktywna (pełna prędkość przy zminimalizowanym oknie)",
+            variable=self.keep_focus,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.block_resources = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            f,
+            text="Blokuj obrazki, czcionki i obce skrypty w karcie eBramy (na czas pracy)",
+            variable=self.block_resources,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.adaptive = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            f,
+            text="Adaptacyjne limity czasu (z ostatnich pomiarów, nie więcej niż timeouty powyżej)",
+            variable=self.adaptive,
+        ).pack(anchor="w", padx=10, pady=6)
+        self.adaptive_info = tk.StringVar(value="Wyuczone limity: (brak pomiarów)")
+        ttk.Label(f, textvariable=self.adaptive_info, foreground="#444").pack(anchor="w", padx=30)
+
+        self.metrics_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            f,
+            text=f"Eksport metryk Prometheus (http://{METRICS_HOST}:{METRICS_PORT}/metrics)",
+            variable=self.metrics_on,
+            command=self.on_metrics_toggle,
+        ).pack(anchor="w", padx=10, pady=6)
+
+        self.engine_in_process = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            f,
+            text="Silnik (Playwright) w osobnym procesie",
+            variable=self.engine_in_process,
+            command=self.on_engine_mode_change,
+        ).pack(anchor="w", padx=10, pady=6)
+
         ttk.Label(
             f,
             text="Uwaga: wartości są pobierane w momencie kliknięcia START.",
@@ -604,10 +5204,18 @@ class App(tk.Tk):
                 "file": tk.StringVar(value="brak"),
                 "button": None,
             },
+            "page_alert": {
+                "label": "Wylogowanie / problem z kartą",
+                "enabled": True,
+                "volume": tk.IntVar(value=80),
+                "file": tk.StringVar(value="brak"),
+                "button": None,
+            },
         }
 
         self._build_notification_row(f, "start_stop")
         self._build_notification_row(f, "slot_success")
+        self._build_notification_row(f, "page_alert")
 
     def _build_notification_row(self, parent, key):
         cfg = self.notification_settings[key]
@@ -879,17 +5487,67 @@ class App(tk.Tk):
         ttk.Button(
             f,
             text="Sprawdź licencję teraz",
-            command=lambda: self.refresh_license_status(close_on_invalid=False)
+            command=lambda: self.check_license(close_on_invalid=False)
         ).pack(anchor="nw", padx=10, pady=(0, 10))
 
+        box_clock = ttk.LabelFrame(f, text="Zegar serwera eBramy (z nagłówków Date)")
+        box_clock.pack(fill="x", padx=10, pady=10)
+        self.clock_now = tk.StringVar(value="(brak odpowiedzi eBramy)")
+        self.clock_info = tk.StringVar(value="")
+        for label, var in (("Czas eBramy:", self.clock_now), ("Offset / dryf:", self.clock_info)):
+            row = ttk.Frame(box_clock)
+            row.pack(fill="x", padx=10, pady=4)
+            ttk.Label(row, text=label, width=14).pack(side="left")
+            ttk.Label(row, textvariable=var).pack(side="left")
+
     # ---------- helpers ----------
 
+    def post(self, kind, *args):
+        """Zdarzenie dla UI z dowolnego wątku (obsłużone w drain_ui_queue)."""
+        self.ui_queue.put((kind, args))
+
+    def drain_ui_queue(self):
+        handlers = {
+            "log": self._append_log,
+            "popup": lambda title, msg: messagebox.showerror(title, msg),
+            "license": self.on_license_state,
+            "license_verdict": self.on_license_verdict,
+            "start_metric": lambda ms: self.start_metric.set(f"START → 1. odczyt: {ms:.0f} ms"),
+            "notify": self.emit_notification,
+            "chrome_ready": self.on_chrome_ready,
+            "macro_started": self.on_macro_started,
+            "macro_failed": self.on_macro_failed,
+            "macro_done": self.on_macro_done,
+            "clock": self.on_clock_state,
+            "timeouts": lambda snap: self.adaptive_info.set(f"Wyuczone limity: {format_timeouts(snap)}"),
+            "batch": self.on_batch_state,
+            "batch_summary": self.batch_info.set,
+            "metrics": lambda snap: setattr(METRICS, "remote", snap),
+        }
+        try:
+            while True:
+                kind, args = self.ui_queue.get_nowait()
+                handlers[kind](*args)
+        except queue.Empty:
+            pass
+        if not self._closed:
+            self.after(50, self.drain_ui_queue)
+
     def log(self, msg):
-        self.log_box.insert("end", msg + "\n")
+        self.post("log", msg)
+
+    def server_now(self):
+        """Czas eBramy (epoch s) z ostatniego stanu ServerClock; bez pomiaru – lokalny."""
+        offset_ms = (self.clock_state or {}).get("offset_ms") or 0.0
+        return time.time() + offset_ms / 1000
+
+    def _append_log(self, msg):
+        stamp = dt.datetime.fromtimestamp(self.server_now()).strftime("%H:%M:%S.%f")[:-3]
+        self.log_box.insert("end", f"{stamp} {msg}\n")
         self.log_box.see("end")
 
     def popup(self, title, msg):
-        self.after(0, lambda: messagebox.showerror(title, msg))
+        self.post("popup", title, msg)
 
     def copy_machine_id(self):
         try:
@@ -904,17 +5562,42 @@ class App(tk.Tk):
         ed = dt.datetime.strptime(self.do_date.get(), "%Y-%m-%d").date()
         return sd, int(self.od_hour.get()), ed, int(self.do_hour.get())
 
-    def iter_hours_for_day(self, d):
+    def get_run_config(self):
         sd, sh, ed, eh = self.get_range()
-        if sd == ed:
-            if eh < sh:
-                return range(sh, 24)
-            return range(sh, eh + 1)
-        if d == sd:
-            return range(sh, 24)
-        if d == ed:
-            return range(0, eh + 1)
-        return range(0, 24)
+        poll, load_to, success_to = self.get_params()
+        awizacja = self.awizacja.get().strip()
+        try:
+            profile = parse_rate_profile(self.rate_profile.get())
+        except ValueError as e:
+            self.log(f"[SCHED] {e} – profil pominięty.")
+            profile = []
+        try:
+            max_rps = max(0.0, float(self.max_rps.get()))
+        except Exception:
+            max_rps = SCHED_MAX_RPS
+        try:
+            arm_at = parse_arm_time(self.arm_time.get())
+        except ValueError as e:
+            self.log(f"[ARM] {e} – start bez uzbrojenia.")
+            arm_at = None
+        return RunConfig(
+            sd, sh, ed, eh, poll, load_to, success_to,
+            fast_click=bool(self.fast_click.get()),
+            raw_cdp=bool(self.raw_cdp.get()),
+            reduce_motion=bool(self.reduce_motion.get()),
+            block_resources=bool(self.block_resources.get()),
+            keep_focus=bool(self.keep_focus.get()),
+            cdp_endpoint=self.cdp_endpoint,
+            awizacja=awizacja,
+            macro=self.macros.get(awizacja),
+            adaptive=bool(self.adaptive.get()),
+            rate_profile=profile,
+            max_rps=max_rps,
+            arm_at=arm_at,
+            refresh=self.refresh_mode.get(),
+            coordinator=self.coordinator_url.get().strip(),
+            coordinator_token=self.coordinator_token.get().strip(),
+        )
 
     def get_params(self):
         try:
@@ -958,73 +5641,371 @@ class App(tk.Tk):
 
     # ---------- license ----------
 
-    def refresh_license_status(self, close_on_invalid: bool):
+    def check_license(self, close_on_invalid: bool, gate=None):
         """
-        Sprawdza status licencji przez Apps Script, aktualizuje Info.
+        Zleca sprawdzenie licencji w tle (LicenseService), bez blokowania Tk.
+        Wynik trafia do gate (jeśli podano) zaraz po odpowiedzi serwera.
         Jeśli close_on_invalid=True i status != OK -> zamyka program.
         """
-        hwid = self.machine_id
-        checked_at = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        try:
-            data = fetch_license_status(hwid)
-            status = str(data.get("status", "UNKNOWN")).strip().upper()
-            valid_to = data.get("valid_to", "")
-
-            self.lic_status.set(status)
-            self.lic_valid_to.set(str(valid_to))
-            self.lic_checked.set(checked_at)
-
-            if close_on_invalid and not is_license_valid(status):
-                messagebox.showerror(
-                    "Licencja",
-                    f"Licencja nieważna: {status}\nWażna do: {valid_to}"
-                )
-                self.destroy()
+        def done(state):
+            valid = is_license_valid(state["status"])
+            if gate is not None:
+                gate.set(valid)
+            if close_on_invalid and not valid:
+                self.post("license_verdict", state)
+
+        self.license.check(done)
+
+    def on_license_state(self, state):
+        """Aktualizuje Info (wątek Tk)."""
+        status = state["status"]
+        METRICS.license = status
+        if state["cached"]:
+            verified = state["verified_at"].strftime("%Y-%m-%d %H:%M:%S")
+            status = f"{status} (z pamięci, potwierdzone {verified})"
+        self.lic_status.set(status)
+        self.lic_valid_to.set(str(state["valid_to"]))
+        self.lic_checked.set(state["checked_at"].strftime("%Y-%m-%d %H:%M:%S"))
+
+    def on_clock_state(self, state):
+        """Nowa estymacja zegara eBramy (wątek Tk); pierwsza uruchamia odświeżanie zegara w Info."""
+        first = self.clock_state is None
+        self.clock_state = state
+        drift = "—" if state["drift_ppm"] is None else f"{state['drift_ppm']:+.0f} ± {state['drift_err_ppm']:.0f} ppm"
+        self.clock_info.set(
+            f"{state['offset_ms']:+.0f} ms ± {state['uncertainty_ms']:.0f} ms | dryf {drift} "
+            f"| próbki {state['agree']}/{state['samples']}"
+        )
+        if first:
+            self.tick_server_clock()
 
-        except Exception as e:
-            self.lic_status.set("ERROR")
-            self.lic_valid_to.set("")
-            self.lic_checked.set(checked_at)
-
-            if close_on_invalid:
-                messagebox.showerror(
-                    "Licencja",
-                    f"Nie udało się sprawdzić licencji (ERROR).\n{e}"
-                )
-                self.destroy()
+    def tick_server_clock(self):
+        if self._closed:
+            return
+        self.clock_now.set(dt.datetime.fromtimestamp(self.server_now()).strftime("%H:%M:%S.%f")[:-4])
+        self.after(100, self.tick_server_clock)
+
+    def on_license_verdict(self, state):
+        """Nieważna licencja po START/STOP -> komunikat i zamknięcie (wątek Tk)."""
+        if state["status"] == "ERROR":
+            messagebox.showerror(
+                "Licencja",
+                f"Nie udało się sprawdzić licencji (ERROR).\n{state['error']}"
+            )
+        else:
+            messagebox.showerror(
+                "Licencja",
+                f"Licencja nieważna: {state['status']}\nWażna do: {state['valid_to']}"
+            )
+        self.on_close()
 
     # ---------- controls ----------
 
     def start(self):
+        """
+        START bez czekania na licencję: sprawdzenie licencji, podpięcie karty
+        i weryfikacja ekranu slotów idą równolegle. Odczyt slotów rusza od razu,
+        a kliknięcie rezerwacji czeka na ważny wynik licencji (LicenseGate).
+        """
+        t_start = time.perf_counter()
+        self.emit_notification("start_stop")
+
+        if self.worker and self.worker.is_alive():
+            self.check_license(close_on_invalid=True)
+            return
+
+        cfg = self.get_run_config()
+        self.log("[UI] START")
+        if self.engine_in_process.get():
+            self.warm_engine()
+            self.worker, gate = self.engine.start_worker(cfg, t_start)
+        else:
+            gate = LicenseGate()
+            self.worker = Worker(
+                self, self.ui_session(), cfg, gate, t_start, self.latency,
+                selectors=self.selectors, refresher=self.refresher,
+            )
+            self.worker.start()
+        self.check_license(close_on_invalid=True, gate=gate)
         self.emit_notification("start_stop")
 
-        # START ma sprawdzić licencję i zamknąć program jeśli nieważna
-        self.refresh_license_status(close_on_invalid=True)
-        if not self.winfo_exists():
+    def show_start_metric(self, ms):
+        self.post("start_metric", ms)
+
+    # ---------- Kolejka ----------
+
+    def load_batch(self):
+        path = filedialog.askopenfilename(
+            title="Kolejka awizacji", filetypes=[("CSV", "*.csv"), ("Wszystkie pliki", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            jobs = load_batch_csv(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Kolejka", f"Nie udało się wczytać pliku:\n{e}")
             return
 
+        self.batch_jobs = jobs
+        self.batch_tree.delete(*self.batch_tree.get_children())
+        for job in jobs:
+            self.batch_tree.insert("", "end", iid=str(job.id))
+            self.on_batch_state(job.state())
+        missing = [j.ref for j in jobs if j.ref not in self.macros]
+        self.batch_info.set(f"Wczytano {len(jobs)} zadań" + (f", bez makra: {len(missing)}" if missing else ""))
+        self.log(f"[KOLEJKA] Wczytano {len(jobs)} zadań z {path}.")
+
+    def start_batch(self, pool=False):
+        """
+        START kolejki: zadania po kolei wg priorytetu (BatchWorker), a z pool=True
+        wszystkie naraz, każde na własnej karcie (PoolWorker).
+        """
+        t_start = time.perf_counter()
         if self.worker and self.worker.is_alive():
+            messagebox.showwarning("Kolejka", "Najpierw zatrzymaj bieżącą rezerwację (STOP).")
+            return
+        if not self.batch_jobs:
+            messagebox.showwarning("Kolejka", "Najpierw wczytaj plik CSV z awizacjami.")
             return
 
-        self.log("[UI] START")
-        self.worker = Worker(self)
-        self.worker.start()
+        # Worker dostaje kopie – stan w UI aktualizują wyłącznie zdarzenia "batch"
+        jobs = [copy.copy(j) for j in self.batch_jobs]
+        for job in jobs:
+            if job.status in ("w toku", "w puli"):   # przerwane STOP-em
+                job.status = "czeka"
+            job.screen_confirmed = False
+        waiting = [j for j in jobs if j.status == "czeka"]
+        first = min(waiting, key=lambda j: (j.priority, j.id)) if waiting else None
+        if not pool and first is not None and first.ref not in self.macros:
+            # bez makra zadanie może pracować tylko na ekranie, który operator rozpoznał jako swój
+            first.screen_confirmed = messagebox.askyesno(
+                "Kolejka",
+                f"Awizacja {first.ref} nie ma nagranego makra.\n"
+                f"Czy otwarty teraz ekran slotów należy do awizacji {first.ref}?\n\n"
+                f"Nie = zadanie zostanie pominięte.",
+            )
+        cfg = self.get_run_config()
+        self.log(f"[UI] START {'puli' if pool else 'kolejki'} ({len(jobs)} zadań)")
         self.emit_notification("start_stop")
+        if self.engine_in_process.get():
+            self.warm_engine()
+            self.worker, gate = self.engine.start_batch(cfg, jobs, dict(self.macros), t_start, pool)
+        else:
+            gate = LicenseGate()
+            self.worker = make_batch_worker(
+                self, self.ui_session(), cfg, gate, jobs, dict(self.macros), t_start, pool, self.ledger,
+                latency=self.latency, selectors=self.selectors, refresher=self.refresher,
+            )
+            self.worker.start()
+        self.check_license(close_on_invalid=True, gate=gate)
+
+    def on_batch_state(self, state):
+        for job in self.batch_jobs:
+            if job.id == state["id"]:
+                job.status = state["status"]
+                job.slices = state["slices"]
+                job.active_s = state["active_s"]
+                job.booked_after_s = state["booked_after_s"]
+        booked = state["booked_after_s"]
+        if not self.batch_tree.exists(str(state["id"])):   # jednostka z koordynatora
+            self.batch_tree.insert("", "end", iid=str(state["id"]))
+        self.batch_tree.item(str(state["id"]), values=(
+            state["ref"], state["window"], state["priority"], state["status"], state["slices"],
+            f"{state['active_s']:.0f} s", "" if booked is None else f"{booked:.0f} s",
+        ))
+
+    def show_timeouts(self, snap):
+        self.post("timeouts", snap)
+
+    def batch_update(self, state):
+        self.post("batch", state)
+
+    def batch_summary(self, text):
+        self.post("batch_summary", text)
 
     def stop(self):
         self.emit_notification("start_stop")
 
+        if self.worker:
+            self.worker.stop()
+            self.log("[UI] STOP")
+            self.emit_notification("start_stop")
+
         # STOP ma też sprawdzić licencję i zamknąć program jeśli nieważna
-        self.refresh_license_status(close_on_invalid=True)
-        if not self.winfo_exists():
+        self.check_license(close_on_invalid=True)
+
+    def start_chrome(self):
+        """Uruchamia Chrome z profilem VBS w tle i podpina sesję, gdy tylko CDP odpowie."""
+        if self.chrome is not None and self.chrome.alive():
+            self.log(f"[CHROME] Już działa ({self.chrome.endpoint}).")
+            return
+
+        def job():
+            try:
+                self.post("chrome_ready", launch_chrome())
+            except Exception as e:
+                self.log(f"[CHROME] Nie udało się uruchomić Chrome: {e}")
+
+        self.log("[CHROME] Uruchamiam Chrome...")
+        threading.Thread(target=job, daemon=True).start()
+
+    def on_chrome_ready(self, inst):
+        self.chrome = inst
+        self.cdp_endpoint = inst.endpoint
+        if self.engine_in_process.get():
+            self.engine.ensure_running()
+            self.engine.send("endpoint", inst.endpoint)
+        else:
+            session = self.ui_session()
+            session.submit(session.use_endpoint, inst.endpoint)
+        how = "podpięty do działającego" if inst.proc is None else "gotowy"
+        self.log(f"[CHROME] {how.capitalize()} w {inst.ready_ms:.0f} ms ({inst.endpoint}, profil {inst.profile_dir}).")
+
+    # ---------- Makra nawigacji ----------
+
+    def update_macro_info(self):
+        macro = self.macros.get(self.awizacja.get().strip())
+        if macro:
+            self.macro_info.set(f"makro: {len(macro['steps'])} kroków ({macro['recorded']})")
+        else:
+            self.macro_info.set("makro: brak")
+
+    def record_macro(self):
+        """
+        NAGRAJ: od bieżącej strony eBramy zapisuje kliknięcia aż do ekranu slotów
+        i przypisuje je do wpisanej awizacji. Ponowne kliknięcie przerywa nagrywanie.
+        """
+        if self.recorder is not None:
+            rec, self.recorder = self.recorder, None
+            rec.cancel()
+            self.macro_btn_text.set("NAGRAJ")
+            self.log("[MAKRO] Nagrywanie przerwane.")
+            return
+
+        key = self.awizacja.get().strip()
+        if not key:
+            messagebox.showwarning("Makro", "Wpisz numer awizacji, dla której nagrywasz przejście.")
+            return
+        if self.worker and self.worker.is_alive():
+            self.log("[MAKRO] Najpierw STOP – nagrywanie działa na tej samej karcie.")
+            return
+
+        self.macro_btn_text.set("PRZERWIJ")
+        if self.engine_in_process.get():
+            self.recorder = self.engine.record_macro(key, self.cdp_endpoint)
+        else:
+            self.recorder = MacroRecording(self.ui_session(), key, self.post)
+
+    def on_macro_started(self, key):
+        if self.recorder is not None:
+            self.log(f"[MAKRO] Nagrywam ({key}) – przejdź w Chrome do ekranu slotów tej awizacji.")
+
+    def on_macro_failed(self, key, text):
+        if self.recorder is None:
+            return   # przerwane w międzyczasie
+        self.recorder = None
+        self.macro_btn_text.set("NAGRAJ")
+        self.log(f"[MAKRO] {text}")
+
+    def on_macro_done(self, key, macro):
+        if self.recorder is None:
+            return
+        self.recorder = None
+        self.macro_btn_text.set("NAGRAJ")
+        self.macros[key] = macro
+        try:
+            save_macros(self.macros)
+        except Exception as e:
+            self.log(f"[MAKRO] Nie udało się zapisać {MACROS_FILE.name}: {e}")
+        self.update_macro_info()
+        self.log(f"[MAKRO] Zapisano {key}: {len(macro['steps'])} kroków od {macro['url']}")
+
+    def ui_session(self):
+        """Sesja CDP w procesie UI – tworzona dopiero, gdy kartą steruje UI (tryb w procesie)."""
+        if self.session is None:
+            clock = ServerClock(publish=lambda st: self.post("clock", st))
+            self.session = CdpSession(self.log, self.cdp_endpoint, clock=clock)
+            self.session.start()
+        return self.session
+
+    def warm_engine(self):
+        """
+        Rozgrzewa sesję CDP tam, gdzie pójdzie następny START. W trybie silnika
+        UI jest tylko klientem: bezczynna sesja UI (i jej Playwright) jest zamykana.
+        """
+        if not self.engine_in_process.get():
+            self.ui_session()
             return
+        if self.session is not None and not (self.worker and self.worker.is_alive()):
+            session, self.session = self.session, None
+            session.close()
+        self.engine.ensure_running()
 
+    def on_engine_mode_change(self):
+        if self.worker and self.worker.is_alive():
+            self.log("[UI] Zmiana trybu silnika zadziała od następnego START.")
+        if self.recorder is not None:
+            rec, self.recorder = self.recorder, None
+            rec.cancel()
+            self.macro_btn_text.set("NAGRAJ")
+            self.log("[MAKRO] Nagrywanie przerwane (zmiana trybu silnika).")
+        self.warm_engine()
+
+    def on_metrics_toggle(self):
+        if self.metrics_on.get() and self.metrics_server is None:
+            try:
+                self.metrics_server = serve_metrics(self.machine_id)
+                self.log(f"[METRYKI] Endpoint: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            except OSError as e:
+                self.metrics_on.set(False)
+                self.log(f"[METRYKI] Nie udało się uruchomić endpointu na porcie {METRICS_PORT}: {e}")
+        elif not self.metrics_on.get() and self.metrics_server is not None:
+            server, self.metrics_server = self.metrics_server, None
+            threading.Thread(target=server.shutdown, daemon=True).start()
+            self.log("[METRYKI] Endpoint wyłączony.")
+
+    def on_close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
         if self.worker:
             self.worker.stop()
-            self.log("[UI] STOP")
-            self.emit_notification("start_stop")
+        if self.recorder is not None:
+            self.recorder.cancel()
+        if self.session is not None:
+            self.session.close()
+        self.engine.close()
+        self.license.close()
+        self.destroy()
+
+
+def coordinator_main(arg, token_arg=None):
+    """
+    --coordinator[=HOST:PORT] [--coord-token=TOKEN]: sam koordynator puli, bez okna
+    (Ctrl+C kończy). Domyślnie tylko localhost; w LAN HOST = adres karty sieciowej.
+    Token z argumentu albo NTQ_COORD_TOKEN; bez niego losowany i wypisywany.
+    """
+    host, _, port = (arg.partition("=")[2] or f"{COORD_HOST}:{COORD_PORT}").rpartition(":")
+    host = host or COORD_HOST
+    given = (token_arg or "").partition("=")[2] or os.environ.get(COORD_TOKEN_ENV)
+    token = given or secrets.token_urlsafe(16)
+    server = serve_coordinator(token, host, int(port))
+    print(f"[KOORD] Koordynator {VERSION} nasłuchuje na {host}:{port}")
+    if not given:
+        print(f"[KOORD] Token (wpisz w instancjach): {token}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
 
 
 if __name__ == "__main__":
-    App().mainloop()
+    multiprocessing.freeze_support()  # proces silnika w wersji EXE (PyInstaller)
+    coord = next((a for a in sys.argv[1:] if a.startswith("--coordinator")), None)
+    if coord is not None:
+        coordinator_main(coord, next((a for a in sys.argv[1:] if a.startswith("--coord-token=")), None))
+    else:
+        App(launch_chrome="--launch-chrome" in sys.argv[1:]).mainloop()
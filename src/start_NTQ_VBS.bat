@@ -0,0 +1,25 @@
+@echo off
+setlocal enabledelayedexpansion
+title NTQ Intermodal: VBS
+
+REM === KONFIGURACJA ===
+REM Chrome (profil %USERPROFILE%\chrome-vbs, wolny port CDP, eBrama) uruchamia sam program
+REM i podpina sie, gdy tylko Chrome jest gotowy - bez stalego czekania.
+
+REM EXE w tym samym folderze co BAT
+set "BASEDIR=%~dp0"
+set "EXE=VBS Klikacz NTQ v4.2.3.exe"
+set "EXEPATH=%BASEDIR%%EXE%"
+
+echo [1/2] Uruchamiam program (+ Chrome)...
+if not exist "%EXEPATH%" (
+  echo [BLAD] Nie znaleziono pliku: "%EXEPATH%"
+  echo Upewnij sie, ze EXE jest w tym samym folderze co ten BAT.
+  pause
+  exit /b 1
+)
+
+start "" "%EXEPATH%" --launch-chrome
+
+echo [2/2] Gotowe.
+pause
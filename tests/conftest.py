@@ -0,0 +1,36 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+SLOT_PAGE = Path(__file__).parent / "fixtures" / "slot_page.html"
+
+
+@pytest.fixture(scope="module")
+def browser():
+    """Chromium Playwrighta; bez zainstalowanej przeglądarki testy są pomijane."""
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as pw:
+        try:
+            b = pw.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"Chromium niedostępny: {e}")
+        yield b
+        b.close()
+
+
+@pytest.fixture
+def slot_page(browser):
+    """open(filler=0, anim=400) -> karta z lokalną makietą ekranu slotów."""
+    ctx = browser.new_context()
+
+    def open_page(filler=0, anim=400):
+        page = ctx.new_page()
+        page.goto(f"{SLOT_PAGE.as_uri()}?filler={filler}&anim={anim}")
+        return page
+
+    yield open_page
+    ctx.close()
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+
+def test_strategies_learn_separate_refresh_budgets():
+    t = main.LatencyTracker()
+    api = main.refresh_phase("API")
+    reload = main.refresh_phase("reload")
+    for _ in range(main.ADAPTIVE_MIN_SAMPLES):
+        t.record(api, 100)
+    assert t.timeout(api, 5000) == main.ADAPTIVE_FLOOR_MS["grid"]
+    assert t.timeout(reload, 5000) == 5000   # bez własnych próbek: pełny limit z ustawień
+    assert t.timeout("grid", 5000) == 5000
+
+
+def test_refresh_phase_samples_go_to_grid_histogram():
+    before = sum(main.METRICS.hist["grid"])
+    main.LatencyTracker().record(main.refresh_phase("STANDARDOWE"), 250)
+    assert sum(main.METRICS.hist["grid"]) == before + 1
+
+
+def test_format_timeouts_lists_measured_strategies():
+    snap = {"grid": (5000, 0), main.refresh_phase("API"): (500, 7), main.refresh_phase("reload"): (5000, 0)}
+    text = main.format_timeouts(snap)
+    assert "siatka/API 500 ms (n=7)" in text
+    assert "reload" not in text
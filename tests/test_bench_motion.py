@@ -0,0 +1,47 @@
+"""
+Benchmark fazy potwierdzeń (klik kafelka -> TAK -> OK -> komunikat sukcesu)
+na lokalnej makiecie ekranu slotów z animowanymi modalami, z MotionSuppressor
+i bez niego. Wyniki: pytest -s tests/test_bench_motion.py
+"""
+import statistics
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+ANIM_MS = 300
+ROUNDS = 5
+PHASE_BUDGET_S = 10
+
+
+def confirm_phase_ms(page):
+    """Jedna rezerwacja na świeżo załadowanej makiecie: czas od kliknięcia kafelka do sukcesu."""
+    stop_evt = threading.Event()
+    page.reload()
+    assert main.sliced_click(page.locator("app-slot-grid button").first, 2000, stop_evt)
+    t0 = time.perf_counter()
+    deadline = time.monotonic() + PHASE_BUDGET_S
+    while not main.success_visible(page):
+        assert time.monotonic() < deadline, "faza potwierdzeń nie zakończyła się sukcesem"
+        main.confirm_loop_fast(page, max_clicks=20, stop_evt=stop_evt)
+    return (time.perf_counter() - t0) * 1000
+
+
+def test_bench_confirm_phase_with_and_without_motion(slot_page):
+    page = slot_page(anim=ANIM_MS)
+    animated = [confirm_phase_ms(page) for _ in range(ROUNDS)]
+
+    motion = main.MotionSuppressor(page.context.new_cdp_session(page))
+    motion.apply()
+    still = [confirm_phase_ms(page) for _ in range(ROUNDS)]   # reload: styl z addScriptToEvaluateOnNewDocument
+    motion.remove()
+
+    a, s = statistics.median(animated), statistics.median(still)
+    print(f"\n[BENCH] Faza potwierdzeń TAK/OK (animacja {ANIM_MS} ms, mediana z {ROUNDS}):")
+    print(f"[BENCH]   z animacjami {a:7.0f} ms | bez animacji {s:7.0f} ms | oszczędność {a - s:7.0f} ms")
+    # cztery animacje (wejście/wyjście TAK i OK) odpadają prawie w całości
+    assert s < a - 2 * ANIM_MS
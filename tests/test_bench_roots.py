@@ -0,0 +1,55 @@
+"""
+Benchmark kosztu zapytania w kontenerze (RootRegistry) vs na całej stronie,
+na dużej lokalnej makiecie ekranu slotów. Wyniki: pytest -s tests/test_bench_roots.py
+"""
+import statistics
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+FILLER_ROWS = 20000
+ROUNDS = 15
+
+
+def query_ms(loc, sel):
+    t0 = time.perf_counter()
+    loc.locator(sel).count()
+    return (time.perf_counter() - t0) * 1000
+
+
+def test_roots_resolve_shared_elements_without_churn(slot_page):
+    page = slot_page()
+    reg = main.RootRegistry(page, page.evaluate, lambda msg: None)
+    reg.resolve()
+    assert set(reg.roots) == {"grid", "calendar", "toast", "modal"}
+
+    # toast i modal to ten sam .cdk-overlay-container – oba zakresy muszą działać
+    assert page.evaluate(main.ROOTS_CONNECTED_JS) == len(reg.roots)
+    reg.check(page.evaluate(main.PAGE_HEALTH_JS)["roots"])
+    assert reg.roots is not None
+    page.locator("app-slot-grid button").first.click()
+    assert reg.scope("modal").locator(main.TAK_SELECTORS[0]).count() == 1
+    assert reg.scope("grid").locator(main.ROOT_PROBES["grid"]).count() == 24
+
+
+def test_bench_scoped_query_cost_on_large_page(slot_page):
+    page = slot_page(filler=FILLER_ROWS)
+    reg = main.RootRegistry(page, page.evaluate, lambda msg: None)
+    reg.resolve()
+
+    rows = []
+    for name, sel in main.ROOT_PROBES.items():
+        scoped = statistics.median(query_ms(reg.scope(name), sel) for _ in range(ROUNDS))
+        whole = statistics.median(query_ms(page, sel) for _ in range(ROUNDS))
+        rows.append((name, scoped, whole))
+
+    print(f"\n[BENCH] Zapytanie na stronie z {FILLER_ROWS} wierszami (mediana z {ROUNDS}):")
+    for name, scoped, whole in rows:
+        print(f"[BENCH]   {name:9s} kontener {scoped:7.2f} ms | cała strona {whole:7.2f} ms")
+
+    grid = next(r for r in rows if r[0] == "grid")
+    assert grid[1] < grid[2]
@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+CDN = "cdn.example.net"
+
+
+class Cdp:
+    """Kanał CDP: zapisuje wysłane komendy; fail_post = odpowiedź na żądanie nie przechodzi."""
+
+    def __init__(self, fail_post=False):
+        self.sent = []
+        self.posted = []
+        self.handlers = {}
+        self.fail_post = fail_post
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def off(self, event, handler):
+        self.handlers.pop(event, None)
+
+    def send(self, method, params=None):
+        self.sent.append((method, params))
+        return {}
+
+    def post(self, method, params=None):
+        if self.fail_post:
+            raise OSError("gniazdo zamknięte")
+        self.posted.append((method, params["requestId"]))
+
+    def close(self):
+        self.closed = True
+
+    def pause(self, rid, url, rtype):
+        self.handlers["Fetch.requestPaused"]({"requestId": rid, "request": {"url": url}, "resourceType": rtype})
+
+
+def seen(js):
+    return {
+        "sizes": {f"https://{CDN}/app/vendor.js": 2048, "https://tracker.example.org/t.js": 4096},
+        "bundles": [CDN],
+    }
+
+
+def installed(cdp=None):
+    cdp = cdp or Cdp()
+    blocker = main.ResourceBlocker(cdp, seen)
+    blocker.install()
+    return blocker, cdp
+
+
+def test_intercepts_scripts_and_heavy_types_but_not_api():
+    _, cdp = installed()
+    method, params = cdp.sent[0]
+    assert method == "Fetch.enable"
+    types = {p["resourceType"] for p in params["patterns"]}
+    assert {"Script", "Stylesheet", "Image", "Font", "Media"} <= types
+    assert not types & {"XHR", "Fetch", "Document"}
+
+
+def test_app_bundles_pass_foreign_scripts_are_blocked():
+    blocker, cdp = installed()
+    cdp.pause("1", "https://ebrama.baltichub.com/chunk-7.js", "Script")
+    cdp.pause("2", f"https://{CDN}/app/vendor.js", "Script")
+    cdp.pause("3", "https://tracker.example.org/t.js", "Script")
+    assert cdp.posted == [
+        ("Fetch.continueRequest", "1"),
+        ("Fetch.continueRequest", "2"),
+        ("Fetch.failRequest", "3"),
+    ]
+    assert blocker.blocked == 1
+    assert blocker.bytes_saved == 4096
+    assert "(szacunek)" in blocker.summary()
+
+
+def test_images_blocked_even_from_allowed_hosts():
+    blocker, cdp = installed()
+    cdp.pause("1", "https://ebrama.baltichub.com/assets/logo.png", "Image")
+    assert cdp.posted == [("Fetch.failRequest", "1")]
+
+
+def test_broken_channel_is_dropped_instead_of_leaving_requests_paused():
+    blocker, cdp = installed(Cdp(fail_post=True))
+    cdp.pause("1", "https://tracker.example.org/t.js", "Script")
+    assert cdp.closed
+    assert blocker.blocked == 0
+
+
+def test_remove_disables_fetch():
+    blocker, cdp = installed()
+    blocker.remove()
+    assert cdp.sent[-1][0] == "Fetch.disable"
+    assert "Fetch.requestPaused" not in cdp.handlers
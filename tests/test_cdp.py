@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+
+def silent_client(timeout=0.1):
+    """CdpClient bez gniazda: ramki giną, odpowiedź nigdy nie przychodzi (zajęta karta)."""
+    c = main.CdpClient.__new__(main.CdpClient)
+    c.ws_url = "ws://127.0.0.1:9/devtools/page/x"
+    c.timeout = timeout
+    c._sock = None
+    c._send_lock = threading.Lock()
+    c._pending = {}
+    c._listeners = {}
+    c._next_id = 0
+    c._closed = threading.Event()
+    c._send_frame = lambda opcode, payload: None
+    return c
+
+
+def test_send_timeout_raises_cdp_error():
+    c = silent_client()
+    with pytest.raises(main.CdpError):
+        c.send("Runtime.evaluate", {"expression": "1"})
+    assert c._pending == {}
+
+
+def test_evaluate_timeout_raises_cdp_error():
+    with pytest.raises(main.CdpError):
+        silent_client().evaluate("() => 1")
+
+
+class Ui:
+    def __init__(self):
+        self.lines = []
+
+    def log(self, msg):
+        self.lines.append(msg)
+
+
+def test_read_slots_falls_back_to_playwright_on_slow_cdp(monkeypatch):
+    monkeypatch.setattr(main, "fast_read_slots", lambda page: {"06:00-06:59": (1, 3)})
+    w = main.Worker.__new__(main.Worker)
+    w.ui = Ui()
+    w.raw = silent_client()
+    w.fast = None
+    assert w.read_slots(object()) == {"06:00-06:59": (1, 3)}
+    assert w.raw is None
+    assert any("[CDP]" in line for line in w.ui.lines)
+
+
+class HungChromium:
+    """connect_over_cdp do Chrome, który nie odpowiada: każda próba kończy się timeoutem."""
+
+    def __init__(self, answer_after_ms=None):
+        self.timeouts = []
+        self.answer_after_ms = answer_after_ms
+
+    def connect_over_cdp(self, endpoint, timeout=None):
+        self.timeouts.append(timeout)
+        if self.answer_after_ms is not None and timeout >= self.answer_after_ms:
+            return "browser"
+        time.sleep(timeout / 1000)
+        raise main.PWTimeoutError("Timeout exceeded")
+
+
+def hung_session(chromium):
+    session = main.CdpSession(lambda msg: None)
+    session._pw = type("Pw", (), {"chromium": chromium})()
+    session.is_connected = lambda: session._browser is not None
+    return session
+
+
+def test_connect_is_stoppable():
+    chromium = HungChromium()
+    stop_evt = threading.Event()
+    threading.Timer(0.3, stop_evt.set).start()
+    t0 = time.monotonic()
+    assert hung_session(chromium).slot_page(stop_evt) is None
+    assert time.monotonic() - t0 < 0.3 + main.CDP_CONNECT_ATTEMPT_MAX_MS / 1000
+    assert max(chromium.timeouts) <= main.CDP_CONNECT_ATTEMPT_MAX_MS
+
+
+def test_connect_attempts_grow_until_chrome_answers():
+    chromium = HungChromium(answer_after_ms=700)
+    session = hung_session(chromium)
+    assert session.ensure_connected(threading.Event())
+    assert session._browser == "browser"
+    assert chromium.timeouts == sorted(chromium.timeouts) and len(chromium.timeouts) > 1
+
+
+def test_connect_without_stop_evt_keeps_single_full_timeout():
+    chromium = HungChromium(answer_after_ms=main.CDP_CONNECT_TIMEOUT_MS - 100)
+    assert hung_session(chromium).ensure_connected()
+    assert len(chromium.timeouts) == 1
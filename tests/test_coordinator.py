@@ -0,0 +1,163 @@
+import datetime as dt
+import http.client
+import socket
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+TOKEN = "wspolny-sekret"
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class Job:
+    def __init__(self, ref, days_ahead=1, h_from=6, h_to=9, priority=5):
+        day = dt.date.today() + dt.timedelta(days=days_ahead)
+        self.ref = ref
+        self.start = dt.datetime.combine(day, dt.time(h_from))
+        self.end = dt.datetime.combine(day, dt.time(h_to))
+        self.priority = priority
+
+
+def job_payload(job):
+    return {"ref": job.ref, "start": job.start.isoformat(), "end": job.end.isoformat(), "priority": job.priority}
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def coord(clock):
+    return main.Coordinator(log=lambda msg: None, lease_s=20, clock=clock)
+
+
+def call(c, path, machine, **payload):
+    return c.handle(path, dict(payload, machine=machine))
+
+
+def test_only_one_machine_may_claim_an_awizacja(coord):
+    call(coord, "/submit", "A", jobs=[job_payload(Job("AW1"))])
+    assert call(coord, "/claim", "A", ref="AW1")["ok"]
+    assert not call(coord, "/claim", "B", ref="AW1")["ok"]
+    call(coord, "/release", "A", ref="AW1")
+    assert call(coord, "/claim", "B", ref="AW1")["ok"]
+
+
+def test_booked_awizacja_cannot_be_claimed_or_leased_again(coord):
+    call(coord, "/submit", "A", jobs=[job_payload(Job("AW1"))])
+    call(coord, "/claim", "A", ref="AW1")
+    call(coord, "/report", "A", ref="AW1", slot="06:00-06:59")
+    assert not call(coord, "/claim", "B", ref="AW1")["ok"]
+    leased = call(coord, "/lease", "B", refs=["AW1"])
+    assert leased["units"] == []
+    assert "AW1" in leased["booked"]
+    call(coord, "/submit", "B", jobs=[job_payload(Job("AW1"))])   # ponowne zgłoszenie nic nie dodaje
+    assert coord.units == {}
+
+
+def test_units_of_one_awizacja_spread_over_machines(coord):
+    call(coord, "/submit", "A", jobs=[job_payload(Job("AW1", h_from=0, h_to=23))])
+    a = call(coord, "/lease", "A", refs=["AW1"])["units"]
+    b = call(coord, "/lease", "B", refs=["AW1"])["units"]
+    assert len(a) == 1 and len(b) == 1   # jedna jednostka awizacji na komputer
+    assert a[0]["id"] != b[0]["id"]
+
+
+def test_silent_machine_loses_leases_and_claims(coord, clock):
+    call(coord, "/submit", "A", jobs=[job_payload(Job("AW1"))])
+    unit = call(coord, "/lease", "A", refs=["AW1"])["units"][0]
+    call(coord, "/claim", "A", ref="AW1")
+
+    clock.t += 10
+    assert call(coord, "/lease", "B", refs=["AW1"])["units"] == []   # A jeszcze żyje
+
+    clock.t += 15   # A bez heartbeatu dłużej niż lease_s
+    reclaimed = call(coord, "/lease", "B", refs=["AW1"])["units"]
+    assert [u["id"] for u in reclaimed] == [unit["id"]]
+    assert call(coord, "/claim", "B", ref="AW1")["ok"]
+    assert "A" not in coord.status()["instances"]
+
+
+def test_heartbeat_keeps_leases(coord, clock):
+    call(coord, "/submit", "A", jobs=[job_payload(Job("AW1"))])
+    call(coord, "/lease", "A", refs=["AW1"])
+    for _ in range(5):
+        clock.t += 15
+        assert len(call(coord, "/lease", "A", refs=["AW1"])["units"]) == 1
+
+
+def test_handle_requires_machine_and_known_path(coord):
+    with pytest.raises(ValueError):
+        coord.handle("/lease", {})
+    with pytest.raises(LookupError):
+        coord.handle("/status", {"machine": "A"})
+
+
+@pytest.fixture
+def server():
+    srv = main.serve_coordinator(TOKEN, "127.0.0.1", 0, log=lambda msg: None)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def url(srv):
+    host, port = srv.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def test_client_with_token_talks_to_coordinator(server):
+    a = main.CoordinatorClient(url(server), "A", TOKEN)
+    b = main.CoordinatorClient(url(server), "B", TOKEN)
+    a.register()
+    a.submit([Job("AW1")])
+    assert a.claim("AW1")
+    assert not b.claim("AW1")
+    a.report("AW1", "06:00-06:59")
+    assert server.coordinator.status()["booked"]["AW1"]["machine"] == "A"
+
+
+def test_requests_without_valid_token_are_rejected(server):
+    bad = main.CoordinatorClient(url(server), "X", "zly-token")
+    with pytest.raises(RuntimeError, match="401"):
+        bad.register()
+    assert "X" not in server.coordinator.instances
+
+    host, port = server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=2)
+    conn.request("GET", "/status")
+    assert conn.getresponse().status == 401
+    conn.close()
+
+
+def test_serve_coordinator_requires_token():
+    with pytest.raises(ValueError):
+        main.serve_coordinator("", "127.0.0.1", 0)
+
+
+def test_binds_only_the_chosen_interface():
+    assert main.COORD_HOST == "127.0.0.1"
+    try:
+        srv = main.serve_coordinator(TOKEN, "127.0.0.2", 0, log=lambda msg: None)
+    except OSError:
+        pytest.skip("127.0.0.2 niedostępny w tym systemie")
+    try:
+        port = srv.server_address[1]
+        assert srv.server_address[0] == "127.0.0.2"
+        with pytest.raises(OSError):
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+        socket.create_connection(("127.0.0.2", port), timeout=1).close()
+    finally:
+        srv.shutdown()
+        srv.server_close()
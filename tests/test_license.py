@@ -0,0 +1,163 @@
+import datetime as dt
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+HWID = "ABCDEF0123456789"
+
+
+class LicenseHandler(BaseHTTPRequestHandler):
+    """Zastępczy Apps Script: /exec przekierowuje jak Google, /echo odpowiada statusem z server.statuses."""
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/exec":
+            self.send_response(302)
+            self.send_header("Location", f"/echo?{parts.query}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        hwid = parse_qs(parts.query)["hwid"][0]
+        status, valid_to = self.server.statuses.get(hwid, ("NOT_FOUND", ""))
+        body = json.dumps({"hwid": hwid, "status": status, "valid_to": valid_to}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+@pytest.fixture
+def license_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LicenseHandler)
+    server.daemon_threads = True
+    server.statuses = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StubBackend:
+    """Backend z kolejnymi odpowiedziami: dict = status, wyjątek = błąd sieci."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def fetch(self, hwid):
+        self.calls += 1
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return dict(answer, hwid=hwid)
+
+
+def future(days=30):
+    return (dt.date.today() + dt.timedelta(days=days)).isoformat()
+
+
+def run_checks(service, n):
+    """n kolejnych sprawdzeń; zwraca stany w kolejności."""
+    states = []
+    service.start()
+    for _ in range(n):
+        done = queue.Queue()
+        service.check(done.put)
+        states.append(done.get(timeout=5))
+    service.close()
+    return states
+
+
+def test_http_backend_valid_license_through_redirect(license_server):
+    license_server.statuses[HWID] = ("OK", future())
+    backend = main.HttpLicenseBackend(f"http://127.0.0.1:{license_server.server_port}/exec", timeout=2)
+    data = backend.fetch(HWID)
+    backend.close()
+    assert data["status"] == "OK"
+    assert main.is_license_valid(data["status"])
+
+
+def test_service_valid_and_invalid_over_http(license_server):
+    license_server.statuses[HWID] = ("OK", future())
+    license_server.statuses["OTHER"] = ("EXPIRED", "2020-01-01")
+    url = f"http://127.0.0.1:{license_server.server_port}/exec"
+
+    ok = run_checks(main.LicenseService(HWID, lambda s: None, main.HttpLicenseBackend(url, timeout=2)), 1)[0]
+    assert ok["status"] == "OK" and not ok["cached"] and ok["verified_at"] is not None
+
+    bad = run_checks(main.LicenseService("OTHER", lambda s: None, main.HttpLicenseBackend(url, timeout=2)), 1)[0]
+    assert bad["status"] == "EXPIRED"
+    assert not main.is_license_valid(bad["status"])
+
+
+def test_network_error_within_grace_uses_cached_ok():
+    backend = StubBackend({"status": "OK", "valid_to": future()}, OSError("brak sieci"))
+    ok, cached = run_checks(main.LicenseService(HWID, lambda s: None, backend, grace_s=3600), 2)
+    assert cached["status"] == "OK"
+    assert cached["cached"]
+    assert "brak sieci" in cached["error"]
+    assert cached["verified_at"] == ok["verified_at"]
+
+
+def test_network_error_after_grace_is_error():
+    backend = StubBackend({"status": "OK", "valid_to": future()}, OSError("brak sieci"))
+    service = main.LicenseService(HWID, lambda s: None, backend, grace_s=3600)
+    service.start()
+    done = queue.Queue()
+    service.check(done.put)
+    done.get(timeout=5)
+    service._last_ok["verified_at"] -= dt.timedelta(seconds=3601)   # ostatnie OK starsze niż okres łaski
+    service.check(done.put)
+    state = done.get(timeout=5)
+    service.close()
+    assert state["status"] == "ERROR"
+    assert not state["cached"]
+
+
+def test_cached_license_past_valid_to_is_not_used():
+    yesterday = (dt.date.today() - dt.timedelta(days=1)).isoformat()
+    backend = StubBackend({"status": "OK", "valid_to": yesterday}, OSError("brak sieci"))
+    _, state = run_checks(main.LicenseService(HWID, lambda s: None, backend, grace_s=3600), 2)
+    assert state["status"] == "ERROR"
+
+
+def test_invalid_license_is_never_cached():
+    backend = StubBackend({"status": "BLOCKED", "valid_to": future()}, OSError("brak sieci"))
+    _, state = run_checks(main.LicenseService(HWID, lambda s: None, backend, grace_s=3600), 2)
+    assert state["status"] == "ERROR"
+
+
+def test_periodic_refresh_publishes_to_ui_queue():
+    ui_q = queue.Queue()
+    backend = StubBackend({"status": "OK", "valid_to": future()})
+    service = main.LicenseService(HWID, lambda s: ui_q.put(("license", s)), backend, refresh_s=0.05)
+    service.start()   # bez check(): stany przychodzą same co refresh_s
+    events = [ui_q.get(timeout=2) for _ in range(3)]
+    service.close()
+    assert all(kind == "license" and state["status"] == "OK" for kind, state in events)
+    assert backend.calls >= 3
+
+
+def test_concurrent_checks_share_one_request():
+    backend = StubBackend({"status": "OK", "valid_to": future()})
+    service = main.LicenseService(HWID, lambda s: None, backend)
+    got = queue.Queue()
+    for _ in range(3):
+        service.check(got.put)   # zlecone przed startem wątku -> jedno zapytanie
+    service.start()
+    states = [got.get(timeout=2) for _ in range(3)]
+    service.close()
+    assert backend.calls == 1
+    assert states[0] is states[1] is states[2]
@@ -0,0 +1,92 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+
+class Session:
+    """Sesja CDP: submit wykonuje od razu, slot_page/raw_client zwracają atrapy."""
+
+    def submit(self, fn, *args):
+        fut = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def slot_page(self):
+        return "page"
+
+    def raw_client(self, page):
+        return "cdp"
+
+
+class Recorder:
+    polls_to_done = 3
+    instances = []
+
+    def __init__(self, page, cdp):
+        self.polls = 0
+        self.cancelled = threading.Event()
+        Recorder.instances.append(self)
+
+    def start(self):
+        pass
+
+    def poll(self):
+        self.polls += 1
+        if self.polls >= self.polls_to_done:
+            return {"url": "https://ebrama/", "steps": ["#a"], "recorded": "teraz"}
+        return None
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+@pytest.fixture(autouse=True)
+def fake_recorder(monkeypatch):
+    Recorder.instances = []
+    monkeypatch.setattr(main, "MacroRecorder", Recorder)
+    monkeypatch.setattr(main, "MACRO_POLL_MS", 10)
+
+
+def events(q, n, timeout=2):
+    return [q.get(timeout=timeout) for _ in range(n)]
+
+
+def test_recording_polls_until_macro_is_ready():
+    q = queue.Queue()
+    main.MacroRecording(Session(), "AW1", lambda *evt: q.put(evt))
+    started, done = events(q, 2)
+    assert started == ("macro_started", "AW1")
+    assert done[:2] == ("macro_done", "AW1")
+    assert done[2]["steps"] == ["#a"]
+    assert Recorder.instances[0].polls == Recorder.polls_to_done
+
+
+def test_cancelled_recording_removes_recorder_and_stays_silent(monkeypatch):
+    monkeypatch.setattr(Recorder, "polls_to_done", 10 ** 6)
+    q = queue.Queue()
+    rec = main.MacroRecording(Session(), "AW1", lambda *evt: q.put(evt))
+    assert events(q, 1) == [("macro_started", "AW1")]
+    rec.cancel()
+    assert Recorder.instances[0].cancelled.wait(1)
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.1)
+
+
+def test_failed_start_is_reported():
+    class Broken(Session):
+        def slot_page(self):
+            raise RuntimeError("brak karty eBramy")
+
+    q = queue.Queue()
+    main.MacroRecording(Broken(), "AW1", lambda *evt: q.put(evt))
+    kind, key, text = events(q, 1)[0]
+    assert kind == "macro_failed" and "brak karty eBramy" in text
@@ -0,0 +1,139 @@
+import gc
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+SLOTS_URL = "https://ebrama.baltichub.com/api/slots?awizacja="
+
+
+class Ui:
+    def __init__(self):
+        self.lines = []
+
+    def log(self, msg):
+        self.lines.append(msg)
+
+
+class Request:
+    resource_type = "xhr"
+    method = "GET"
+
+    def __init__(self, url):
+        self.url = url
+        self.headers = {"authorization": "Bearer x", "cookie": "pominięte"}
+
+
+class Page:
+    """Karta z listenerami 'request'; refetch API zwraca skrót zależny od adresu i wersji danych."""
+
+    def __init__(self):
+        self.listeners = []
+        self.version = 0
+        self.fetched = []
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+    def emit(self, url):
+        for h in list(self.listeners):
+            h(Request(url))
+
+    def evaluate(self, js, arg=None):
+        self.fetched.append(arg[0])
+        return f"{arg[0]}#{self.version}"
+
+
+class Failing(main.RefreshStrategy):
+    name = "zawsze źle"
+
+    def refresh(self, page, day, load_to, stop_evt):
+        return False
+
+
+class Working(main.RefreshStrategy):
+    name = "działa"
+
+    def refresh(self, page, day, load_to, stop_evt):
+        return True
+
+
+def make_runner():
+    return main.RefreshRunner(Ui(), [main.ApiRefetchRefresh()], fixed="API")
+
+
+def test_api_refetch_uses_each_tabs_own_request():
+    runner = make_runner()
+    a, b = Page(), Page()
+    runner.watch(a)
+    runner.watch(b)
+    a.emit(SLOTS_URL + "A")
+    b.emit(SLOTS_URL + "B")
+
+    assert runner.refresh(a, None, 1000, None)
+    assert runner.refresh(b, None, 1000, None)
+    assert a.fetched == [SLOTS_URL + "A"]
+    assert b.fetched == [SLOTS_URL + "B"]
+
+
+def test_api_refetch_digest_is_per_tab(monkeypatch):
+    clicked = []
+    monkeypatch.setattr(main, "click_standardowe", lambda page, load_to, stop_evt: clicked.append(page) or True)
+    runner = make_runner()
+    a, b = Page(), Page()
+    runner.watch(a)
+    runner.watch(b)
+    a.emit(SLOTS_URL + "A")
+    b.emit(SLOTS_URL + "B")
+    runner.refresh(a, None, 1000, None)
+    runner.refresh(b, None, 1000, None)
+
+    b.version += 1   # zmiana tylko w awizacji B
+    runner.refresh(a, None, 1000, None)
+    runner.refresh(b, None, 1000, None)
+    assert clicked == [b]
+
+
+def test_api_refetch_unavailable_without_own_capture():
+    runner = make_runner()
+    a, b = Page(), Page()
+    runner.watch(a)
+    runner.watch(b)
+    a.emit(SLOTS_URL + "A")
+    api = runner.strategies[0]
+    assert api.available(a)
+    assert not api.available(b)
+
+
+def test_failures_and_requests_are_counted_per_tab():
+    runner = main.RefreshRunner(Ui(), [Failing(), Working()])
+    a, b = Page(), Page()
+    runner.watch(a)
+    runner.watch(b)
+    for _ in range(main.REFRESH_MAX_FAILS):
+        runner.refresh(a, None, 1000, None)
+    assert runner.fails(a, "zawsze źle") == main.REFRESH_MAX_FAILS
+    assert runner.fails(b, "zawsze źle") == 0
+
+    b.emit("https://example.com/x.js")
+    assert runner._requests[b] == 1
+    assert runner._requests[a] == 0
+
+
+def test_unwatch_removes_listener_and_forgets_tab():
+    runner = make_runner()
+    a = Page()
+    runner.watch(a)
+    a.emit(SLOTS_URL + "A")
+    runner.unwatch(a)
+    assert a.listeners == []
+    api = runner.strategies[0]
+    del a
+    gc.collect()
+    assert len(api.captured) == 0
+    assert len(runner._watched) == 0
@@ -0,0 +1,116 @@
+import datetime as dt
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+
+
+def at(hh, mm):
+    return dt.datetime(2026, 10, 19, hh, mm).timestamp()
+
+
+def test_profile_window_follows_given_clock():
+    profile = main.parse_rate_profile("06:55-07:10=0.2")
+    server = {"t": at(6, 54)}
+    sched = main.PollScheduler(1.0, profile, clock=lambda: server["t"])
+    assert sched.interval() == 1.0
+    server["t"] = at(6, 56)   # eBrama już w oknie, choć zegar lokalny mógłby jeszcze nie być
+    assert sched.interval() == 0.2
+
+
+def test_worker_uses_server_clock():
+    clock = main.ServerClock()
+    clock.offset = 90.0   # eBrama 1,5 min przed zegarem lokalnym
+    worker = main.Worker.__new__(main.Worker)
+    worker.session = SimpleNamespace(clock=clock)
+    assert worker.server_now() - time.time() == pytest.approx(90.0, abs=0.5)
+
+    worker.session = SimpleNamespace(clock=None)
+    assert worker.server_now() == pytest.approx(time.time(), abs=0.5)
+
+
+def test_parse_rate_profile():
+    assert main.parse_rate_profile("06:55-07:10=0.2; 23:50-00:10=0,5\n") == [(415, 430, 0.2), (1430, 10, 0.5)]
+    assert main.parse_rate_profile("") == []
+    for bad in ("06:55-07:10", "25:00-26:00=1", "06:60-07:00=1", "rano=1"):
+        with pytest.raises(ValueError):
+            main.parse_rate_profile(bad)
+
+
+@pytest.mark.parametrize("hh, mm, expected", [
+    (6, 54, 2.0),    # przed oknem
+    (6, 55, 0.2),    # początek okna wliczony
+    (7, 9, 0.2),
+    (7, 10, 2.0),    # koniec okna wyłączony
+    (23, 55, 0.5),   # okno przez północ
+    (0, 5, 0.5),
+    (0, 10, 2.0),
+])
+def test_interval_window_selection(hh, mm, expected):
+    sched = main.PollScheduler(2.0, main.parse_rate_profile("06:55-07:10=0.2; 23:50-00:10=0.5"))
+    assert sched.interval(dt.datetime(2026, 10, 19, hh, mm)) == expected
+
+
+def test_first_matching_window_wins_and_floor_applies():
+    sched = main.PollScheduler(2.0, main.parse_rate_profile("06:00-08:00=0.01; 07:00-07:30=1"))
+    assert sched.interval(dt.datetime(2026, 10, 19, 7, 15)) == main.SCHED_MIN_INTERVAL_S
+
+
+def test_churn_shortens_interval_for_hold_period():
+    sched = main.PollScheduler(2.0, churn_factor=0.25, churn_hold_s=0.1)
+    now = dt.datetime(2026, 10, 19, 12, 0)
+    assert not sched.observe("d", {"06:00": 1})   # pierwszy odczyt – bez porównania
+    assert sched.observe("d", {"06:00": 2})
+    assert not sched.observe("d", {"06:00": 3})   # nadal w okresie szybszego odświeżania
+    assert sched.interval(now) == 0.5
+    time.sleep(0.15)
+    assert sched.interval(now) == 2.0
+
+
+def test_delay_stays_within_interval_and_does_not_accumulate():
+    sched = main.PollScheduler(0.05)
+    t0 = time.monotonic()
+    for _ in range(6):
+        d = sched.delay()
+        assert 0.0 <= d <= 0.05 + 1e-6
+        time.sleep(d + 0.01)   # iteracja trwa 10 ms – termin i tak co 50 ms
+    elapsed = time.monotonic() - t0
+    assert elapsed < 6 * 0.05 + 0.05
+    assert sched.late == 0
+
+
+def test_late_cycle_runs_immediately_without_burst():
+    sched = main.PollScheduler(0.05)
+    sched.delay()
+    time.sleep(0.2)   # iteracja dłuższa niż kilka interwałów
+    assert sched.delay() == 0.0
+    assert sched.late == 1
+    assert sched.delay() == pytest.approx(0.05, abs=0.01)   # bez serii nadrabiania
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = main.TokenBucket(rate=4.0, burst=2)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    wait_s = bucket.try_acquire()
+    assert 0.0 < wait_s <= 0.25
+    assert bucket.waited_s == wait_s
+
+    bucket._t -= 0.25   # minęło 1/rate: jeden nowy token
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0.0
+
+
+def test_token_bucket_refill_capped_at_burst():
+    bucket = main.TokenBucket(rate=4.0, burst=2)
+    bucket._t -= 60   # długa przerwa nie daje więcej niż burst
+    assert [bucket.try_acquire() == 0.0 for _ in range(3)] == [True, True, False]
+
+
+def test_token_bucket_without_limit():
+    bucket = main.TokenBucket(rate=0)
+    assert all(bucket.try_acquire() == 0.0 for _ in range(100))
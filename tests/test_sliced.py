@@ -0,0 +1,284 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import main  # noqa: E402
+from main import PWTimeoutError  # noqa: E402
+
+
+class FakeLocator:
+    """Locator, którego wywołania rzucają timeout Playwrighta, aż minie ready_after_s."""
+
+    def __init__(self, ready_after_s=0.0, stop_evt=None):
+        self.ready_at = time.monotonic() + ready_after_s
+        self.stop_evt = stop_evt
+        self.timeouts = []
+
+    def _call(self, timeout):
+        self.timeouts.append(timeout)
+        if time.monotonic() < self.ready_at:
+            time.sleep(timeout / 1000)
+            raise PWTimeoutError("timeout")
+
+    def click(self, timeout=None):
+        self._call(timeout)
+
+    def scroll_into_view_if_needed(self, timeout=None):
+        self._call(timeout)
+
+
+def stop_after(seconds):
+    evt = threading.Event()
+    threading.Timer(seconds, evt.set).start()
+    return evt
+
+
+def test_sliced_wait_retries_in_slices_until_success():
+    loc = FakeLocator(ready_after_s=0.2)
+    assert main.sliced_wait(lambda ms: loc.click(timeout=ms), 2000, threading.Event())
+    assert len(loc.timeouts) > 1
+    assert max(loc.timeouts) <= main.STOP_SLICE_MS
+
+
+def test_sliced_wait_gives_up_after_timeout():
+    loc = FakeLocator(ready_after_s=10)
+    t0 = time.monotonic()
+    assert not main.sliced_wait(lambda ms: loc.click(timeout=ms), 200, threading.Event())
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_sliced_wait_stops_within_a_slice():
+    loc = FakeLocator(ready_after_s=10)
+    stop_evt = stop_after(0.1)
+    t0 = time.monotonic()
+    assert not main.sliced_wait(lambda ms: loc.click(timeout=ms), 30000, stop_evt)
+    assert time.monotonic() - t0 < 0.1 + 2 * main.STOP_SLICE_MS / 1000
+
+
+def test_sliced_wait_does_not_call_fn_after_stop():
+    stop_evt = threading.Event()
+    stop_evt.set()
+    loc = FakeLocator()
+    assert not main.sliced_wait(lambda ms: loc.click(timeout=ms), 1000, stop_evt)
+    assert loc.timeouts == []
+
+
+def test_sliced_wait_propagates_other_errors():
+    def boom(ms):
+        raise ValueError("inny błąd")
+
+    with pytest.raises(ValueError):
+        main.sliced_wait(boom, 1000, threading.Event())
+
+
+class ClickTarget:
+    """
+    Element do sliced_click: widoczny po visible_after_s, a sam click() potrzebuje
+    click_ms (scroll, stabilność, trafienie). dispatch_then_timeout: zdarzenia myszy
+    idą, ale Playwright i tak zgłasza timeout (czekanie po kliknięciu).
+    """
+
+    def __init__(self, visible_after_s=0.0, click_ms=0, dispatch_then_timeout=False):
+        self.visible_at = time.monotonic() + visible_after_s
+        self.click_ms = click_ms
+        self.dispatch_then_timeout = dispatch_then_timeout
+        self.wait_timeouts = []
+        self.click_timeouts = []
+        self.dispatched = 0
+
+    def wait_for(self, state=None, timeout=None):
+        self.wait_timeouts.append(timeout)
+        if time.monotonic() < self.visible_at:
+            time.sleep(timeout / 1000)
+            raise PWTimeoutError("timeout")
+
+    def is_enabled(self, timeout=None):
+        return True
+
+    def click(self, timeout=None, no_wait_after=False):
+        assert no_wait_after
+        self.click_timeouts.append(timeout)
+        if timeout < self.click_ms:
+            time.sleep(timeout / 1000)
+            raise PWTimeoutError("Timeout exceeded.\nCall log:\n  - waiting for element to be stable")
+        self.dispatched += 1
+        if self.dispatch_then_timeout:
+            raise PWTimeoutError(f"Timeout exceeded.\nCall log:\n  - {main.PW_CLICK_DISPATCHED}")
+
+
+def test_sliced_click_waits_for_visibility_in_slices():
+    el = ClickTarget(visible_after_s=0.15)
+    assert main.sliced_click(el, 1500, threading.Event())
+    assert len(el.wait_timeouts) > 1
+    assert max(el.wait_timeouts) <= main.STOP_SLICE_MS
+    assert el.dispatched == 1
+
+
+def test_sliced_click_slow_click_eventually_lands():
+    el = ClickTarget(click_ms=3 * main.STOP_SLICE_MS)
+    assert main.sliced_click(el, 2000, threading.Event())
+    assert el.dispatched == 1
+    assert el.click_timeouts == sorted(el.click_timeouts)   # każda próba dłuższa od poprzedniej
+
+
+def test_sliced_click_never_clicks_twice_after_dispatch():
+    el = ClickTarget(dispatch_then_timeout=True)
+    assert main.sliced_click(el, 2000, threading.Event())
+    assert el.dispatched == 1
+    assert len(el.click_timeouts) == 1
+
+
+def test_sliced_click_stops_while_waiting_for_element():
+    el = ClickTarget(visible_after_s=10)
+    stop_evt = stop_after(0.1)
+    t0 = time.monotonic()
+    assert not main.sliced_click(el, 30000, stop_evt)
+    assert time.monotonic() - t0 < 0.1 + 2 * main.STOP_SLICE_MS / 1000
+    assert el.dispatched == 0
+
+
+def test_sliced_sleep_wakes_on_stop():
+    stop_evt = stop_after(0.05)
+    t0 = time.monotonic()
+    main.sliced_sleep(5, stop_evt)
+    assert time.monotonic() - t0 < 1
+
+
+def test_sliced_sleep_without_stop_evt_sleeps():
+    t0 = time.monotonic()
+    main.sliced_sleep(0.05)
+    assert time.monotonic() - t0 >= 0.05
+
+
+def test_license_gate_wait_returns_result():
+    gate = main.LicenseGate()
+    threading.Timer(0.05, gate.set, args=(True,)).start()
+    assert gate.wait(threading.Event())
+
+
+def test_license_gate_wait_invalid_license():
+    gate = main.LicenseGate()
+    gate.set(False)
+    assert not gate.wait(threading.Event())
+
+
+def test_license_gate_wait_stops():
+    gate = main.LicenseGate()
+    stop_evt = stop_after(0.05)
+    t0 = time.monotonic()
+    assert not gate.wait(stop_evt)
+    assert time.monotonic() - t0 < 1
+
+
+class FakePage:
+    """Strona, która po starcie nawigacji ma nowy dokument po nav_s sekundach."""
+
+    def __init__(self, nav_s):
+        self.nav_s = nav_s
+        self.nav_at = None
+
+    def evaluate(self, js):
+        if js == main.NAV_MARK_JS:
+            return None
+        return self.nav_at is not None and time.monotonic() >= self.nav_at
+
+    def reload(self, wait_until=None, timeout=None):
+        self.nav_at = time.monotonic() + self.nav_s
+        time.sleep(timeout / 1000)
+        raise PWTimeoutError("timeout")
+
+
+def test_sliced_navigate_waits_for_new_document():
+    page = FakePage(nav_s=0.2)
+    assert main.sliced_navigate(page, lambda ms: page.reload(timeout=ms), 2000, threading.Event())
+
+
+def test_sliced_navigate_stops():
+    page = FakePage(nav_s=10)
+    stop_evt = stop_after(0.1)
+    t0 = time.monotonic()
+    assert not main.sliced_navigate(page, lambda ms: page.reload(timeout=ms), 30000, stop_evt)
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_click_standardowe_scroll_is_stoppable():
+    loc = FakeLocator(ready_after_s=10)
+
+    class Page:
+        def locator(self, sel):
+            return type("L", (), {"first": loc})()
+
+    stop_evt = stop_after(0.1)
+    t0 = time.monotonic()
+    assert not main.click_standardowe(Page(), 1000, stop_evt)
+    assert time.monotonic() - t0 < 0.5
+    assert all(t <= main.STOP_SLICE_MS for t in loc.timeouts)
+
+
+def test_sliced_click_on_animated_dialogs_clicks_once(slot_page):
+    page = slot_page(anim=300)
+    stop_evt = threading.Event()
+    assert main.sliced_click(page.locator("app-slot-grid button").first, 2000, stop_evt)
+    assert page.locator(".dialog").count() == 1
+
+    # TAK jest nieaktywny do końca animacji wejścia – sliced_click czeka, klika raz
+    assert main.sliced_click(page.locator(main.TAK_SELECTORS[0]).first, 3000, stop_evt)
+    page.locator(main.OK_SELECTORS[0]).wait_for(timeout=3000)
+    assert page.locator(".dialog").count() == 1
+    assert main.sliced_click(page.locator(main.OK_SELECTORS[0]).first, 3000, stop_evt)
+    assert main.success_confirmed(page, 3000, stop_evt)
+    assert page.locator(".toast").count() == 1
+
+
+def test_license_gate_refused_only_after_invalid_verdict():
+    gate = main.LicenseGate()
+    assert not gate.refused   # wynik jeszcze nie przyszedł
+    gate.set(True)
+    assert not gate.refused
+    gate.set(False)
+    assert gate.refused
+
+
+class RefusedBatch(main.BatchWorker):
+    """Kolejka bez przeglądarki: run_job udaje pętlę, którą zatrzymała odmowa licencji."""
+
+    def __init__(self, gate):
+        self.ui = type("Ui", (), {"log": lambda self, msg: None})()
+        self.session = type("S", (), {"use_endpoint": lambda s, e: None, "slot_page": lambda s, evt: "page"})()
+        self.base_cfg = type("Cfg", (), {"cdp_endpoint": None})()
+        self.license_gate = gate
+        self.stop_evt = threading.Event()
+        self.runs = 0
+
+    def select_jobs(self):
+        job = type("Job", (), {"priority": 5, "id": 1, "last_run": 0.0, "screen_confirmed": True, "ref": "AW1"})()
+        self.jobs = [job]
+        return self.jobs
+
+    def pending(self):
+        return self.jobs
+
+    def run_job(self, job, t_batch):
+        self.runs += 1
+        self.license_gate.set(False)
+
+    def attach_page(self, page):
+        pass
+
+    def detach_page(self):
+        pass
+
+    def log_summary(self, t_batch):
+        pass
+
+
+def test_batch_stops_after_license_refusal():
+    batch = RefusedBatch(main.LicenseGate())
+    t = threading.Thread(target=batch.logic, daemon=True)
+    t.start()
+    t.join(1)
+    assert not t.is_alive()
+    assert batch.runs == 1